@@ -1,16 +1,26 @@
-from cecil.analytics import UsageReport, UsageReportOptions, UsageSession, start_session
+from cecil.analytics import (
+    UsageReport,
+    UsageReportOptions,
+    UsageSession,
+    collect_usage_report,
+    start_session,
+)
 from cecil.config import ObserverConfig, load_config
-from cecil.event_model import EventContext, build_event
-from cecil.patcher import PatchResult, patch, shutdown
+from cecil.event_model import Event, EventContext, build_event, build_event_record
+from cecil.patcher import PatchResult, ashutdown, patch, shutdown
 
 __all__ = [
+    "Event",
     "EventContext",
     "ObserverConfig",
     "PatchResult",
     "UsageReport",
     "UsageReportOptions",
     "UsageSession",
+    "ashutdown",
     "build_event",
+    "build_event_record",
+    "collect_usage_report",
     "load_config",
     "patch",
     "start_session",
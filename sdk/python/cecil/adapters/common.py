@@ -1,7 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import time
 from typing import Any
 
+from cecil.async_telemetry import AsyncTelemetryClient
+from cecil.config import ObserverConfig
+from cecil.event_model import Event, EventContext, build_event_record
+from cecil.logging import get_logger
+from cecil.telemetry import TelemetrySink
+
 _TEXT_TYPES = {"text", "input_text", "output_text"}
 
 
@@ -26,7 +35,9 @@ def _extract_text_from_block(block: Any) -> str:
     return ""
 
 
-def extract_prompt(kwargs: dict[str, Any]) -> tuple[str, int | None]:
+def extract_messages(kwargs: dict[str, Any]) -> tuple[list[str], int | None] | None:
+    # Text of each message of a chat "messages" or Responses "input" list, in order, with the
+    # index of the first message marked with cache_control. None for single-string prompts.
     messages = kwargs.get("messages")
     cache_pos: int | None = None
     if isinstance(messages, list):
@@ -56,18 +67,27 @@ def extract_prompt(kwargs: dict[str, Any]) -> tuple[str, int | None]:
                         cache_pos = idx
                         break
 
-        return "\n".join(parts), cache_pos
+        return parts, cache_pos
 
     input_value = kwargs.get("input")
     if isinstance(input_value, list):
         text_parts = [_extract_text_from_block(item) for item in input_value]
-        text = "\n".join(part for part in text_parts if part)
-        return text, None
+        return [part for part in text_parts if part], None
+
+    return None
+
+
+def extract_prompt(kwargs: dict[str, Any]) -> tuple[str, int | None]:
+    extracted = extract_messages(kwargs)
+    if extracted is not None:
+        parts, cache_pos = extracted
+        return "\n".join(parts), cache_pos
 
     prompt = kwargs.get("prompt", "")
     if isinstance(prompt, str):
         return prompt, None
 
+    input_value = kwargs.get("input")
     if isinstance(input_value, str):
         return input_value, None
 
@@ -107,3 +127,85 @@ def extract_model(kwargs: dict[str, Any], response: Any) -> str:
         return model_attr
 
     return "unknown"
+
+
+def capture_context(
+    provider: str,
+    kwargs: dict[str, Any],
+    response: Any,
+    start: float,
+    first_chunk_at: float | None = None,
+) -> EventContext:
+    extracted = extract_messages(kwargs)
+    messages: list[str] | None = None
+    if extracted is not None:
+        messages, cache_pos = extracted
+        prompt = "\n".join(messages)
+    else:
+        prompt, cache_pos = extract_prompt(kwargs)
+    prompt_tokens, completion_tokens = extract_token_counts(response)
+    time_to_first_token_ms = None
+    if first_chunk_at is not None:
+        time_to_first_token_ms = max(0, int((first_chunk_at - start) * 1000))
+    return EventContext(
+        provider=provider,
+        model=extract_model(kwargs, response),
+        prompt=prompt,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_ms=int((time.monotonic() - start) * 1000),
+        cache_control_position=cache_pos,
+        timestamp_ms=int(time.time() * 1000),
+        time_to_first_token_ms=time_to_first_token_ms,
+        messages=messages,
+    )
+
+
+def _emit_inline(context: EventContext, config: ObserverConfig, telemetry: TelemetrySink) -> None:
+    from cecil import patcher as patcher_module
+
+    patcher_module.emit_event(build_event_record(context, config=config), telemetry)
+
+
+def _deferred_submit(context: EventContext) -> bool:
+    from cecil import patcher as patcher_module
+
+    pipeline = patcher_module.analysis_pipeline()
+    if pipeline is None:
+        return False
+    pipeline.submit(context)
+    return True
+
+
+def record_event(context: EventContext, config: ObserverConfig, telemetry: TelemetrySink) -> None:
+    if not _deferred_submit(context):
+        _emit_inline(context, config, telemetry)
+
+
+def record_event_async(
+    context: EventContext, config: ObserverConfig, telemetry: TelemetrySink
+) -> None:
+    if isinstance(telemetry, AsyncTelemetryClient):
+        # Deferred events are emitted from the analysis thread, which has no loop of its own.
+        telemetry.attach()
+    if _deferred_submit(context):
+        return
+    # Event construction is CPU-bound; build it off the event loop thread without awaiting it,
+    # so cancelling the caller cannot discard a response the provider already returned. The
+    # done callback emits on the loop so loop-bound telemetry clients skip a thread handoff.
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, build_event_record, context, config)
+    future.add_done_callback(
+        functools.partial(_emit_built, provider=context.provider, telemetry=telemetry)
+    )
+
+
+def _emit_built(future: asyncio.Future[Event], provider: str, telemetry: TelemetrySink) -> None:
+    from cecil import patcher as patcher_module
+
+    if future.cancelled():
+        return
+    try:
+        patcher_module.emit_event(future.result(), telemetry)
+    except Exception as exc:
+        get_logger().debug("%s async instrumentation failed err=%s", provider, type(exc).__name__)
@@ -4,16 +4,16 @@ import importlib
 import time
 from typing import Any, Callable, cast
 
-from cecil.adapters.common import extract_model, extract_prompt, extract_token_counts
+from cecil.adapters.common import capture_context, record_event, record_event_async
+from cecil.adapters.streaming import AsyncStreamProxy, StreamProxy, StreamSummary
 from cecil.config import ObserverConfig
-from cecil.event_model import EventContext, build_event
 from cecil.logging import get_logger
-from cecil.telemetry import TelemetryClient
+from cecil.telemetry import TelemetrySink
 
 PatchedCallable = Callable[..., Any]
 
 
-def patch_openai(config: ObserverConfig, telemetry: TelemetryClient) -> bool:
+def patch_openai(config: ObserverConfig, telemetry: TelemetrySink) -> bool:
     logger = get_logger()
     try:
         module = importlib.import_module("openai.resources.chat.completions")
@@ -34,24 +34,17 @@ def patch_openai(config: ObserverConfig, telemetry: TelemetryClient) -> bool:
 
         try:
             data = dict(kwargs)
-            prompt, cache_pos = extract_prompt(data)
-            prompt_tokens, completion_tokens = extract_token_counts(result)
-            model = extract_model(data, result)
-            event = build_event(
-                EventContext(
-                    provider="openai",
-                    model=model,
-                    prompt=prompt,
-                    prompt_tokens=prompt_tokens,
-                    completion_tokens=completion_tokens,
-                    latency_ms=int((time.monotonic() - start) * 1000),
-                    cache_control_position=cache_pos,
-                ),
-                config=config,
-            )
-            from cecil import patcher as patcher_module
-
-            patcher_module.emit_event(event, telemetry)
+            if data.get("stream") is True and hasattr(result, "__iter__"):
+
+                def on_complete(summary: StreamSummary) -> None:
+                    context = capture_context(
+                        "openai", data, summary, start, first_chunk_at=summary.first_chunk_at
+                    )
+                    record_event(context, config, telemetry)
+
+                return StreamProxy(result, on_complete)
+
+            record_event(capture_context("openai", data, result, start), config, telemetry)
         except Exception as exc:
             logger.debug("openai instrumentation failed err=%s", type(exc).__name__)
 
@@ -61,3 +54,43 @@ def patch_openai(config: ObserverConfig, telemetry: TelemetryClient) -> bool:
     wrapped_fn._cecil_wrapped = True
     completions_cls.create = wrapped
     return True
+
+
+def patch_openai_async(config: ObserverConfig, telemetry: TelemetrySink) -> bool:
+    logger = get_logger()
+    try:
+        module = importlib.import_module("openai.resources.chat.completions")
+        completions_cls = module.AsyncCompletions
+        original = completions_cls.create
+    except Exception:
+        return False
+
+    if getattr(original, "_cecil_wrapped", False):
+        return True
+
+    async def wrapped(self: object, *args: object, **kwargs: object) -> Any:
+        start = time.monotonic()
+        result = await original(self, *args, **kwargs)
+
+        try:
+            data = dict(kwargs)
+            if data.get("stream") is True and hasattr(result, "__aiter__"):
+
+                async def on_complete(summary: StreamSummary) -> None:
+                    context = capture_context(
+                        "openai", data, summary, start, first_chunk_at=summary.first_chunk_at
+                    )
+                    record_event_async(context, config, telemetry)
+
+                return AsyncStreamProxy(result, on_complete)
+
+            record_event_async(capture_context("openai", data, result, start), config, telemetry)
+        except Exception as exc:
+            logger.debug("openai async instrumentation failed err=%s", type(exc).__name__)
+
+        return result
+
+    wrapped_fn = cast(Any, wrapped)
+    wrapped_fn._cecil_wrapped = True
+    completions_cls.create = wrapped
+    return True
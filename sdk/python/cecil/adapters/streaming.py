@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Awaitable
+from typing import Any, Callable
+
+from cecil.adapters.common import extract_token_counts
+from cecil.logging import get_logger
+
+
+def _field(obj: Any, name: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class StreamSummary:
+    __slots__ = ("model", "usage", "first_chunk_at")
+
+    def __init__(self) -> None:
+        self.model: str | None = None
+        self.usage: dict[str, int] = {}
+        self.first_chunk_at: float | None = None
+
+    def observe(self, chunk: Any) -> None:
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.monotonic()
+
+        source = chunk
+        # Anthropic streams report the model and input usage on the message_start event.
+        if _field(chunk, "type") == "message_start":
+            message = _field(chunk, "message")
+            if message is not None:
+                source = message
+
+        if self.model is None:
+            model = _field(source, "model")
+            if isinstance(model, str) and model:
+                self.model = model
+
+        if _field(source, "usage") is None:
+            return
+        prompt_tokens, completion_tokens = extract_token_counts(source)
+        # Later usage chunks may only carry output tokens; keep what earlier chunks reported.
+        if prompt_tokens:
+            self.usage["prompt_tokens"] = prompt_tokens
+        if completion_tokens:
+            self.usage["completion_tokens"] = completion_tokens
+
+
+def _observe(summary: StreamSummary, chunk: Any) -> None:
+    try:
+        summary.observe(chunk)
+    except Exception as exc:
+        get_logger().debug("stream chunk inspection failed err=%s", type(exc).__name__)
+
+
+class StreamProxy:
+    def __init__(self, stream: Any, on_complete: Callable[[StreamSummary], None]) -> None:
+        self._stream = stream
+        self._iterator: Any = None
+        self._on_complete = on_complete
+        self._summary = StreamSummary()
+        self._finished = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    def __iter__(self) -> StreamProxy:
+        return self
+
+    def __next__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        try:
+            chunk = next(self._iterator)
+        except StopIteration:
+            self._finish()
+            raise
+        _observe(self._summary, chunk)
+        return chunk
+
+    def __enter__(self) -> StreamProxy:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._finish()
+        close = getattr(self._stream, "close", None)
+        if callable(close):
+            close()
+
+    def _finish(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            self._on_complete(self._summary)
+        except Exception as exc:
+            get_logger().debug("stream instrumentation failed err=%s", type(exc).__name__)
+
+
+class AsyncStreamProxy:
+    def __init__(
+        self, stream: Any, on_complete: Callable[[StreamSummary], Awaitable[None]]
+    ) -> None:
+        self._stream = stream
+        self._iterator: Any = None
+        self._on_complete = on_complete
+        self._summary = StreamSummary()
+        self._finished = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    def __aiter__(self) -> AsyncStreamProxy:
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            chunk = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            await self._finish()
+            raise
+        _observe(self._summary, chunk)
+        return chunk
+
+    async def __aenter__(self) -> AsyncStreamProxy:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._finish()
+        close = getattr(self._stream, "close", None)
+        if callable(close):
+            result = close()
+            if hasattr(result, "__await__"):
+                await result
+
+    async def _finish(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            await self._on_complete(self._summary)
+        except Exception as exc:
+            get_logger().debug("stream instrumentation failed err=%s", type(exc).__name__)
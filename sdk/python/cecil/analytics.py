@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import itertools
 import json
+import os
 import threading
+import time
 from collections import Counter, deque
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any
 
-from cecil.patcher import patch, register_event_listener, unregister_event_listener
+from cecil.event_model import Event
+from cecil.logging import get_logger
+from cecil.model_names import normalize_model
+from cecil.patcher import patch, register_record_listener, unregister_event_listener
+from cecil.serialization import get_serializer
+from cecil.sketch import QuantileSketch, sketch_key
+from cecil.spool import _pid_alive
 
 
 @dataclass
@@ -18,6 +28,10 @@ class _Aggregate:
     savings_estimated_usd: float = 0.0
     savings_low_usd: float = 0.0
     savings_high_usd: float = 0.0
+    # Per-event distributions; constant memory per key and mergeable across sessions.
+    latency: QuantileSketch = field(default_factory=QuantileSketch)
+    prompt_size: QuantileSketch = field(default_factory=QuantileSketch)
+    completion_size: QuantileSketch = field(default_factory=QuantileSketch)
 
     def as_dict(self, usd_decimals: int) -> dict[str, object]:
         return {
@@ -28,8 +42,277 @@ class _Aggregate:
             "savings_estimated_usd": round(self.savings_estimated_usd, usd_decimals),
             "savings_low_usd": round(self.savings_low_usd, usd_decimals),
             "savings_high_usd": round(self.savings_high_usd, usd_decimals),
+            "latency_ms": self.latency.summary(2),
+            "prompt_tokens_per_event": self.prompt_size.summary(1),
+            "completion_tokens_per_event": self.completion_size.summary(1),
         }
 
+    def merge(self, other: _Aggregate) -> None:
+        self.events += other.events
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost_usd += other.cost_usd
+        self.savings_estimated_usd += other.savings_estimated_usd
+        self.savings_low_usd += other.savings_low_usd
+        self.savings_high_usd += other.savings_high_usd
+        self.latency.merge(other.latency)
+        self.prompt_size.merge(other.prompt_size)
+        self.completion_size.merge(other.completion_size)
+
+    def to_state(self) -> dict[str, object]:
+        return {
+            "events": self.events,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": self.cost_usd,
+            "savings_estimated_usd": self.savings_estimated_usd,
+            "savings_low_usd": self.savings_low_usd,
+            "savings_high_usd": self.savings_high_usd,
+            "latency": self.latency.to_state(),
+            "prompt_size": self.prompt_size.to_state(),
+            "completion_size": self.completion_size.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any]) -> _Aggregate:
+        return cls(
+            events=int(state["events"]),
+            prompt_tokens=int(state["prompt_tokens"]),
+            completion_tokens=int(state["completion_tokens"]),
+            cost_usd=float(state["cost_usd"]),
+            savings_estimated_usd=float(state["savings_estimated_usd"]),
+            savings_low_usd=float(state["savings_low_usd"]),
+            savings_high_usd=float(state["savings_high_usd"]),
+            latency=QuantileSketch.from_state(state["latency"]),
+            prompt_size=QuantileSketch.from_state(state["prompt_size"]),
+            completion_size=QuantileSketch.from_state(state["completion_size"]),
+        )
+
+
+_OTHER_KEY = "other"
+DEFAULT_MAX_KEYS = 64
+
+
+class _TopK:
+    # Space-Saving (Metwally, Agrawal and El Abbadi, 2005): at most `capacity` keys are tracked.
+    # A new key evicts the lowest-weight key and inherits its weight, so heavy hitters stay
+    # tracked however many distinct keys arrive. Evicted aggregates fold into `other`, so the
+    # breakdown still adds up to the totals.
+    def __init__(self, capacity: int = DEFAULT_MAX_KEYS) -> None:
+        self.capacity = max(1, capacity)
+        self.entries: dict[str, _Aggregate] = {}
+        self.weights: dict[str, int] = {}
+        self.other = _Aggregate()
+
+    def get(self, key: str) -> _Aggregate:
+        agg = self.entries.get(key)
+        if agg is not None:
+            self.weights[key] += 1
+            return agg
+        weight = 1
+        if len(self.entries) >= self.capacity:
+            weight += self._evict()
+        agg = self.entries[key] = _Aggregate()
+        self.weights[key] = weight
+        return agg
+
+    def merge(self, other: _TopK) -> None:
+        self.other.merge(other.other)
+        for key, agg in other.entries.items():
+            mine = self.entries.get(key)
+            if mine is None:
+                mine = self.entries[key] = _Aggregate()
+                self.weights[key] = 0
+            mine.merge(agg)
+            self.weights[key] += other.weights[key]
+        while len(self.entries) > self.capacity:
+            self._evict()
+
+    def breakdown(self, usd_decimals: int) -> dict[str, dict[str, object]]:
+        entries = sorted(self.entries.items(), key=lambda item: (-item[1].cost_usd, item[0]))
+        result = {name: aggregate.as_dict(usd_decimals) for name, aggregate in entries}
+        if self.other.events:
+            result[_OTHER_KEY] = self.other.as_dict(usd_decimals)
+        return result
+
+    def to_state(self) -> dict[str, object]:
+        return {
+            "capacity": self.capacity,
+            "entries": {name: agg.to_state() for name, agg in self.entries.items()},
+            "weights": dict(self.weights),
+            "other": self.other.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any]) -> _TopK:
+        top = cls(int(state["capacity"]))
+        top.entries = {name: _Aggregate.from_state(agg) for name, agg in state["entries"].items()}
+        top.weights = {name: int(state["weights"][name]) for name in top.entries}
+        top.other = _Aggregate.from_state(state["other"])
+        return top
+
+    def _evict(self) -> int:
+        victim = min(self.weights, key=self.weights.__getitem__)
+        self.other.merge(self.entries.pop(victim))
+        return self.weights.pop(victim)
+
+
+# Rolling windows reported from the per-minute ring, when the ring is long enough to hold them.
+_WINDOWS_MINUTES = (1, 5, 15, 60)
+
+
+@dataclass
+class _Bucket:
+    minute: int
+    total: _Aggregate = field(default_factory=_Aggregate)
+    providers: _TopK = field(default_factory=_TopK)
+    models: _TopK = field(default_factory=_TopK)
+
+    def merge(self, other: _Bucket) -> None:
+        self.total.merge(other.total)
+        self.providers.merge(other.providers)
+        self.models.merge(other.models)
+
+    def to_state(self) -> dict[str, object]:
+        return {
+            "minute": self.minute,
+            "total": self.total.to_state(),
+            "providers": self.providers.to_state(),
+            "models": self.models.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any]) -> _Bucket:
+        return cls(
+            minute=int(state["minute"]),
+            total=_Aggregate.from_state(state["total"]),
+            providers=_TopK.from_state(state["providers"]),
+            models=_TopK.from_state(state["models"]),
+        )
+
+
+class UsageShard:
+    # Aggregates for the events of the threads striped onto it. With no more threads than
+    # stripes each thread has its own, so the lock is uncontended except while a report merges.
+    def __init__(self, window_minutes: int = 60, max_keys: int = DEFAULT_MAX_KEYS) -> None:
+        self.lock = threading.Lock()
+        self.max_keys = max(1, max_keys)
+        self.total = _Aggregate()
+        self.providers = _TopK(self.max_keys)
+        self.models = _TopK(self.max_keys)
+        self.breaker_counts: Counter[str] = Counter()
+        self.prefix_similarity_sum = 0.0
+        self.boundary_present_count = 0
+        self.unknown_model_count = 0
+        self.priced_event_count = 0
+        self.pricing_versions_seen: set[str] = set()
+        # Fixed ring of per-minute buckets indexed by minute modulo its length; a slot is reused
+        # once its minute has scrolled out of the window.
+        self.ring: list[_Bucket | None] = [None] * max(1, window_minutes)
+
+    def _bucket(self, minute: int) -> _Bucket | None:
+        slot = minute % len(self.ring)
+        bucket = self.ring[slot]
+        if bucket is not None and bucket.minute >= minute:
+            # Same minute, or an event older than anything the ring still holds.
+            return bucket if bucket.minute == minute else None
+        bucket = self.ring[slot] = self.new_bucket(minute)
+        return bucket
+
+    def new_bucket(self, minute: int) -> _Bucket:
+        return _Bucket(minute, providers=_TopK(self.max_keys), models=_TopK(self.max_keys))
+
+    def record(self, event: Event, windowed: bool = True) -> None:
+        # Unwindowed events count toward the totals but never land in a per-minute bucket.
+        provider_key = event.provider or "unknown"
+        model_key = normalize_model(event.model) if event.model else "unknown"
+        targets = [self.total, self.providers.get(provider_key), self.models.get(model_key)]
+        bucket = self._bucket(event.timestamp_ms // 60_000) if windowed else None
+        if bucket is not None:
+            targets.append(bucket.total)
+            targets.append(bucket.providers.get(provider_key))
+            targets.append(bucket.models.get(model_key))
+
+        savings = event.savings
+        cost = event.cost.usd
+        latency_key = sketch_key(event.latency_ms)
+        prompt_key = sketch_key(event.prompt_tokens)
+        completion_key = sketch_key(event.completion_tokens)
+        if cost is not None:
+            self.priced_event_count += 1
+        else:
+            self.unknown_model_count += 1
+
+        for agg in targets:
+            agg.events += 1
+            agg.prompt_tokens += event.prompt_tokens
+            agg.completion_tokens += event.completion_tokens
+            if cost is not None:
+                agg.cost_usd += cost
+            agg.savings_estimated_usd += savings.estimated_usd
+            agg.savings_low_usd += savings.low_usd
+            agg.savings_high_usd += savings.high_usd
+            agg.latency.add_key(latency_key)
+            agg.prompt_size.add_key(prompt_key)
+            agg.completion_size.add_key(completion_key)
+
+        self.prefix_similarity_sum += event.prefix_similarity
+        if event.cache_control_position is not None:
+            self.boundary_present_count += 1
+        for breaker in event.breakers:
+            self.breaker_counts[breaker.category] += 1
+        if event.cost.pricing_version:
+            self.pricing_versions_seen.add(event.cost.pricing_version)
+
+    def merge(self, other: UsageShard) -> None:
+        self.total.merge(other.total)
+        self.providers.merge(other.providers)
+        self.models.merge(other.models)
+        self.breaker_counts.update(other.breaker_counts)
+        self.prefix_similarity_sum += other.prefix_similarity_sum
+        self.boundary_present_count += other.boundary_present_count
+        self.unknown_model_count += other.unknown_model_count
+        self.priced_event_count += other.priced_event_count
+        self.pricing_versions_seen.update(other.pricing_versions_seen)
+        for bucket in other.ring:
+            if bucket is not None:
+                target = self._bucket(bucket.minute)
+                if target is not None:
+                    target.merge(bucket)
+
+    def to_state(self) -> dict[str, object]:
+        return {
+            "total": self.total.to_state(),
+            "providers": self.providers.to_state(),
+            "models": self.models.to_state(),
+            "breaker_counts": dict(self.breaker_counts),
+            "prefix_similarity_sum": self.prefix_similarity_sum,
+            "boundary_present_count": self.boundary_present_count,
+            "unknown_model_count": self.unknown_model_count,
+            "priced_event_count": self.priced_event_count,
+            "pricing_versions_seen": sorted(self.pricing_versions_seen),
+            "window_minutes": len(self.ring),
+            "max_keys": self.max_keys,
+            "buckets": [bucket.to_state() for bucket in self.ring if bucket is not None],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any]) -> UsageShard:
+        shard = cls(int(state["window_minutes"]), int(state["max_keys"]))
+        shard.total = _Aggregate.from_state(state["total"])
+        shard.providers = _TopK.from_state(state["providers"])
+        shard.models = _TopK.from_state(state["models"])
+        shard.breaker_counts = Counter(state["breaker_counts"])
+        shard.prefix_similarity_sum = float(state["prefix_similarity_sum"])
+        shard.boundary_present_count = int(state["boundary_present_count"])
+        shard.unknown_model_count = int(state["unknown_model_count"])
+        shard.priced_event_count = int(state["priced_event_count"])
+        shard.pricing_versions_seen = set(state["pricing_versions_seen"])
+        for bucket_state in state.get("buckets", []):
+            bucket = _Bucket.from_state(bucket_state)
+            shard.ring[bucket.minute % len(shard.ring)] = bucket
+        return shard
+
 
 @dataclass(frozen=True)
 class UsageReportOptions:
@@ -42,26 +325,55 @@ class UsageReport:
     data: dict[str, object]
 
 
+_SNAPSHOT_VERSION = 1
+_STRIPES = 16
+# Snapshot files of this process's open sessions; any other file carrying our pid was left by an
+# earlier process that reused it.
+_LIVE_SNAPSHOTS: set[str] = set()
+
+
 class UsageSession:
-    def __init__(self, max_events: int = 2000) -> None:
+    def __init__(
+        self,
+        max_events: int = 2000,
+        snapshot_dir: str | Path | None = None,
+        snapshot_interval: float = 10.0,
+        window_minutes: int = 60,
+        max_keys: int = DEFAULT_MAX_KEYS,
+    ) -> None:
         self._lock = threading.Lock()
         self._max_events = max(1, max_events)
-        self._events: deque[dict[str, object]] = deque(maxlen=self._max_events)
-
-        self._total = _Aggregate()
-        self._providers: dict[str, _Aggregate] = {}
-        self._models: dict[str, _Aggregate] = {}
-
-        self._breaker_counts: Counter[str] = Counter()
-        self._prefix_similarity_sum = 0.0
-        self._boundary_present_count = 0
-        self._unknown_model_count = 0
-        self._priced_event_count = 0
-        self._pricing_versions_seen: set[str] = set()
-
-        self._listener_id = register_event_listener(self._on_event)
+        self._window_minutes = max(1, window_minutes)
+        self._max_keys = max(1, max_keys)
+        # deque.append is atomic, so retention needs no lock.
+        self._events: deque[Event] = deque(maxlen=self._max_events)
+        # A fixed set of shards, handed out to recording threads round-robin. Threads come and
+        # go (thread-per-request servers), so the shard count must not follow them.
+        self._shards = [UsageShard(self._window_minutes, self._max_keys) for _ in range(_STRIPES)]
+        self._next_stripe = itertools.count()
+        self._local = threading.local()
+
+        self._listener_id = register_record_listener(self._on_event)
         self._closed = False
 
+        # Cross-process mode: every session rewrites one cumulative snapshot file, named so a
+        # restarted worker that reuses a pid never overwrites its predecessor's totals.
+        self._snapshot_path: Path | None = None
+        self._snapshot_stop = threading.Event()
+        self._snapshot_thread: threading.Thread | None = None
+        if snapshot_dir is not None:
+            directory = Path(snapshot_dir)
+            directory.mkdir(parents=True, exist_ok=True)
+            self._snapshot_path = directory / f"usage-{os.getpid()}-{time.time_ns()}.json"
+            _LIVE_SNAPSHOTS.add(self._snapshot_path.name)
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop,
+                args=(max(0.05, snapshot_interval),),
+                name="cecil-sdk-usage-snapshot",
+                daemon=True,
+            )
+            self._snapshot_thread.start()
+
     def close(self) -> None:
         with self._lock:
             if self._closed:
@@ -69,129 +381,77 @@ class UsageSession:
             self._closed = True
             listener_id = self._listener_id
         unregister_event_listener(listener_id)
+        if self._snapshot_thread is not None:
+            self._snapshot_stop.set()
+            self._snapshot_thread.join(timeout=1.0)
+            self._remove_snapshot()
+
+    def write_snapshot(self) -> Path | None:
+        destination = self._snapshot_path
+        if destination is None:
+            return None
+        merged = self._merged()
+        state = {
+            "version": _SNAPSHOT_VERSION,
+            "pid": os.getpid(),
+            "written_at": time.time(),
+            "retained_event_count": min(len(self._events), merged.total.events),
+            "retention_limit": self._max_events,
+            "aggregates": merged.to_state(),
+        }
+        temp_path = destination.with_suffix(destination.suffix + ".tmp")
+        temp_path.write_bytes(get_serializer().dumps(state))
+        temp_path.replace(destination)
+        return destination
 
-    def _on_event(self, event: dict[str, object]) -> None:
-        with self._lock:
-            if self._closed:
-                return
-
-            self._events.append(event)
-            self._total.events += 1
-
-            provider = event.get("provider")
-            provider_key = provider if isinstance(provider, str) and provider else "unknown"
-            provider_agg = self._providers.setdefault(provider_key, _Aggregate())
-            provider_agg.events += 1
-
-            model = event.get("model")
-            model_key = model if isinstance(model, str) and model else "unknown"
-            model_agg = self._models.setdefault(model_key, _Aggregate())
-            model_agg.events += 1
-
-            token_counts = event.get("token_counts")
-            prompt_tokens = 0
-            completion_tokens = 0
-            if isinstance(token_counts, dict):
-                prompt_raw = token_counts.get("prompt")
-                completion_raw = token_counts.get("completion")
-                if isinstance(prompt_raw, int):
-                    prompt_tokens = prompt_raw
-                if isinstance(completion_raw, int):
-                    completion_tokens = completion_raw
-
-            for agg in (self._total, provider_agg, model_agg):
-                agg.prompt_tokens += prompt_tokens
-                agg.completion_tokens += completion_tokens
-
-            cost_raw = event.get("cost_estimate_usd")
-            if isinstance(cost_raw, (int, float)):
-                cost = float(cost_raw)
-                self._priced_event_count += 1
-                for agg in (self._total, provider_agg, model_agg):
-                    agg.cost_usd += cost
-            else:
-                self._unknown_model_count += 1
-
-            cache_savings = event.get("cache_savings")
-            if isinstance(cache_savings, dict):
-                estimated = cache_savings.get("estimated_usd")
-                low = cache_savings.get("low_usd")
-                high = cache_savings.get("high_usd")
-
-                estimated_value = float(estimated) if isinstance(estimated, (int, float)) else 0.0
-                low_value = float(low) if isinstance(low, (int, float)) else 0.0
-                high_value = float(high) if isinstance(high, (int, float)) else 0.0
-
-                for agg in (self._total, provider_agg, model_agg):
-                    agg.savings_estimated_usd += estimated_value
-                    agg.savings_low_usd += low_value
-                    agg.savings_high_usd += high_value
-
-            similarity_raw = event.get("prefix_similarity")
-            if isinstance(similarity_raw, (int, float)):
-                self._prefix_similarity_sum += float(similarity_raw)
-
-            boundary_raw = event.get("cache_boundary")
-            if isinstance(boundary_raw, dict) and boundary_raw.get("present") is True:
-                self._boundary_present_count += 1
-
-            breakers_raw = event.get("cache_breakers")
-            if isinstance(breakers_raw, list):
-                for item in breakers_raw:
-                    if isinstance(item, dict):
-                        # Current schema uses "category"; keep "type" for backward compatibility.
-                        breaker_type = item.get("category")
-                        if not isinstance(breaker_type, str) or not breaker_type:
-                            breaker_type = item.get("type")
-                        if isinstance(breaker_type, str) and breaker_type:
-                            self._breaker_counts[breaker_type] += 1
-
-            pricing_raw = event.get("pricing")
-            if isinstance(pricing_raw, dict):
-                version = pricing_raw.get("version")
-                if isinstance(version, str) and version:
-                    self._pricing_versions_seen.add(version)
-
-    def _sorted_breakdown(
-        self, values: dict[str, _Aggregate], usd_decimals: int
-    ) -> dict[str, dict[str, object]]:
-        entries = sorted(values.items(), key=lambda item: (-item[1].cost_usd, item[0]))
-        return {name: aggregate.as_dict(usd_decimals) for name, aggregate in entries}
+    def _remove_snapshot(self) -> None:
+        # A cleanly closed session leaves nothing behind; its totals are in its own report.
+        path = self._snapshot_path
+        if path is None:
+            return
+        _LIVE_SNAPSHOTS.discard(path.name)
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as exc:
+            get_logger().debug("usage snapshot cleanup failed err=%s", type(exc).__name__)
+
+    def _snapshot_loop(self, interval: float) -> None:
+        while not self._snapshot_stop.wait(interval):
+            self._snapshot_quietly()
+
+    def _snapshot_quietly(self) -> None:
+        try:
+            self.write_snapshot()
+        except OSError as exc:
+            get_logger().debug("usage snapshot failed err=%s", type(exc).__name__)
+
+    def _on_event(self, event: Event) -> None:
+        if self._closed:
+            return
+        try:
+            shard: UsageShard = self._local.shard
+        except AttributeError:
+            stripe = next(self._next_stripe) % _STRIPES
+            shard = self._local.shard = self._shards[stripe]
+        with shard.lock:
+            shard.record(event)
+        self._events.append(event)
+
+    def _merged(self) -> UsageShard:
+        merged = UsageShard(self._window_minutes, self._max_keys)
+        for shard in self._shards:
+            with shard.lock:
+                merged.merge(shard)
+        return merged
 
     def report_dict(self, usd_decimals: int = 8) -> dict[str, object]:
-        options = UsageReportOptions(usd_decimals=max(0, usd_decimals))
-        with self._lock:
-            event_count = self._total.events
-            avg_similarity = self._prefix_similarity_sum / event_count if event_count else 0.0
-            boundary_rate = self._boundary_present_count / event_count if event_count else 0.0
-
-            top_breakers = [
-                {"type": name, "count": count}
-                for name, count in self._breaker_counts.most_common(options.top_breakers_limit)
-            ]
-
-            return {
-                "event_count": event_count,
-                "retained_event_count": len(self._events),
-                "retention_limit": self._max_events,
-                "totals": self._total.as_dict(options.usd_decimals),
-                "providers": self._sorted_breakdown(self._providers, options.usd_decimals),
-                "models": self._sorted_breakdown(self._models, options.usd_decimals),
-                "cache": {
-                    "average_prefix_similarity": round(avg_similarity, 4),
-                    "boundary_present_rate": round(boundary_rate, 4),
-                    "top_cache_breakers": top_breakers,
-                },
-                "costing": {
-                    "unknown_model_count": self._unknown_model_count,
-                    "priced_event_count": self._priced_event_count,
-                    "pricing_versions_seen": sorted(self._pricing_versions_seen),
-                },
-            }
+        merged = self._merged()
+        retained = min(len(self._events), merged.total.events)
+        return build_report(merged, retained, self._max_events, usd_decimals)
 
     def report_json(self, indent: int = 2, usd_decimals: int = 8) -> str:
         report = self.report_dict(usd_decimals=usd_decimals)
-        return json.dumps(report, indent=indent, sort_keys=True)
+        return get_serializer().dumps_text(report, indent=indent, sort_keys=True)
 
     def save_json(self, path: str | Path, indent: int = 2, usd_decimals: int = 8) -> Path:
         destination = Path(path)
@@ -204,11 +464,118 @@ class UsageSession:
     def print_report(self, format: str = "table", usd_decimals: int = 8) -> None:
         report = self.report_dict(usd_decimals=usd_decimals)
         if format == "json":
-            print(json.dumps(report, indent=2, sort_keys=True))
+            print(get_serializer().dumps_text(report, indent=2, sort_keys=True))
             return
         if format != "table":
             raise ValueError("format must be either 'table' or 'json'")
-        print(_render_table(report, usd_decimals=max(0, usd_decimals)))
+        print(render_table(report, usd_decimals=max(0, usd_decimals)))
+
+
+def _window_report(
+    merged: UsageShard, usd_decimals: int, now_ms: int | None = None
+) -> dict[str, dict[str, object]]:
+    # O(ring length) per window: sums the buckets whose minute falls inside it.
+    current = int(time.time() // 60) if now_ms is None else now_ms // 60_000
+    windows = sorted({m for m in _WINDOWS_MINUTES if m <= len(merged.ring)} | {len(merged.ring)})
+    report: dict[str, dict[str, object]] = {}
+    for minutes in windows:
+        window = merged.new_bucket(current)
+        for bucket in merged.ring:
+            if bucket is not None and current - minutes < bucket.minute <= current:
+                window.merge(bucket)
+        tokens = window.total.prompt_tokens + window.total.completion_tokens
+        entry = window.total.as_dict(usd_decimals)
+        entry["cost_usd_per_minute"] = round(window.total.cost_usd / minutes, usd_decimals)
+        entry["savings_usd_per_minute"] = round(
+            window.total.savings_estimated_usd / minutes, usd_decimals
+        )
+        entry["tokens_per_minute"] = round(tokens / minutes, 2)
+        entry["providers"] = window.providers.breakdown(usd_decimals)
+        entry["models"] = window.models.breakdown(usd_decimals)
+        report[f"{minutes}m"] = entry
+    return report
+
+
+def build_report(
+    merged: UsageShard,
+    retained: int,
+    retention_limit: int,
+    usd_decimals: int,
+    now_ms: int | None = None,
+) -> dict[str, object]:
+    options = UsageReportOptions(usd_decimals=max(0, usd_decimals))
+    event_count = merged.total.events
+    avg_similarity = merged.prefix_similarity_sum / event_count if event_count else 0.0
+    boundary_rate = merged.boundary_present_count / event_count if event_count else 0.0
+
+    top_breakers = [
+        {"type": name, "count": count}
+        for name, count in merged.breaker_counts.most_common(options.top_breakers_limit)
+    ]
+
+    return {
+        "event_count": event_count,
+        "retained_event_count": retained,
+        "retention_limit": retention_limit,
+        "totals": merged.total.as_dict(options.usd_decimals),
+        "providers": merged.providers.breakdown(options.usd_decimals),
+        "models": merged.models.breakdown(options.usd_decimals),
+        "cache": {
+            "average_prefix_similarity": round(avg_similarity, 4),
+            "boundary_present_rate": round(boundary_rate, 4),
+            "top_cache_breakers": top_breakers,
+        },
+        "costing": {
+            "unknown_model_count": merged.unknown_model_count,
+            "priced_event_count": merged.priced_event_count,
+            "pricing_versions_seen": sorted(merged.pricing_versions_seen),
+        },
+        "windows": _window_report(merged, options.usd_decimals, now_ms),
+    }
+
+
+def collect_usage_report(
+    snapshot_dir: str | Path,
+    usd_decimals: int = 8,
+    max_age_seconds: float | None = None,
+    prune_dead: bool = True,
+) -> UsageReport:
+    # Merges the latest snapshot of every running session that writes to the directory. Closed
+    # sessions remove their own file; files of processes that died without closing are deleted
+    # here. Pass prune_dead=False to keep and count them (e.g. when the collector runs in another
+    # pid namespace), and max_age_seconds to leave out stale ones.
+    shards: list[UsageShard] = []
+    retained = 0
+    retention_limit = 0
+    now = time.time()
+    for path in sorted(Path(snapshot_dir).glob("usage-*.json")):
+        try:
+            state = json.loads(path.read_bytes())
+            if state.get("version") != _SNAPSHOT_VERSION:
+                continue
+            if max_age_seconds is not None and now - state["written_at"] > max_age_seconds:
+                continue
+            if (
+                prune_dead
+                and path.name not in _LIVE_SNAPSHOTS
+                and not _pid_alive(int(state["pid"]))
+            ):
+                path.unlink(missing_ok=True)
+                continue
+            shard = UsageShard.from_state(state["aggregates"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+            get_logger().debug("usage snapshot skipped err=%s", type(exc).__name__)
+            continue
+        shards.append(shard)
+        retained += int(state["retained_event_count"])
+        retention_limit += int(state["retention_limit"])
+    merged = UsageShard(
+        max((len(shard.ring) for shard in shards), default=60),
+        max((shard.max_keys for shard in shards), default=DEFAULT_MAX_KEYS),
+    )
+    for shard in shards:
+        merged.merge(shard)
+    return UsageReport(data=build_report(merged, retained, retention_limit, usd_decimals))
 
 
 def _format_usd(value: object, decimals: int) -> str:
@@ -217,7 +584,13 @@ def _format_usd(value: object, decimals: int) -> str:
     return f"${float(value):.{decimals}f}"
 
 
-def _render_table(report: dict[str, object], usd_decimals: int) -> str:
+def _format_percentiles(value: object, unit: str) -> str:
+    if not isinstance(value, dict) or value.get("p50") is None:
+        return "n/a"
+    return " ".join(f"{name}={value.get(name)}{unit}" for name in ("p50", "p95", "p99"))
+
+
+def render_table(report: dict[str, object], usd_decimals: int) -> str:
     totals = report.get("totals")
     cache = report.get("cache")
     costing = report.get("costing")
@@ -249,6 +622,7 @@ def _render_table(report: dict[str, object], usd_decimals: int) -> str:
                     " to "
                     f"{_format_usd(totals.get('savings_high_usd'), usd_decimals)}"
                 ),
+                f"- Latency: {_format_percentiles(totals.get('latency_ms'), 'ms')}",
             ]
         )
 
@@ -267,9 +641,7 @@ def _render_table(report: dict[str, object], usd_decimals: int) -> str:
             lines.append("- Top cache breakers:")
             for breaker in breakers:
                 if isinstance(breaker, dict):
-                    lines.append(
-                        f"  - {breaker.get('type', 'unknown')}: {breaker.get('count', 0)}"
-                    )
+                    lines.append(f"  - {breaker.get('type', 'unknown')}: {breaker.get('count', 0)}")
 
     if isinstance(costing, dict):
         lines.extend(
@@ -281,6 +653,17 @@ def _render_table(report: dict[str, object], usd_decimals: int) -> str:
             ]
         )
 
+    windows = report.get("windows")
+    if isinstance(windows, dict) and windows:
+        lines.extend(["", "Recent activity"])
+        for name, stats in windows.items():
+            if isinstance(stats, dict):
+                lines.append(
+                    f"- last {name}: events={stats.get('events', 0)}, "
+                    f"cost={_format_usd(stats.get('cost_usd'), usd_decimals)}, "
+                    f"tokens/min={stats.get('tokens_per_minute', 0)}"
+                )
+
     providers = report.get("providers")
     if isinstance(providers, dict) and providers:
         lines.extend(["", "Provider breakdown"])
@@ -290,7 +673,8 @@ def _render_table(report: dict[str, object], usd_decimals: int) -> str:
                     f"- {name}: events={stats.get('events', 0)}, "
                     f"cost={_format_usd(stats.get('cost_usd'), usd_decimals)}, "
                     "savings="
-                    f"{_format_usd(stats.get('savings_estimated_usd'), usd_decimals)}"
+                    f"{_format_usd(stats.get('savings_estimated_usd'), usd_decimals)}, "
+                    f"latency {_format_percentiles(stats.get('latency_ms'), 'ms')}"
                 )
 
     models = report.get("models")
@@ -302,13 +686,28 @@ def _render_table(report: dict[str, object], usd_decimals: int) -> str:
                     f"- {name}: events={stats.get('events', 0)}, "
                     f"cost={_format_usd(stats.get('cost_usd'), usd_decimals)}, "
                     "savings="
-                    f"{_format_usd(stats.get('savings_estimated_usd'), usd_decimals)}"
+                    f"{_format_usd(stats.get('savings_estimated_usd'), usd_decimals)}, "
+                    f"latency {_format_percentiles(stats.get('latency_ms'), 'ms')}"
                 )
 
     return "\n".join(lines)
 
 
-def start_session(*, auto_patch: bool = True, max_events: int = 2000) -> UsageSession:
+def start_session(
+    *,
+    auto_patch: bool = True,
+    max_events: int = 2000,
+    snapshot_dir: str | Path | None = None,
+    snapshot_interval: float = 10.0,
+    window_minutes: int = 60,
+    max_keys: int = DEFAULT_MAX_KEYS,
+) -> UsageSession:
     if auto_patch:
         patch()
-    return UsageSession(max_events=max_events)
+    return UsageSession(
+        max_events=max_events,
+        snapshot_dir=snapshot_dir,
+        snapshot_interval=snapshot_interval,
+        window_minutes=window_minutes,
+        max_keys=max_keys,
+    )
@@ -0,0 +1,503 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import random
+import ssl
+import threading
+import urllib.parse
+
+from cecil.config import ObserverConfig
+from cecil.event_model import Event
+from cecil.logging import get_logger, scrub
+from cecil.serialization import get_serializer
+from cecil.telemetry import TelemetryCounters, _rejected, encode_batch, failed_indices
+from cecil.transport import proxy_for, proxy_headers
+
+# Queue items are (attempt, events); first attempts always carry a single event.
+_Item = tuple[int, list[dict[str, object]]]
+
+
+class _StreamConnection:
+    def __init__(self, endpoint: str, timeout: float) -> None:
+        parts = urllib.parse.urlsplit(endpoint)
+        self._scheme = parts.scheme.lower()
+        self._host = parts.hostname or ""
+        self._port = parts.port or (443 if self._scheme == "https" else 80)
+        self._host_header = parts.netloc.rsplit("@", 1)[-1]
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path = f"{self._path}?{parts.query}"
+        self._proxy = proxy_for(self._scheme, self._host)
+        self._request_headers: dict[str, str] = {}
+        if self._proxy is not None and self._scheme == "http":
+            # Plain-HTTP proxies take the absolute URL in the request line.
+            self._path = f"http://{self._host_header}{self._path}"
+            self._request_headers = proxy_headers(self._proxy)
+        self._timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def post(self, body: bytes, headers: dict[str, str]) -> tuple[int, bytes]:
+        reused = self._writer is not None
+        try:
+            return await asyncio.wait_for(self._roundtrip(body, headers), self._timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+        except BaseException:
+            self.close()
+            raise
+        # The collector dropped an idle keep-alive connection; retry once on a fresh one.
+        try:
+            return await asyncio.wait_for(self._roundtrip(body, headers), self._timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            # The owning loop may already be closed; the transport went with it.
+            with contextlib.suppress(RuntimeError):
+                writer.close()
+
+    async def _roundtrip(self, body: bytes, headers: dict[str, str]) -> tuple[int, bytes]:
+        if self._writer is None:
+            await self._connect()
+        reader, writer = self._reader, self._writer
+        assert reader is not None and writer is not None
+
+        lines = [f"POST {self._path} HTTP/1.1", f"Host: {self._host_header}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        lines.extend(f"{name}: {value}" for name, value in self._request_headers.items())
+        lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before response")
+        version, status_raw = status_line.decode("latin-1").split(None, 2)[:2]
+        status = int(status_raw)
+
+        response_headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and response_headers.get("connection") != "close"
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            data = await self._read_chunked(reader)
+        elif "content-length" in response_headers:
+            data = await reader.readexactly(int(response_headers["content-length"]))
+        elif status in (204, 304) or 100 <= status < 200:
+            data = b""
+        else:
+            data = await reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            self.close()
+        return status, data
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        parts: list[bytes] = []
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                # Skip optional trailers up to the terminating blank line.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(parts)
+            parts.append(await reader.readexactly(size))
+            await reader.readline()
+
+    async def _connect(self) -> None:
+        context: ssl.SSLContext | None = None
+        if self._scheme == "https":
+            context = ssl.create_default_context()
+        elif self._scheme != "http":
+            raise ValueError(f"unsupported endpoint scheme: {self._scheme or '<none>'}")
+        if self._proxy is None:
+            self._reader, self._writer = await asyncio.open_connection(
+                self._host, self._port, ssl=context
+            )
+            return
+        reader, writer = await asyncio.open_connection(
+            self._proxy.hostname or "", self._proxy.port or 80
+        )
+        if context is not None:
+            try:
+                writer = await self._tunnel(reader, writer, context)
+            except BaseException:
+                writer.close()
+                raise
+        self._reader, self._writer = reader, writer
+
+    async def _tunnel(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, context: ssl.SSLContext
+    ) -> asyncio.StreamWriter:
+        assert self._proxy is not None
+        authority = f"{self._host}:{self._port}"
+        lines = [f"CONNECT {authority} HTTP/1.1", f"Host: {authority}"]
+        lines.extend(f"{name}: {value}" for name, value in proxy_headers(self._proxy).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1").split(None, 2)
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if len(status_line) < 2 or status_line[1] != "200":
+            raise ConnectionRefusedError(f"proxy refused tunnel: {' '.join(status_line[1:2])}")
+
+        # loop.start_tls rather than StreamWriter.start_tls, which only exists on 3.11+.
+        loop = asyncio.get_running_loop()
+        transport = await loop.start_tls(
+            writer.transport, writer.transport.get_protocol(), context, server_hostname=self._host
+        )
+        if transport is None:
+            raise ConnectionResetError("proxy tunnel closed during TLS handshake")
+        return asyncio.StreamWriter(transport, transport.get_protocol(), reader, loop)
+
+
+class AsyncTelemetryClient:
+    def __init__(self, config: ObserverConfig) -> None:
+        self._config = config
+        self._logger = get_logger()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[_Item] | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        self._connections: list[_StreamConnection] = []
+        self._retry_timers: dict[asyncio.TimerHandle, list[dict[str, object]]] = {}
+        self._in_flight = 0
+        self._closing = False
+        self._counter_lock = threading.Lock()
+        self.counters = TelemetryCounters()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        return self._loop
+
+    def emit(self, event: dict[str, object] | Event) -> None:
+        if self._config.local_only or self._closing:
+            return
+        if random.random() > self._config.sampling_rate:
+            return
+        if isinstance(event, Event):
+            event = event.to_dict()
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is not None:
+            self._bind_if_unbound(running)
+        if running is not None and running is self._loop:
+            self._enqueue(event)
+            return
+
+        # Called off the sender's loop thread (sync adapters, deferred analysis worker).
+        loop = self._loop
+        if loop is None:
+            self._count("dropped")
+            return
+        try:
+            loop.call_soon_threadsafe(self._enqueue, event)
+        except RuntimeError:
+            self._count("dropped")
+
+    def attach(self) -> None:
+        # Binds to the running loop ahead of the first emit, so events handed over from other
+        # threads (the deferred analysis worker) have a loop to go to.
+        if self._config.local_only or self._closing:
+            return
+        self._bind_if_unbound(asyncio.get_running_loop())
+
+    def stop(self, timeout: float = 1.0, drain: bool = True) -> None:
+        self._closing = True
+        loop = self._loop
+        if loop is None:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop or not loop.is_running():
+            # The loop cannot drain: blocking its own thread would deadlock, and a finished
+            # asyncio.run never resumes it. What is queued is sent from a private loop instead.
+            for task in self._tasks:
+                task.cancel()
+            self._close_connections()
+            if drain:
+                self._flush_in_thread(timeout)
+            self._abandon_remaining()
+            return
+
+        future = asyncio.run_coroutine_threadsafe(self.aclose(timeout=timeout, drain=drain), loop)
+        try:
+            future.result(timeout=max(0.0, timeout) + 0.5)
+        except Exception as exc:
+            self._logger.debug("async telemetry stop failed err=%s", type(exc).__name__)
+
+    async def aclose(self, timeout: float = 1.0, drain: bool = True) -> None:
+        self._closing = True
+        queue = self._queue
+        if queue is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+        if drain:
+            while loop.time() < deadline:
+                if queue.empty() and not self._retry_timers and not self._in_flight:
+                    break
+                await asyncio.sleep(0.01)
+
+        tasks = list(self._tasks)
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._abandon_remaining()
+        self._close_connections()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            setattr(self.counters, name, getattr(self.counters, name) + amount)
+
+    def _bind_if_unbound(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is None or self._loop.is_closed():
+            self._bind(loop)
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not None:
+            # The previous loop is gone (e.g. a new asyncio.run call); nothing can drain it.
+            self._abandon_remaining()
+            self._close_connections()
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self._config.queue_size)
+        self._tasks = []
+        for _ in range(self._config.telemetry_workers):
+            connection = _StreamConnection(
+                self._config.endpoint or "", self._config.timeout_seconds
+            )
+            self._connections.append(connection)
+            self._tasks.append(loop.create_task(self._run(connection)))
+
+    def _enqueue(self, event: dict[str, object]) -> None:
+        assert self._queue is not None
+        if self._closing:
+            self._count("dropped")
+            return
+        try:
+            self._queue.put_nowait((0, [event]))
+        except asyncio.QueueFull:
+            self._count("dropped")
+
+    def _take_remaining(self) -> list[dict[str, object]]:
+        remaining: list[dict[str, object]] = []
+        queue = self._queue
+        while queue is not None:
+            try:
+                remaining.extend(queue.get_nowait()[1])
+            except asyncio.QueueEmpty:
+                break
+        for handle, events in list(self._retry_timers.items()):
+            handle.cancel()
+            remaining.extend(events)
+        self._retry_timers.clear()
+        return remaining
+
+    def _abandon_remaining(self) -> None:
+        abandoned = len(self._take_remaining())
+        if abandoned:
+            self._count("abandoned_on_shutdown", abandoned)
+
+    def _flush_in_thread(self, timeout: float) -> None:
+        events = self._take_remaining()
+        if not events:
+            return
+        flusher = threading.Thread(
+            target=asyncio.run,
+            args=(self._flush(events, timeout),),
+            name="cecil-sdk-telemetry-flush",
+            daemon=True,
+        )
+        flusher.start()
+        flusher.join(timeout=max(0.0, timeout) + 0.5)
+
+    async def _flush(self, events: list[dict[str, object]], timeout: float) -> None:
+        # Sends events left behind by a stopped loop, retrying within the budget until the
+        # stop timeout; whatever is still unsent then is abandoned.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+        connection = _StreamConnection(self._config.endpoint or "", self._config.timeout_seconds)
+        size = max(1, self._config.telemetry_batch_size)
+        start = 0
+        try:
+            while start < len(events) and loop.time() < deadline:
+                pending = events[start : start + size]
+                start += len(pending)
+                attempt = 0
+                while True:
+                    failed = await self._send(connection, pending)
+                    if failed is None:
+                        self._count("failures", len(pending))
+                        break
+                    delivered = len(pending) - len(failed)
+                    self._count("sent", delivered)
+                    if delivered and size > 1:
+                        self._count("batches_sent")
+                        if failed:
+                            self._count("partial_batches")
+                    pending = [pending[index] for index in failed]
+                    if not pending:
+                        break
+                    if attempt >= self._config.retry_budget or loop.time() >= deadline:
+                        self._count("failures", len(pending))
+                        break
+                    attempt += 1
+                    self._count("retried_events", len(pending))
+                    await asyncio.sleep(min(2 ** (attempt - 1), 8) * 0.1)
+        finally:
+            connection.close()
+            if start < len(events):
+                self._count("abandoned_on_shutdown", len(events) - start)
+
+    def _close_connections(self) -> None:
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+
+    async def _run(self, connection: _StreamConnection) -> None:
+        queue = self._queue
+        assert queue is not None
+        batching = self._config.telemetry_batch_size > 1
+        carry: list[_Item] = []
+        while True:
+            if carry:
+                attempt, events = carry.pop()
+            else:
+                if self._closing and queue.empty() and not self._retry_timers:
+                    return
+                try:
+                    attempt, events = await asyncio.wait_for(queue.get(), 0.05)
+                except asyncio.TimeoutError:
+                    continue
+
+            if attempt == 0 and batching:
+                events = await self._collect_batch(queue, events, carry)
+            await self._attempt(connection, attempt, events)
+
+    async def _collect_batch(
+        self,
+        queue: asyncio.Queue[_Item],
+        batch: list[dict[str, object]],
+        carry: list[_Item],
+    ) -> list[dict[str, object]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._config.telemetry_batch_interval_ms / 1000
+        while len(batch) < self._config.telemetry_batch_size:
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0 or self._closing:
+                    item = queue.get_nowait()
+                else:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item[0]:
+                # Retries keep their own event set; send them after this batch.
+                carry.append(item)
+            else:
+                batch.extend(item[1])
+        return batch
+
+    async def _attempt(
+        self, connection: _StreamConnection, attempt: int, events: list[dict[str, object]]
+    ) -> None:
+        self._in_flight += len(events)
+        try:
+            failed = await self._send(connection, events)
+        except asyncio.CancelledError:
+            self._count("abandoned_on_shutdown", len(events))
+            raise
+        finally:
+            self._in_flight -= len(events)
+        if failed is None:
+            # Rejected for good; a retry would fail the same way.
+            self._count("failures", len(events))
+            return
+
+        delivered = len(events) - len(failed)
+        if delivered:
+            self._count("sent", delivered)
+            if self._config.telemetry_batch_size > 1:
+                self._count("batches_sent")
+                if failed:
+                    self._count("partial_batches")
+        if not failed:
+            return
+
+        pending = [events[index] for index in failed]
+        if attempt >= self._config.retry_budget:
+            self._count("failures", len(pending))
+            return
+        self._count("retried_events", len(pending))
+        self._schedule_retry(attempt + 1, pending)
+
+    def _schedule_retry(self, attempt: int, events: list[dict[str, object]]) -> None:
+        loop = self._loop
+        assert loop is not None
+        backoff = min(2 ** (attempt - 1), 8) * 0.1
+
+        def fire() -> None:
+            self._retry_timers.pop(handle, None)
+            assert self._queue is not None
+            try:
+                self._queue.put_nowait((attempt, events))
+            except asyncio.QueueFull:
+                self._count("failures", len(events))
+
+        handle = loop.call_later(backoff, fire)
+        self._retry_timers[handle] = events
+
+    async def _send(
+        self, connection: _StreamConnection, events: list[dict[str, object]]
+    ) -> list[int] | None:
+        # Indices worth retrying, or None when the server rejected the events for good.
+        assert self._config.api_key is not None
+        everything = list(range(len(events)))
+        if self._config.telemetry_batch_size > 1:
+            body, headers = encode_batch(self._config, events)
+        else:
+            body = get_serializer(self._config.json_backend).dumps(events[0])
+            headers = {"Content-Type": "application/json"}
+        headers["Authorization"] = f"Bearer {self._config.api_key}"
+
+        try:
+            status, response_body = await connection.post(body, headers)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+            self._logger.debug(
+                "async telemetry send failed endpoint=%s err=%s",
+                scrub(self._config.endpoint),
+                type(exc).__name__,
+            )
+            return everything
+
+        if _rejected(status):
+            return None
+        if not 200 <= status < 300:
+            return everything
+        if status != 207 or self._config.telemetry_batch_size <= 1:
+            return []
+        return failed_indices(response_body, len(events))
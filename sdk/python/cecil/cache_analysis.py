@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import re
 from dataclasses import dataclass
 
@@ -45,6 +46,240 @@ def prefix_similarity_score(a: str, b: str) -> float:
     return round(i / max_len, 4)
 
 
+# Prompts are fingerprinted in fixed character blocks with 8-byte digests per full block.
+_FINGERPRINT_BLOCK = 256
+_DIGEST_SIZE = 8
+# Leading characters a history fingerprint keeps verbatim, so divergence anywhere in them
+# resolves to the exact character. Prompts up to this size are compared exactly.
+EXACT_PREFIX_CHARS = 16384
+
+
+class PromptFingerprint:
+    # Keeps only block digests plus the raw text of a few regions: the head (the first block,
+    # or the first exact_chars characters), the partial tail and the "hot" block where this
+    # prompt diverged from its predecessor. Dynamic content tends to diverge at the same place
+    # on every call, so beyond the head the hot block usually lets the next comparison resolve
+    # to an exact character offset.
+    __slots__ = ("length", "digests", "head", "tail", "hot_index", "hot_block")
+
+    def __init__(self, text: str, exact_chars: int = _FINGERPRINT_BLOCK) -> None:
+        full_blocks = len(text) // _FINGERPRINT_BLOCK
+        self.length = len(text)
+        self.digests = b"".join(
+            hashlib.blake2b(
+                text[i : i + _FINGERPRINT_BLOCK].encode("utf-8", "surrogatepass"),
+                digest_size=_DIGEST_SIZE,
+            ).digest()
+            for i in range(0, full_blocks * _FINGERPRINT_BLOCK, _FINGERPRINT_BLOCK)
+        )
+        self.head = text[: max(_FINGERPRINT_BLOCK, exact_chars)]
+        self.tail = text[full_blocks * _FINGERPRINT_BLOCK :]
+        self.hot_index = -1
+        self.hot_block = ""
+
+    @property
+    def full_blocks(self) -> int:
+        return len(self.digests) // _DIGEST_SIZE
+
+    def remember_divergence(self, text: str, offset: int) -> None:
+        index = offset // _FINGERPRINT_BLOCK
+        if offset < len(self.head) or index >= self.full_blocks:
+            return
+        self.hot_index = index
+        self.hot_block = text[index * _FINGERPRINT_BLOCK : (index + 1) * _FINGERPRINT_BLOCK]
+
+    def trimmed(self, exact_chars: int) -> PromptFingerprint:
+        # The same fingerprint holding at most max(one block, exact_chars) of its head.
+        keep = max(_FINGERPRINT_BLOCK, exact_chars)
+        if len(self.head) <= keep:
+            return self
+        copy = PromptFingerprint.__new__(PromptFingerprint)
+        copy.length, copy.digests, copy.tail = self.length, self.digests, self.tail
+        copy.hot_index, copy.hot_block = self.hot_index, self.hot_block
+        copy.head = self.head[:keep]
+        return copy
+
+    def raw_block(self, index: int) -> str | None:
+        start = index * _FINGERPRINT_BLOCK
+        if start < len(self.head):
+            return self.head[start : start + _FINGERPRINT_BLOCK]
+        if index == self.full_blocks:
+            return self.tail
+        if index == self.hot_index:
+            return self.hot_block
+        return None
+
+
+def _matching_blocks(a: bytes, b: bytes, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        end = mid * _DIGEST_SIZE
+        if a[:end] == b[:end]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def fingerprint_common_prefix(
+    previous: PromptFingerprint, current: PromptFingerprint, text: str | None
+) -> int:
+    # text is the current prompt; without it only blocks the current fingerprint still holds
+    # can be compared character by character.
+    limit = min(previous.length, current.length)
+    if limit == 0:
+        return 0
+    matched = _matching_blocks(
+        previous.digests, current.digests, min(previous.full_blocks, current.full_blocks)
+    )
+    start = matched * _FINGERPRINT_BLOCK
+    if start >= limit:
+        return limit
+
+    reference = previous.raw_block(matched)
+    if reference is None:
+        # Divergence is somewhere in a block we no longer hold; block granularity is the floor.
+        return start
+    segment = text[start : start + _FINGERPRINT_BLOCK] if text is not None else None
+    if segment is None:
+        segment = current.raw_block(matched)
+        if segment is None:
+            return start
+    max_len = min(len(reference), len(segment))
+    i = 0
+    while i < max_len and reference[i] == segment[i]:
+        i += 1
+    return min(start + i, limit)
+
+
+class MessagePrint:
+    # One message after canonicalization: its block fingerprint and breaker categories.
+    __slots__ = ("fingerprint", "categories")
+
+    def __init__(
+        self, canonical: str, categories: frozenset[str], exact_chars: int = _FINGERPRINT_BLOCK
+    ) -> None:
+        self.fingerprint = PromptFingerprint(canonical, exact_chars)
+        self.categories = categories
+
+    def at_offset(self, offset: int) -> MessagePrint:
+        # This message placed `offset` characters into a conversation. The messages of a
+        # conversation share one EXACT_PREFIX_CHARS head budget, as the flat prompt does, so
+        # similarity is exact wherever the flat analysis is.
+        fingerprint = self.fingerprint.trimmed(EXACT_PREFIX_CHARS - offset)
+        if fingerprint is self.fingerprint:
+            return self
+        placed = MessagePrint.__new__(MessagePrint)
+        placed.fingerprint, placed.categories = fingerprint, self.categories
+        return placed
+
+    @property
+    def length(self) -> int:
+        return self.fingerprint.length
+
+    def same_text(self, other: MessagePrint) -> bool:
+        a, b = self.fingerprint, other.fingerprint
+        return (
+            a is b
+            or a.length == b.length
+            and a.digests == b.digests
+            and a.head == b.head
+            and a.tail == b.tail
+        )
+
+
+class Conversation:
+    # The message list of a model's latest call: a marker per message (see message_markers),
+    # their prints and the running length of the space-joined canonical messages before each
+    # one (empty ones are skipped). The raw texts are not kept.
+    __slots__ = ("markers", "prints", "offsets", "categories", "hash_blocks", "hasher")
+
+    def __init__(
+        self,
+        markers: list[int],
+        prints: tuple[MessagePrint, ...],
+        offsets: list[int],
+        categories: frozenset[str],
+    ) -> None:
+        self.markers = markers
+        self.prints = prints
+        self.offsets = offsets
+        self.categories = categories
+        # Prefix hash blocks and the hasher that produced them, filled in by the caller.
+        self.hash_blocks: list[str] = []
+        self.hasher: object = None
+
+    @property
+    def length(self) -> int:
+        return max(0, self.offsets[-1] - 1)
+
+
+def message_markers(texts: list[str]) -> list[int]:
+    # Stand-ins for message texts: str hashes are cached on the object, so the messages a new
+    # turn carries over cost nothing to mark again.
+    return [hash(text) for text in texts]
+
+
+def shared_messages(previous: list[int], current: list[int]) -> int:
+    # Number of leading messages two marker lists have in common.
+    count = len(previous)
+    if count <= len(current) and current[:count] == previous:
+        return count
+    shared = 0
+    for before, after in zip(previous, current):
+        if before != after:
+            break
+        shared += 1
+    return shared
+
+
+def conversation_common_prefix(previous: Conversation, current: Conversation, shared: int) -> int:
+    # The first `shared` messages are known to match; later ones are compared by fingerprint,
+    # and only the first differing message block by block.
+    index = shared
+    limit = min(len(previous.prints), len(current.prints))
+    while index < limit and previous.prints[index].same_text(current.prints[index]):
+        index += 1
+    common = current.offsets[index]
+    if index < limit:
+        common += fingerprint_common_prefix(
+            previous.prints[index].fingerprint, current.prints[index].fingerprint, None
+        )
+    return min(common, previous.length, current.length)
+
+
+def prefix_chain(seed: object, fingerprint: PromptFingerprint) -> list[int]:
+    # One key per full block, then one for the whole prompt; key k stands for blocks 0..k, so
+    # a prompt that shares its first k+1 blocks with another produces the same first k+1 keys.
+    # Keys are plain hashes, and callers confirm a match by comparing digests.
+    keys: list[int] = []
+    key = hash(seed)
+    digests = fingerprint.digests
+    for end in range(_DIGEST_SIZE, len(digests) + 1, _DIGEST_SIZE):
+        key = hash((key, digests[end - _DIGEST_SIZE : end]))
+        keys.append(key)
+    keys.append(hash((key, fingerprint.length, fingerprint.tail)))
+    return keys
+
+
+def message_chain(seed: object, prints: tuple[MessagePrint, ...]) -> list[int]:
+    # Like prefix_chain, with a key per full block of each message and then one for the whole
+    # message, so a conversation that diverges inside a message still finds the recent one
+    # sharing most of its leading blocks.
+    keys: list[int] = []
+    key = hash(seed)
+    for message in prints:
+        fingerprint = message.fingerprint
+        digests = fingerprint.digests
+        for end in range(_DIGEST_SIZE, len(digests) + 1, _DIGEST_SIZE):
+            key = hash((key, digests[end - _DIGEST_SIZE : end]))
+            keys.append(key)
+        key = hash((key, fingerprint.length, fingerprint.tail))
+        keys.append(key)
+    return keys
+
+
 def detect_cache_breakers(prompt: str) -> list[Breaker]:
     findings: list[Breaker] = []
     for category, pattern, confidence in _BREAKERS:
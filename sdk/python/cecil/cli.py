@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+
+from cecil.analytics import DEFAULT_MAX_KEYS, render_table
+from cecil.offline import analyze_file
+from cecil.serialization import get_serializer
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cecil", description="Cecil SDK tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser(
+        "analyze", help="build a usage report from a JSONL or Parquet log of recorded calls"
+    )
+    analyze.add_argument("path", help="JSONL (optionally .gz) or Parquet file")
+    analyze.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    analyze.add_argument("--output", help="write the report here instead of stdout")
+    analyze.add_argument("--format", choices=("json", "table"), default="json")
+    analyze.add_argument("--window-minutes", type=int, default=60)
+    analyze.add_argument("--max-keys", type=int, default=DEFAULT_MAX_KEYS)
+    analyze.add_argument("--usd-decimals", type=int, default=8)
+    return parser
+
+
+def _analyze(args: argparse.Namespace) -> int:
+    try:
+        report = analyze_file(
+            args.path,
+            workers=args.workers,
+            window_minutes=max(1, args.window_minutes),
+            max_keys=max(1, args.max_keys),
+            usd_decimals=args.usd_decimals,
+        )
+    except (OSError, RuntimeError) as exc:
+        print(f"cecil analyze: {exc}", file=sys.stderr)
+        return 2
+
+    if args.format == "table":
+        text = render_table(report.data, usd_decimals=max(0, args.usd_decimals))
+    else:
+        text = get_serializer().dumps_text(report.data, indent=2, sort_keys=True)
+    if args.output:
+        destination = Path(args.output)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_text(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parser().parse_args(argv)
+    if args.command == "analyze":
+        return _analyze(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
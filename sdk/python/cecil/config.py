@@ -36,6 +36,27 @@ class ObserverConfig:
     history_size: int
     savings_factor: float
     savings_min_similarity: float
+    deferred_analysis: bool = False
+    analysis_queue_size: int = 1024
+    telemetry_batch_size: int = 1
+    telemetry_batch_interval_ms: int = 50
+    telemetry_batch_format: str = "ndjson"
+    telemetry_gzip: bool = True
+    telemetry_pool_size: int = 2
+    telemetry_workers: int = 1
+    telemetry_transport: str = "thread"
+    analysis_max_chars: int = 0
+    analysis_cache_bytes: int = 8 * 1024 * 1024
+    prefix_hash_algorithm: str = "sha256"
+    prefix_hash_key: str | None = None
+    prefix_hash_blocks: int = 3
+    prefix_hash_chunking: str = "fixed"
+    prefix_index_entries: int = 1024
+    json_backend: str = "auto"
+    telemetry_spool_dir: str | None = None
+    telemetry_spool_max_bytes: int = 64 * 1024 * 1024
+    telemetry_spool_segment_bytes: int = 1024 * 1024
+    telemetry_spool_fsync_ms: int = 200
 
     @property
     def local_only(self) -> bool:
@@ -59,6 +80,36 @@ def load_config() -> ObserverConfig:
     history_raw = os.getenv("CECIL_HISTORY_SIZE", "512")
     savings_factor_raw = os.getenv("CECIL_SAVINGS_FACTOR", "0.3")
     savings_min_similarity_raw = os.getenv("CECIL_SAVINGS_MIN_SIMILARITY", "0.15")
+    deferred_analysis = _read_bool("CECIL_DEFERRED_ANALYSIS", False)
+    analysis_queue_raw = os.getenv("CECIL_ANALYSIS_QUEUE_SIZE", "1024")
+    batch_size_raw = os.getenv("CECIL_TELEMETRY_BATCH_SIZE", "1")
+    batch_interval_raw = os.getenv("CECIL_TELEMETRY_BATCH_INTERVAL_MS", "50")
+    raw_batch_format = os.getenv("CECIL_TELEMETRY_BATCH_FORMAT", "ndjson").strip().lower()
+    batch_format = raw_batch_format if raw_batch_format in {"ndjson", "json"} else "ndjson"
+    telemetry_gzip = _read_bool("CECIL_TELEMETRY_GZIP", True)
+    pool_size_raw = os.getenv("CECIL_TELEMETRY_POOL_SIZE", "2")
+    workers_raw = os.getenv("CECIL_TELEMETRY_WORKERS", "1")
+    raw_transport = os.getenv("CECIL_TELEMETRY_TRANSPORT", "thread").strip().lower()
+    telemetry_transport = raw_transport if raw_transport in {"thread", "asyncio"} else "thread"
+    analysis_max_chars_raw = os.getenv("CECIL_ANALYSIS_MAX_CHARS", "0")
+    analysis_cache_raw = os.getenv("CECIL_ANALYSIS_CACHE_BYTES", str(8 * 1024 * 1024))
+    raw_prefix_hash = os.getenv("CECIL_PREFIX_HASH", "sha256").strip().lower()
+    prefix_hash_algorithm = (
+        raw_prefix_hash if raw_prefix_hash in {"sha256", "blake2b"} else "sha256"
+    )
+    prefix_hash_key = os.getenv("CECIL_PREFIX_HASH_KEY") or None
+    prefix_hash_blocks_raw = os.getenv("CECIL_PREFIX_HASH_BLOCKS", "3")
+    raw_chunking = os.getenv("CECIL_PREFIX_HASH_CHUNKING", "fixed").strip().lower()
+    prefix_hash_chunking = raw_chunking if raw_chunking in {"fixed", "cdc"} else "fixed"
+    prefix_index_raw = os.getenv("CECIL_PREFIX_INDEX_ENTRIES", "1024")
+    spool_dir = os.getenv("CECIL_TELEMETRY_SPOOL_DIR") or None
+    spool_max_bytes_raw = os.getenv("CECIL_TELEMETRY_SPOOL_MAX_BYTES", str(64 * 1024 * 1024))
+    spool_segment_bytes_raw = os.getenv("CECIL_TELEMETRY_SPOOL_SEGMENT_BYTES", str(1024 * 1024))
+    spool_fsync_raw = os.getenv("CECIL_TELEMETRY_SPOOL_FSYNC_MS", "200")
+    raw_json_backend = os.getenv("CECIL_JSON_BACKEND", "auto").strip().lower()
+    json_backend = (
+        raw_json_backend if raw_json_backend in {"auto", "orjson", "msgspec", "json"} else "auto"
+    )
 
     try:
         queue_size = max(1, int(queue_size_raw))
@@ -84,6 +135,57 @@ def load_config() -> ObserverConfig:
         savings_min_similarity = max(0.0, min(1.0, float(savings_min_similarity_raw)))
     except ValueError:
         savings_min_similarity = 0.15
+    try:
+        analysis_queue_size = max(1, int(analysis_queue_raw))
+    except ValueError:
+        analysis_queue_size = 1024
+    try:
+        telemetry_batch_size = max(1, int(batch_size_raw))
+    except ValueError:
+        telemetry_batch_size = 1
+    try:
+        telemetry_batch_interval_ms = max(0, int(batch_interval_raw))
+    except ValueError:
+        telemetry_batch_interval_ms = 50
+    try:
+        telemetry_pool_size = max(1, int(pool_size_raw))
+    except ValueError:
+        telemetry_pool_size = 2
+    try:
+        telemetry_workers = max(1, min(16, int(workers_raw)))
+    except ValueError:
+        telemetry_workers = 1
+    try:
+        # 0 analyzes the whole prompt.
+        analysis_max_chars = max(0, int(analysis_max_chars_raw))
+    except ValueError:
+        analysis_max_chars = 0
+    try:
+        # 0 disables the analysis cache.
+        analysis_cache_bytes = max(0, int(analysis_cache_raw))
+    except ValueError:
+        analysis_cache_bytes = 8 * 1024 * 1024
+    try:
+        prefix_hash_blocks = max(1, min(256, int(prefix_hash_blocks_raw)))
+    except ValueError:
+        prefix_hash_blocks = 3
+    try:
+        # 0 compares each prompt with the model's previous one only.
+        prefix_index_entries = max(0, int(prefix_index_raw))
+    except ValueError:
+        prefix_index_entries = 1024
+    try:
+        telemetry_spool_max_bytes = max(1024, int(spool_max_bytes_raw))
+    except ValueError:
+        telemetry_spool_max_bytes = 64 * 1024 * 1024
+    try:
+        telemetry_spool_segment_bytes = max(1024, int(spool_segment_bytes_raw))
+    except ValueError:
+        telemetry_spool_segment_bytes = 1024 * 1024
+    try:
+        telemetry_spool_fsync_ms = max(0, int(spool_fsync_raw))
+    except ValueError:
+        telemetry_spool_fsync_ms = 200
 
     if not enabled:
         api_key = None
@@ -104,4 +206,25 @@ def load_config() -> ObserverConfig:
         history_size=history_size,
         savings_factor=savings_factor,
         savings_min_similarity=savings_min_similarity,
+        deferred_analysis=deferred_analysis,
+        analysis_queue_size=analysis_queue_size,
+        telemetry_batch_size=telemetry_batch_size,
+        telemetry_batch_interval_ms=telemetry_batch_interval_ms,
+        telemetry_batch_format=batch_format,
+        telemetry_gzip=telemetry_gzip,
+        telemetry_pool_size=telemetry_pool_size,
+        telemetry_workers=telemetry_workers,
+        telemetry_transport=telemetry_transport,
+        analysis_max_chars=analysis_max_chars,
+        analysis_cache_bytes=analysis_cache_bytes,
+        prefix_hash_algorithm=prefix_hash_algorithm,
+        prefix_hash_key=prefix_hash_key,
+        prefix_hash_blocks=prefix_hash_blocks,
+        prefix_hash_chunking=prefix_hash_chunking,
+        prefix_index_entries=prefix_index_entries,
+        json_backend=json_backend,
+        telemetry_spool_dir=spool_dir,
+        telemetry_spool_max_bytes=telemetry_spool_max_bytes,
+        telemetry_spool_segment_bytes=telemetry_spool_segment_bytes,
+        telemetry_spool_fsync_ms=telemetry_spool_fsync_ms,
     )
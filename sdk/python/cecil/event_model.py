@@ -4,15 +4,29 @@ import threading
 import time
 import uuid
 from collections import OrderedDict
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, replace
 
-from cecil.cache_analysis import detect_cache_breakers, prefix_similarity_score
-from cecil.canonicalize import canonicalize_prompt
+from cecil.cache_analysis import (
+    EXACT_PREFIX_CHARS,
+    Breaker,
+    Conversation,
+    MessagePrint,
+    PromptFingerprint,
+    conversation_common_prefix,
+    fingerprint_common_prefix,
+    message_chain,
+    message_markers,
+    prefix_chain,
+    shared_messages,
+)
 from cecil.config import ObserverConfig
-from cecil.cost import estimate_cost_usd
-from cecil.privacy import hash_prefix_blocks, redact_snippet
+from cecil.cost import CostEstimate, estimate_cost_usd
+from cecil.model_names import normalize_model
+from cecil.privacy import PrefixHasher, prefix_hasher, redact_snippet
 from cecil.recommendations import build_recommendation
-from cecil.savings import estimate_cache_savings
+from cecil.savings import SavingsEstimate, estimate_cache_savings
+from cecil.scanner import _FINDINGS, ScanCache, ScanCacheCounters
+from cecil.serialization import get_serializer
 
 
 @dataclass
@@ -24,40 +38,130 @@ class EventContext:
     completion_tokens: int
     latency_ms: int
     cache_control_position: int | None = None
+    timestamp_ms: int | None = None
+    time_to_first_token_ms: int | None = None
+    # Text of each message when the prompt came from a message list; prompt is then these
+    # joined by newlines.
+    messages: list[str] | None = None
 
 
 class PrefixHistory:
-    def __init__(self, max_models: int = 512) -> None:
+    # The latest prompt per model, plus an LRU index of the block chains of recent prompts so
+    # a prompt is also compared with the recent one it shares the most leading blocks with.
+    # Interleaved workflows on one model then still see their own reuse.
+    def __init__(self, max_models: int = 512, index_entries: int = 1024) -> None:
         self._max_models = max(1, max_models)
-        self._by_model: OrderedDict[str, str] = OrderedDict()
+        self._by_model: OrderedDict[str, PromptFingerprint | Conversation] = OrderedDict()
+        self._index_entries = max(0, index_entries)
+        self._index: OrderedDict[int, PromptFingerprint | Conversation] = OrderedDict()
         self._lock = threading.Lock()
 
     def similarity(self, model: str, canonical_prompt: str) -> float:
+        # Hash outside the lock; only the block comparison runs while holding it.
+        current = PromptFingerprint(canonical_prompt, EXACT_PREFIX_CHARS)
+        keys = prefix_chain(model, current) if self._index_entries else []
         with self._lock:
-            previous = self._by_model.get(model, "")
-            if model in self._by_model:
-                self._by_model.pop(model)
-            self._by_model[model] = canonical_prompt
-            if len(self._by_model) > self._max_models:
-                self._by_model.popitem(last=False)
-        return prefix_similarity_score(previous, canonical_prompt)
+            previous = self._remember(model, current)
+            recent = self._lookup(keys, current)
+            best = 0.0
+            divergence = 0
+            candidates = (previous,) if recent is previous else (previous, recent)
+            for candidate in candidates:
+                if not isinstance(candidate, PromptFingerprint):
+                    continue
+                common = fingerprint_common_prefix(candidate, current, canonical_prompt)
+                shorter = min(candidate.length, current.length)
+                score = round(common / shorter, 4) if shorter else 0.0
+                # The hot block follows the comparison that scored, the latest prompt on ties.
+                if candidate is previous or score > best:
+                    best, divergence = score, common
+            current.remember_divergence(canonical_prompt, divergence)
+        return best
+
+    def latest(self, model: str) -> PromptFingerprint | Conversation | None:
+        # Unlocked peek, used to reuse the previous call's message prints.
+        return self._by_model.get(model)
+
+    def conversation_similarity(
+        self, model: str, current: Conversation, basis: Conversation | None, shared: int
+    ) -> float:
+        # `current` was built on top of `basis`, sharing its first `shared` messages. Prints are
+        # immutable, so the comparison runs outside the lock. A model whose previous call was
+        # a flat prompt starts over.
+        keys = message_chain((model, "messages"), current.prints) if self._index_entries else []
+        with self._lock:
+            previous = self._remember(model, current)
+            recent = self._lookup(keys, current)
+        best = 0.0
+        if isinstance(previous, Conversation):
+            if previous is not basis:
+                shared = shared_messages(previous.markers, current.markers)
+            best = _conversation_score(previous, current, shared)
+        if isinstance(recent, Conversation) and recent is not previous:
+            best = max(best, _conversation_score(recent, current, 0))
+        return best
+
+    def _remember(
+        self, model: str, current: PromptFingerprint | Conversation
+    ) -> PromptFingerprint | Conversation | None:
+        previous = self._by_model.pop(model, None)
+        self._by_model[model] = current
+        if len(self._by_model) > self._max_models:
+            self._by_model.popitem(last=False)
+        return previous
+
+    def _lookup(
+        self, keys: list[int], current: PromptFingerprint | Conversation
+    ) -> PromptFingerprint | Conversation | None:
+        # The recent entry with the longest matching chain, then `current` takes over every
+        # key of its chain. Keys are refreshed deepest first, so eviction trims the deep end
+        # of old chains before their shared heads.
+        index = self._index
+        found = None
+        for key in keys:
+            entry = index.get(key)
+            if entry is None:
+                break
+            found = entry
+        for key in reversed(keys):
+            index[key] = current
+            index.move_to_end(key)
+        while len(index) > self._index_entries:
+            index.popitem(last=False)
+        return found
 
     def size(self) -> int:
         with self._lock:
             return len(self._by_model)
 
 
-_HISTORY_BY_SIZE: dict[int, PrefixHistory] = {}
+def _conversation_score(previous: Conversation, current: Conversation, shared: int) -> float:
+    shorter = min(previous.length, current.length)
+    if not shorter:
+        return 0.0
+    return round(conversation_common_prefix(previous, current, shared) / shorter, 4)
+
+
+# Normally one config (so one size) per process; the cap keeps callers that vary history_size
+# from growing a history per size.
+_MAX_HISTORIES = 4
+_HISTORY_BY_SIZE: OrderedDict[tuple[int, int], PrefixHistory] = OrderedDict()
 _HISTORY_LOCK = threading.Lock()
 
 
-def _history_for_size(history_size: int) -> PrefixHistory:
-    normalized = max(1, history_size)
+def _history_for_size(
+    history_size: int, index_entries: int = ObserverConfig.prefix_index_entries
+) -> PrefixHistory:
+    normalized = (max(1, history_size), max(0, index_entries))
     with _HISTORY_LOCK:
         history = _HISTORY_BY_SIZE.get(normalized)
         if history is None:
-            history = PrefixHistory(max_models=normalized)
+            history = PrefixHistory(*normalized)
             _HISTORY_BY_SIZE[normalized] = history
+            if len(_HISTORY_BY_SIZE) > _MAX_HISTORIES:
+                _HISTORY_BY_SIZE.popitem(last=False)
+        else:
+            _HISTORY_BY_SIZE.move_to_end(normalized)
     return history
 
 
@@ -66,10 +170,255 @@ def reset_history() -> None:
         _HISTORY_BY_SIZE.clear()
 
 
-def build_event(context: EventContext, config: ObserverConfig) -> dict[str, object]:
-    canonical_prompt = canonicalize_prompt(context.prompt)
-    similarity = _history_for_size(config.history_size).similarity(context.model, canonical_prompt)
-    breakers = detect_cache_breakers(context.prompt)
+# One process-wide cache; its byte budget follows the config of the latest call.
+_SCAN_CACHE = ScanCache(ObserverConfig.analysis_cache_bytes)
+
+
+def analysis_cache_counters() -> ScanCacheCounters:
+    with _SCAN_CACHE._lock:
+        return replace(_SCAN_CACHE.counters)
+
+
+def reset_analysis_cache() -> None:
+    _SCAN_CACHE.clear()
+
+
+class Event:
+    # Flat, slotted record of one analyzed call. The nested wire payload (and the
+    # recommendation derived from it) is only materialized by to_dict().
+    __slots__ = (
+        "event_id",
+        "timestamp_ms",
+        "provider",
+        "model",
+        "prompt_tokens",
+        "completion_tokens",
+        "latency_ms",
+        "time_to_first_token_ms",
+        "cost",
+        "prefix_hash_blocks",
+        "prefix_similarity",
+        "truncated",
+        "analyzed_chars",
+        "prompt_chars",
+        "savings",
+        "breakers",
+        "cache_control_position",
+        "privacy_mode",
+        "redaction_mode",
+        "snippet",
+        "json_backend",
+    )
+
+    def __init__(
+        self,
+        *,
+        event_id: str,
+        timestamp_ms: int,
+        provider: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: int,
+        time_to_first_token_ms: int | None,
+        cost: CostEstimate,
+        prefix_hash_blocks: list[str],
+        prefix_similarity: float,
+        truncated: bool,
+        analyzed_chars: int,
+        prompt_chars: int,
+        savings: SavingsEstimate,
+        breakers: list[Breaker],
+        cache_control_position: int | None,
+        privacy_mode: str,
+        redaction_mode: str,
+        snippet: str | None,
+        json_backend: str = "auto",
+    ) -> None:
+        self.event_id = event_id
+        self.timestamp_ms = timestamp_ms
+        self.provider = provider
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency_ms = latency_ms
+        self.time_to_first_token_ms = time_to_first_token_ms
+        self.cost = cost
+        self.prefix_hash_blocks = prefix_hash_blocks
+        self.prefix_similarity = prefix_similarity
+        self.truncated = truncated
+        self.analyzed_chars = analyzed_chars
+        self.prompt_chars = prompt_chars
+        self.savings = savings
+        self.breakers = breakers
+        self.cache_control_position = cache_control_position
+        self.privacy_mode = privacy_mode
+        self.redaction_mode = redaction_mode
+        self.snippet = snippet
+        self.json_backend = json_backend
+
+    def to_dict(self) -> dict[str, object]:
+        savings = self.savings
+        payload: dict[str, object] = {
+            "schema_version": "v1",
+            "event_id": self.event_id,
+            "timestamp_ms": self.timestamp_ms,
+            "provider": self.provider,
+            "model": self.model,
+            "token_counts": {
+                "prompt": self.prompt_tokens,
+                "completion": self.completion_tokens,
+                "total": self.prompt_tokens + self.completion_tokens,
+            },
+            "latency_ms": self.latency_ms,
+            "time_to_first_token_ms": self.time_to_first_token_ms,
+            "cost_estimate_usd": self.cost.usd,
+            "cost_label": self.cost.label,
+            "pricing": {
+                "version": self.cost.pricing_version,
+                "source": self.cost.pricing_source,
+            },
+            "prefix_hash_blocks": list(self.prefix_hash_blocks),
+            "prefix_similarity": self.prefix_similarity,
+            "analysis": {
+                "truncated": self.truncated,
+                "analyzed_chars": self.analyzed_chars,
+                "prompt_chars": self.prompt_chars,
+            },
+            "cache_savings_estimate_usd": savings.estimated_usd,
+            "cache_savings": {
+                "estimated_usd": savings.estimated_usd,
+                "low_usd": savings.low_usd,
+                "high_usd": savings.high_usd,
+                "confidence": savings.confidence,
+            },
+            "cache_breakers": [
+                {"category": b.category, "confidence": b.confidence, "hint": b.hint}
+                for b in self.breakers
+            ],
+            "cache_boundary": {
+                "present": self.cache_control_position is not None,
+                "position": self.cache_control_position,
+            },
+            "privacy": {
+                "mode": self.privacy_mode,
+                "redaction_mode": self.redaction_mode,
+                "snippet": self.snippet,
+            },
+        }
+        payload["recommendation"] = build_recommendation(payload)
+        return payload
+
+    def to_json(self) -> str:
+        return get_serializer(self.json_backend).dumps(self.to_dict()).decode("utf-8")
+
+
+def _canonical_prefix(texts: list[str], prints: tuple[MessagePrint, ...], span: int) -> str:
+    # The first `span` characters of the space-joined canonical messages. A message print holds
+    # the head of its canonical text (see MessagePrint.at_offset); longer messages are
+    # rescanned, which the analysis cache mostly serves.
+    parts: list[str] = []
+    length = 0
+    for text, message in zip(texts, prints):
+        if not message.length:
+            continue
+        head = message.fingerprint.head
+        if message.length > len(head) and span - length > len(head):
+            head = _SCAN_CACHE.scan(text)[0]
+        parts.append(head)
+        length += message.length + 1
+        if length > span:
+            break
+    return " ".join(parts)
+
+
+def _analyzed_messages(messages: list[str], max_chars: int) -> list[str]:
+    # The messages that make up prompt[:max_chars] of the newline-joined prompt.
+    if max_chars <= 0:
+        return messages
+    analyzed: list[str] = []
+    remaining = max_chars
+    for text in messages:
+        if remaining <= 0:
+            break
+        analyzed.append(text if len(text) <= remaining else text[:remaining])
+        remaining -= len(text) + 1
+    return analyzed
+
+
+def _conversation(
+    texts: list[str], basis: Conversation | None, hasher: PrefixHasher
+) -> tuple[Conversation, int]:
+    # Messages shared with the model's previous call reuse its prints and offsets; the rest
+    # come from the analysis cache. A new turn therefore costs only its new messages.
+    markers = message_markers(texts)
+    shared = shared_messages(basis.markers, markers) if basis is not None else 0
+    if basis is not None and shared:
+        prints = list(basis.prints[:shared])
+        offsets = basis.offsets[: shared + 1]
+        if shared == len(basis.prints):
+            categories = set(basis.categories)
+        else:
+            categories = set().union(*(message.categories for message in prints))
+    else:
+        prints, offsets, categories = [], [0], set()
+    for text in texts[shared:]:
+        message = _SCAN_CACHE.message(text).at_offset(offsets[-1])
+        prints.append(message)
+        offsets.append(offsets[-1] + message.length + 1 if message.length else offsets[-1])
+        categories.update(message.categories)
+    conversation = Conversation(markers, tuple(prints), offsets, frozenset(categories))
+
+    # The hashed prefix is unchanged when the shared messages already cover it.
+    if (
+        basis is not None
+        and basis.hasher is hasher
+        and (offsets[shared] > hasher.span or shared == len(texts) == len(basis.markers))
+    ):
+        conversation.hash_blocks = basis.hash_blocks
+    else:
+        prefix = _canonical_prefix(texts, conversation.prints, hasher.span)
+        conversation.hash_blocks = _SCAN_CACHE.blocks(hasher, prefix)
+    conversation.hasher = hasher
+    return conversation, shared
+
+
+def build_event_record(
+    context: EventContext, config: ObserverConfig, history: PrefixHistory | None = None
+) -> Event:
+    # Only the leading region can be served from a provider cache, so a bounded prefix keeps
+    # worst-case analysis cost fixed while hashes and similarity stay comparable.
+    prompt_chars = len(context.prompt)
+    max_chars = config.analysis_max_chars
+    truncated = 0 < max_chars < prompt_chars
+    if _SCAN_CACHE.max_bytes != config.analysis_cache_bytes:
+        _SCAN_CACHE.resize(config.analysis_cache_bytes)
+    if history is None:
+        history = _history_for_size(config.history_size, config.prefix_index_entries)
+    hasher = prefix_hasher(
+        config.prefix_hash_algorithm,
+        config.prefix_hash_key,
+        config.prefix_hash_blocks,
+        config.prefix_hash_chunking,
+    )
+    model = normalize_model(context.model)
+    if context.messages is not None:
+        latest = history.latest(model)
+        basis = latest if isinstance(latest, Conversation) else None
+        conversation, shared = _conversation(
+            _analyzed_messages(context.messages, max_chars), basis, hasher
+        )
+        found = conversation.categories
+        breakers = [finding for category, finding in _FINDINGS if category in found]
+        similarity = history.conversation_similarity(model, conversation, basis, shared)
+        hash_blocks = conversation.hash_blocks
+        analyzed_chars = max_chars if truncated else prompt_chars
+    else:
+        analyzed = context.prompt[:max_chars] if truncated else context.prompt
+        canonical_prompt, breakers = _SCAN_CACHE.scan(analyzed)
+        similarity = history.similarity(model, canonical_prompt)
+        hash_blocks = _SCAN_CACHE.blocks(hasher, canonical_prompt)
+        analyzed_chars = len(analyzed)
 
     cost = estimate_cost_usd(
         context.model,
@@ -83,42 +432,38 @@ def build_event(context: EventContext, config: ObserverConfig) -> dict[str, obje
         min_similarity=config.savings_min_similarity,
     )
 
-    payload: dict[str, object] = {
-        "schema_version": "v1",
-        "event_id": str(uuid.uuid4()),
-        "timestamp_ms": int(time.time() * 1000),
-        "provider": context.provider,
-        "model": context.model,
-        "token_counts": {
-            "prompt": context.prompt_tokens,
-            "completion": context.completion_tokens,
-            "total": context.prompt_tokens + context.completion_tokens,
-        },
-        "latency_ms": context.latency_ms,
-        "cost_estimate_usd": cost.usd,
-        "cost_label": cost.label,
-        "pricing": {
-            "version": cost.pricing_version,
-            "source": cost.pricing_source,
-        },
-        "prefix_hash_blocks": hash_prefix_blocks(canonical_prompt),
-        "prefix_similarity": similarity,
-        "cache_savings_estimate_usd": savings.estimated_usd,
-        "cache_savings": asdict(savings),
-        "cache_breakers": [asdict(f) for f in breakers],
-        "cache_boundary": {
-            "present": context.cache_control_position is not None,
-            "position": context.cache_control_position,
-        },
-        "privacy": {
-            "mode": config.privacy_mode,
-            "redaction_mode": config.redaction_mode,
-            "snippet": redact_snippet(
-                context.prompt,
-                mode=config.redaction_mode,
-                snippets_enabled=config.snippets_enabled,
-            ),
-        },
-    }
-    payload["recommendation"] = build_recommendation(payload)
-    return payload
+    timestamp_ms = context.timestamp_ms
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+
+    return Event(
+        event_id=str(uuid.uuid4()),
+        timestamp_ms=timestamp_ms,
+        provider=context.provider,
+        model=context.model,
+        prompt_tokens=context.prompt_tokens,
+        completion_tokens=context.completion_tokens,
+        latency_ms=context.latency_ms,
+        time_to_first_token_ms=context.time_to_first_token_ms,
+        cost=cost,
+        prefix_hash_blocks=hash_blocks,
+        prefix_similarity=similarity,
+        truncated=truncated,
+        analyzed_chars=analyzed_chars,
+        prompt_chars=prompt_chars,
+        savings=savings,
+        breakers=breakers,
+        cache_control_position=context.cache_control_position,
+        privacy_mode=config.privacy_mode,
+        redaction_mode=config.redaction_mode,
+        snippet=redact_snippet(
+            context.prompt,
+            mode=config.redaction_mode,
+            snippets_enabled=config.snippets_enabled,
+        ),
+        json_backend=config.json_backend,
+    )
+
+
+def build_event(context: EventContext, config: ObserverConfig) -> dict[str, object]:
+    return build_event_record(context, config).to_dict()
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+# Deployment wrappers around a model name: "openai/gpt-4o", "us.anthropic.claude-...-v2:0"
+# (Bedrock) and "claude-...@20241022" (Vertex).
+_PATH_PREFIX_RE = re.compile(r"^.*/")
+_VENDOR_PREFIX_RE = re.compile(
+    r"^(?:[a-z]{2}\.)?(?:anthropic|openai|meta|amazon|cohere|mistral|ai21)\."
+)
+_VERSION_SUFFIX_RE = re.compile(r"(?:-v\d+(?::\d+)?)?(?:@.*)?$")
+# Snapshot suffixes: "-2024-07-18", "-20241022", "-0613", "-002", "-latest".
+_SNAPSHOT_SUFFIX_RE = re.compile(r"-(?:latest|\d{4}-\d{2}-\d{2}|\d{8}|\d{3,4})$")
+
+
+@lru_cache(maxsize=4096)
+def normalize_model(model: str) -> str:
+    # Canonical family for a model ID, so dated snapshots, fine-tunes and cloud deployment
+    # names share one key: "ft:gpt-4o-mini-2024-07-18:acme::x1" -> "gpt-4o-mini".
+    name = model.strip().lower()
+    if name.startswith("ft:"):
+        name = name[3:].split(":", 1)[0]
+    name = _PATH_PREFIX_RE.sub("", name)
+    name = _VENDOR_PREFIX_RE.sub("", name)
+    name = _VERSION_SUFFIX_RE.sub("", name)
+    # Twice for names like "claude-3-5-haiku-20241022-latest".
+    name = _SNAPSHOT_SUFFIX_RE.sub("", _SNAPSHOT_SUFFIX_RE.sub("", name))
+    return name or "unknown"
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import contextlib
+import gzip
+import importlib
+import json
+import multiprocessing
+import queue
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from typing import Any, Union
+
+from cecil.adapters.common import (
+    extract_messages,
+    extract_model,
+    extract_prompt,
+    extract_token_counts,
+)
+from cecil.analytics import DEFAULT_MAX_KEYS, UsageReport, UsageShard, build_report
+from cecil.config import ObserverConfig, load_config
+from cecil.event_model import EventContext, PrefixHistory, build_event_record
+from cecil.logging import get_logger
+from cecil.model_names import normalize_model
+
+# Records travel to workers in chunks, and each worker's inbox holds a few chunks at most, so
+# memory stays flat however large the input is.
+_CHUNK_SIZE = 256
+_INBOX_CHUNKS = 4
+# How often a full inbox is re-checked for a worker that has died and will never drain it.
+_PUT_POLL_SECONDS = 1.0
+
+_Item = Union[str, dict[str, Any]]
+
+
+@dataclass
+class _Progress:
+    records: int = 0
+    skipped: int = 0
+    # Records with no timestamp_ms or response "created"; they count toward the totals but not
+    # toward any window, so the report never depends on the wall clock.
+    undated: int = 0
+    latest_ms: int = 0
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    # OpenAI Batch API files wrap the request and response under "body".
+    if isinstance(value, dict) and isinstance(value.get("body"), dict):
+        return value["body"]
+    return value
+
+
+def _infer_provider(request: dict[str, Any], response: dict[str, Any], model: str) -> str:
+    if response.get("type") == "message" or "anthropic" in model or "claude" in model:
+        return "anthropic"
+    return "openai"
+
+
+def record_context(record: dict[str, Any]) -> EventContext | None:
+    # One recorded call: {"request": {...create() kwargs...}, "response": {...}} plus optional
+    # "provider", "latency_ms" and "timestamp_ms".
+    request = _unwrap(record.get("request"))
+    if not isinstance(request, dict):
+        return None
+    response = _unwrap(record.get("response"))
+    if not isinstance(response, dict):
+        response = {}
+
+    extracted = extract_messages(request)
+    messages: list[str] | None = None
+    if extracted is not None:
+        messages, cache_pos = extracted
+        prompt = "\n".join(messages)
+    else:
+        prompt, cache_pos = extract_prompt(request)
+    prompt_tokens, completion_tokens = extract_token_counts(response)
+    model = extract_model(request, response)
+    provider = record.get("provider")
+    if not isinstance(provider, str) or not provider:
+        provider = _infer_provider(request, response, model.lower())
+
+    timestamp_ms = record.get("timestamp_ms")
+    created = response.get("created")
+    if not isinstance(timestamp_ms, int) and isinstance(created, (int, float)):
+        timestamp_ms = int(created * 1000)
+    latency_ms = record.get("latency_ms")
+
+    return EventContext(
+        provider=provider,
+        model=model,
+        prompt=prompt,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_ms=int(latency_ms) if isinstance(latency_ms, (int, float)) else 0,
+        cache_control_position=cache_pos,
+        timestamp_ms=timestamp_ms if isinstance(timestamp_ms, int) else None,
+        messages=messages,
+    )
+
+
+def _history(config: ObserverConfig) -> PrefixHistory:
+    # Each run compares calls only with earlier calls of the same file, never with live traffic
+    # in this process.
+    return PrefixHistory(max(1, config.history_size), max(0, config.prefix_index_entries))
+
+
+def _analyze_items(
+    items: Iterable[_Item],
+    config: ObserverConfig,
+    history: PrefixHistory,
+    shard: UsageShard,
+    progress: _Progress,
+) -> None:
+    for item in items:
+        progress.records += 1
+        try:
+            record = json.loads(item) if isinstance(item, str) else item
+            context = record_context(record) if isinstance(record, dict) else None
+            if context is None:
+                progress.skipped += 1
+                continue
+            event = build_event_record(context, config, history)
+        except Exception as exc:
+            get_logger().debug("offline record skipped err=%s", type(exc).__name__)
+            progress.skipped += 1
+            continue
+        if context.timestamp_ms is None:
+            progress.undated += 1
+            shard.record(event, windowed=False)
+            continue
+        shard.record(event)
+        progress.latest_ms = max(progress.latest_ms, event.timestamp_ms)
+
+
+def _worker(
+    inbox: Any, outbox: Any, config: ObserverConfig, window_minutes: int, max_keys: int
+) -> None:
+    history = _history(config)
+    shard = UsageShard(window_minutes, max_keys)
+    progress = _Progress()
+    while True:
+        chunk = inbox.get()
+        if chunk is None:
+            break
+        _analyze_items(chunk, config, history, shard, progress)
+    outbox.put((shard.to_state(), astuple(progress)))
+
+
+def _hand_off(inbox: Any, process: Any, chunk: list[_Item] | None) -> None:
+    while True:
+        try:
+            inbox.put(chunk, timeout=_PUT_POLL_SECONDS)
+            return
+        except queue.Full:
+            if not process.is_alive():
+                # Nothing will read what is buffered; joining the feeder thread would hang.
+                inbox.cancel_join_thread()
+                raise RuntimeError(
+                    f"offline analysis worker exited unexpectedly (exit code {process.exitcode})"
+                ) from None
+
+
+def _parse(item: _Item) -> _Item:
+    # Lines are parsed once, before routing; a line that is not a JSON object is passed on as
+    # is and counted as skipped by its worker.
+    if isinstance(item, str):
+        with contextlib.suppress(ValueError):
+            record = json.loads(item)
+            if isinstance(record, dict):
+                return record
+    return item
+
+
+def _route_model(item: _Item) -> str:
+    # The same model record_context gives the event: the request's top-level field, then the
+    # response's.
+    if not isinstance(item, dict):
+        return "unknown"
+    request = _unwrap(item.get("request"))
+    response = _unwrap(item.get("response"))
+    return extract_model(request if isinstance(request, dict) else {}, response)
+
+
+def iter_records(path: str | Path) -> Iterator[_Item]:
+    source = Path(path)
+    if source.suffix == ".parquet":
+        try:
+            parquet = importlib.import_module("pyarrow.parquet")
+        except ImportError as exc:
+            raise RuntimeError("reading Parquet files requires pyarrow") from exc
+        for batch in parquet.ParquetFile(str(source)).iter_batches(batch_size=_CHUNK_SIZE):
+            yield from batch.to_pylist()
+        return
+    opener: Any = gzip.open if source.suffix == ".gz" else open
+    with opener(source, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield line
+
+
+def analyze_file(
+    path: str | Path,
+    workers: int = 1,
+    config: ObserverConfig | None = None,
+    window_minutes: int = 60,
+    max_keys: int = DEFAULT_MAX_KEYS,
+    usd_decimals: int = 8,
+) -> UsageReport:
+    config = config or load_config()
+    records = iter_records(path)
+    if workers <= 1:
+        shard = UsageShard(window_minutes, max_keys)
+        progress = _Progress()
+        _analyze_items(records, config, _history(config), shard, progress)
+        results = [(shard, progress)]
+    else:
+        results = _analyze_in_pool(records, workers, config, window_minutes, max_keys)
+
+    merged = UsageShard(window_minutes, max_keys)
+    total = _Progress()
+    for shard, progress in results:
+        merged.merge(shard)
+        total.records += progress.records
+        total.skipped += progress.skipped
+        total.undated += progress.undated
+        total.latest_ms = max(total.latest_ms, progress.latest_ms)
+
+    # Windows are anchored at the newest recorded call rather than at the wall clock.
+    data = build_report(merged, 0, 0, usd_decimals, now_ms=total.latest_ms or None)
+    data["input"] = {
+        "path": str(path),
+        "records": total.records,
+        "skipped": total.skipped,
+        "undated": total.undated,
+    }
+    return UsageReport(data=data)
+
+
+def _analyze_in_pool(
+    records: Iterator[_Item],
+    workers: int,
+    config: ObserverConfig,
+    window_minutes: int,
+    max_keys: int,
+) -> list[tuple[UsageShard, _Progress]]:
+    # Every model family is pinned to one worker, so its prefix history sees its calls in file
+    # order, exactly as a single process would.
+    context = multiprocessing.get_context("spawn")
+    outbox = context.Queue()
+    inboxes = [context.Queue(maxsize=_INBOX_CHUNKS) for _ in range(workers)]
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(inbox, outbox, config, window_minutes, max_keys),
+            name=f"cecil-analyze-{index}",
+            daemon=True,
+        )
+        for index, inbox in enumerate(inboxes)
+    ]
+    for process in processes:
+        process.start()
+
+    pending: list[list[_Item]] = [[] for _ in range(workers)]
+    try:
+        for item in map(_parse, records):
+            family = normalize_model(_route_model(item))
+            index = zlib.crc32(family.encode("utf-8")) % workers
+            chunk = pending[index]
+            chunk.append(item)
+            if len(chunk) >= _CHUNK_SIZE:
+                _hand_off(inboxes[index], processes[index], chunk)
+                pending[index] = []
+        for index, chunk in enumerate(pending):
+            if chunk:
+                _hand_off(inboxes[index], processes[index], chunk)
+    finally:
+        for inbox, process in zip(inboxes, processes):
+            # A dead worker needs no sentinel; the error that brought us here wins.
+            with contextlib.suppress(RuntimeError):
+                _hand_off(inbox, process, None)
+
+    results: list[tuple[UsageShard, _Progress]] = []
+    for _ in processes:
+        try:
+            state, progress = outbox.get(timeout=600)
+        except queue.Empty as exc:
+            raise RuntimeError("offline analysis worker did not finish") from exc
+        results.append((UsageShard.from_state(state), _Progress(*progress)))
+    for process in processes:
+        process.join(timeout=5)
+    return results
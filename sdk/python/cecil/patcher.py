@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import queue
 import threading
+import time
 from dataclasses import dataclass
-from typing import Callable
+from typing import Callable, Generic, TypeVar
 
-from cecil.adapters.anthropic_adapter import patch_anthropic
-from cecil.adapters.openai_adapter import patch_openai
+from cecil.adapters.anthropic_adapter import patch_anthropic, patch_anthropic_async
+from cecil.adapters.openai_adapter import patch_openai, patch_openai_async
+from cecil.async_telemetry import AsyncTelemetryClient
 from cecil.config import ObserverConfig, load_config
+from cecil.event_model import Event
 from cecil.logging import get_logger
-from cecil.telemetry import TelemetryClient
+from cecil.pipeline import AnalysisPipeline
+from cecil.telemetry import TelemetryClient, TelemetrySink
 
 
 @dataclass(frozen=True)
@@ -16,53 +22,169 @@ class PatchResult:
     openai_patched: bool
     anthropic_patched: bool
     telemetry_enabled: bool
+    openai_async_patched: bool = False
+    anthropic_async_patched: bool = False
 
 
-_TELEMETRY: TelemetryClient | None = None
+_TELEMETRY: TelemetrySink | None = None
+_PIPELINE: AnalysisPipeline | None = None
 _OPENAI_PATCHED = False
 _ANTHROPIC_PATCHED = False
+_OPENAI_ASYNC_PATCHED = False
+_ANTHROPIC_ASYNC_PATCHED = False
 _EVENT_LISTENERS: dict[int, Callable[[dict[str, object]], None]] = {}
+_RECORD_LISTENERS: dict[int, Callable[[Event], None]] = {}
+# Writers update the dicts under the lock and then publish fresh tuples; emit_event only reads
+# the tuples, so the hot path never takes the lock.
+_EVENT_DISPATCH: tuple[Callable[[dict[str, object]], None], ...] = ()
+_RECORD_DISPATCH: tuple[Callable[[Event], None], ...] = ()
 _EVENT_LISTENER_LOCK = threading.Lock()
 _NEXT_LISTENER_ID = 1
+_DELIVERY_MODES = {"inline", "async"}
+_STOP = object()
 
+_T = TypeVar("_T")
 
-def register_event_listener(listener: Callable[[dict[str, object]], None]) -> int:
+
+class _AsyncListener(Generic[_T]):
+    # Runs one listener on its own thread so a slow callback never delays provider calls.
+    def __init__(self, listener: Callable[[_T], None], queue_size: int) -> None:
+        self._listener = listener
+        self._queue: queue.Queue[object] = queue.Queue(maxsize=max(1, queue_size))
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="cecil-sdk-listener", daemon=True)
+        self._thread.start()
+
+    def __call__(self, value: _T) -> None:
+        try:
+            self._queue.put_nowait(value)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def stop(self, timeout: float) -> None:
+        deadline = time.monotonic() + max(0.0, timeout)
+        try:
+            self._queue.put(_STOP, timeout=max(0.0, timeout))
+        except queue.Full:
+            return
+        self._thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def _run(self) -> None:
+        while True:
+            value = self._queue.get()
+            if value is _STOP:
+                return
+            try:
+                self._listener(value)  # type: ignore[arg-type]
+            except Exception as exc:
+                get_logger().debug("local event listener failed err=%s", type(exc).__name__)
+
+
+def _wrap(listener: Callable[[_T], None], delivery: str, queue_size: int) -> Callable[[_T], None]:
+    if delivery not in _DELIVERY_MODES:
+        raise ValueError(f"unknown listener delivery mode: {delivery}")
+    if delivery == "async":
+        return _AsyncListener(listener, queue_size)
+    return listener
+
+
+def _publish() -> None:
+    global _EVENT_DISPATCH, _RECORD_DISPATCH
+    _EVENT_DISPATCH = tuple(_EVENT_LISTENERS.values())
+    _RECORD_DISPATCH = tuple(_RECORD_LISTENERS.values())
+
+
+def register_event_listener(
+    listener: Callable[[dict[str, object]], None],
+    delivery: str = "inline",
+    queue_size: int = 1024,
+) -> int:
     global _NEXT_LISTENER_ID
+    wrapped = _wrap(listener, delivery, queue_size)
     with _EVENT_LISTENER_LOCK:
         listener_id = _NEXT_LISTENER_ID
         _NEXT_LISTENER_ID += 1
-        _EVENT_LISTENERS[listener_id] = listener
+        _EVENT_LISTENERS[listener_id] = wrapped
+        _publish()
     return listener_id
 
 
-def unregister_event_listener(listener_id: int) -> None:
+def register_record_listener(
+    listener: Callable[[Event], None],
+    delivery: str = "inline",
+    queue_size: int = 1024,
+) -> int:
+    # Record listeners get the slotted Event itself; no payload dict is built for them.
+    global _NEXT_LISTENER_ID
+    wrapped = _wrap(listener, delivery, queue_size)
     with _EVENT_LISTENER_LOCK:
-        _EVENT_LISTENERS.pop(listener_id, None)
+        listener_id = _NEXT_LISTENER_ID
+        _NEXT_LISTENER_ID += 1
+        _RECORD_LISTENERS[listener_id] = wrapped
+        _publish()
+    return listener_id
 
 
-def emit_event(event: dict[str, object], telemetry: TelemetryClient) -> None:
-    logger = get_logger()
+def unregister_event_listener(listener_id: int, timeout: float = 1.0) -> None:
     with _EVENT_LISTENER_LOCK:
-        listeners = list(_EVENT_LISTENERS.values())
+        removed: object = _EVENT_LISTENERS.pop(listener_id, None)
+        removed = _RECORD_LISTENERS.pop(listener_id, None) or removed
+        _publish()
+    if isinstance(removed, _AsyncListener):
+        # Deliver what is already queued so callers can read final state after unregistering.
+        removed.stop(timeout)
+
+
+def emit_event(event: Event, telemetry: TelemetrySink) -> None:
+    logger = get_logger()
+    record_listeners = _RECORD_DISPATCH
+    listeners = _EVENT_DISPATCH
+
+    for record_listener in record_listeners:
+        try:
+            record_listener(event)
+        except Exception as exc:
+            logger.debug("local event listener failed err=%s", type(exc).__name__)
 
+    if not listeners:
+        # The sink builds the payload itself, and only for events it will actually send.
+        telemetry.emit(event)
+        return
+
+    # Dict listeners and the telemetry sink share one materialized payload.
+    payload = event.to_dict()
     for listener in listeners:
         try:
-            listener(event)
+            listener(payload)
         except Exception as exc:
             logger.debug("local event listener failed err=%s", type(exc).__name__)
 
-    telemetry.emit(event)
+    telemetry.emit(payload)
+
+
+def analysis_pipeline() -> AnalysisPipeline | None:
+    return _PIPELINE
 
 
 def patch(config: ObserverConfig | None = None) -> PatchResult:
-    global _TELEMETRY, _OPENAI_PATCHED, _ANTHROPIC_PATCHED
+    global _TELEMETRY, _PIPELINE, _OPENAI_PATCHED, _ANTHROPIC_PATCHED
+    global _OPENAI_ASYNC_PATCHED, _ANTHROPIC_ASYNC_PATCHED
     logger = get_logger()
 
     if config is None:
         config = load_config()
 
     if _TELEMETRY is None:
-        _TELEMETRY = TelemetryClient(config)
+        if config.telemetry_transport == "asyncio":
+            _TELEMETRY = AsyncTelemetryClient(config)
+        else:
+            _TELEMETRY = TelemetryClient(config)
+
+    if config.deferred_analysis and _PIPELINE is None:
+        telemetry = _TELEMETRY
+        _PIPELINE = AnalysisPipeline(config, emit=lambda event: emit_event(event, telemetry))
 
     if not _OPENAI_PATCHED:
         try:
@@ -76,20 +198,72 @@ def patch(config: ObserverConfig | None = None) -> PatchResult:
         except Exception as exc:
             logger.debug("anthropic patch failed err=%s", type(exc).__name__)
 
+    if not _OPENAI_ASYNC_PATCHED:
+        try:
+            _OPENAI_ASYNC_PATCHED = patch_openai_async(config, _TELEMETRY)
+        except Exception as exc:
+            logger.debug("openai async patch failed err=%s", type(exc).__name__)
+
+    if not _ANTHROPIC_ASYNC_PATCHED:
+        try:
+            _ANTHROPIC_ASYNC_PATCHED = patch_anthropic_async(config, _TELEMETRY)
+        except Exception as exc:
+            logger.debug("anthropic async patch failed err=%s", type(exc).__name__)
+
     return PatchResult(
         openai_patched=_OPENAI_PATCHED,
         anthropic_patched=_ANTHROPIC_PATCHED,
         telemetry_enabled=not config.local_only,
+        openai_async_patched=_OPENAI_ASYNC_PATCHED,
+        anthropic_async_patched=_ANTHROPIC_ASYNC_PATCHED,
     )
 
 
 def shutdown(timeout: float = 1.0, drain: bool = True) -> None:
-    global _TELEMETRY, _OPENAI_PATCHED, _ANTHROPIC_PATCHED, _NEXT_LISTENER_ID
+    global _TELEMETRY, _PIPELINE
+    deadline = time.monotonic() + max(0.0, timeout)
+    if _PIPELINE is not None:
+        # Stop analysis first so drained contexts still reach listeners and telemetry.
+        _PIPELINE.stop(timeout=timeout, drain=drain)
+    _PIPELINE = None
     if _TELEMETRY is not None:
-        _TELEMETRY.stop(timeout=timeout, drain=drain)
+        _TELEMETRY.stop(timeout=max(0.0, deadline - time.monotonic()), drain=drain)
     _TELEMETRY = None
+    _reset(deadline)
+
+
+async def ashutdown(timeout: float = 1.0, drain: bool = True) -> None:
+    # shutdown() for code running on an event loop (for example a lifespan hook): an asyncio
+    # client bound to this loop is drained by awaiting it, and blocking steps run in the
+    # default executor so the loop keeps serving the sends.
+    global _TELEMETRY, _PIPELINE
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + max(0.0, timeout)
+    pipeline, _PIPELINE = _PIPELINE, None
+    if pipeline is not None:
+        await loop.run_in_executor(None, lambda: pipeline.stop(timeout=timeout, drain=drain))
+    telemetry, _TELEMETRY = _TELEMETRY, None
+    remaining = max(0.0, deadline - time.monotonic())
+    if isinstance(telemetry, AsyncTelemetryClient) and telemetry.loop is loop:
+        await telemetry.aclose(timeout=remaining, drain=drain)
+    elif telemetry is not None:
+        await loop.run_in_executor(None, lambda: telemetry.stop(timeout=remaining, drain=drain))
+    await loop.run_in_executor(None, _reset, deadline)
+
+
+def _reset(deadline: float) -> None:
+    global _OPENAI_PATCHED, _ANTHROPIC_PATCHED, _NEXT_LISTENER_ID
+    global _OPENAI_ASYNC_PATCHED, _ANTHROPIC_ASYNC_PATCHED
     _OPENAI_PATCHED = False
     _ANTHROPIC_PATCHED = False
+    _OPENAI_ASYNC_PATCHED = False
+    _ANTHROPIC_ASYNC_PATCHED = False
     with _EVENT_LISTENER_LOCK:
+        removed = [*_EVENT_LISTENERS.values(), *_RECORD_LISTENERS.values()]
         _EVENT_LISTENERS.clear()
+        _RECORD_LISTENERS.clear()
+        _publish()
         _NEXT_LISTENER_ID = 1
+    for listener in removed:
+        if isinstance(listener, _AsyncListener):
+            listener.stop(max(0.0, deadline - time.monotonic()))
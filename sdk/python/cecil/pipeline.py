@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from cecil.config import ObserverConfig
+from cecil.event_model import Event, EventContext, build_event_record
+from cecil.logging import get_logger
+
+
+@dataclass
+class AnalysisCounters:
+    processed: int = 0
+    dropped: int = 0
+    failures: int = 0
+    abandoned_on_shutdown: int = 0
+
+
+class AnalysisPipeline:
+    def __init__(self, config: ObserverConfig, emit: Callable[[Event], None]) -> None:
+        self._config = config
+        self._emit = emit
+        self._logger = get_logger()
+        self._queue: queue.Queue[EventContext] = queue.Queue(maxsize=config.analysis_queue_size)
+        self._stop = threading.Event()
+        self.counters = AnalysisCounters()
+        self._counter_lock = threading.Lock()
+        self._worker = threading.Thread(
+            target=self._run,
+            name="cecil-sdk-analysis",
+            daemon=True,
+        )
+        self._worker.start()
+
+    def submit(self, context: EventContext) -> None:
+        if self._stop.is_set():
+            self._count("dropped")
+            return
+        try:
+            self._queue.put_nowait(context)
+        except queue.Full:
+            self._count("dropped")
+
+    def stop(self, timeout: float = 1.0, drain: bool = True) -> None:
+        self._stop.set()
+        worker = self._worker
+
+        deadline = time.monotonic() + max(0.0, timeout)
+        if drain:
+            while time.monotonic() < deadline:
+                if self._queue.empty():
+                    break
+                time.sleep(0.01)
+
+        remaining = max(0.0, deadline - time.monotonic())
+        worker.join(timeout=remaining)
+        self._abandon_remaining()
+        if worker.is_alive():
+            worker.join(timeout=0.2)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            setattr(self.counters, name, getattr(self.counters, name) + amount)
+
+    def _abandon_remaining(self) -> None:
+        abandoned = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                abandoned += 1
+            except queue.Empty:
+                break
+
+        if abandoned:
+            self._count("abandoned_on_shutdown", abandoned)
+
+    def _run(self) -> None:
+        while True:
+            if self._stop.is_set() and self._queue.empty():
+                return
+
+            try:
+                context = self._queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+            self._process(context)
+            self._queue.task_done()
+
+    def _process(self, context: EventContext) -> None:
+        try:
+            event = build_event_record(context, config=self._config)
+            self._emit(event)
+        except Exception as exc:
+            self._count("failures")
+            self._logger.debug("deferred analysis failed err=%s", type(exc).__name__)
+            return
+        self._count("processed")
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import hashlib
 import re
+from functools import lru_cache
+from typing import Any
 
 _SECRET_PATTERN = re.compile(r"(api[_-]?key|authorization|bearer|secret)", re.IGNORECASE)
 _EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
@@ -23,6 +25,119 @@ def hash_prefix_blocks(
     return blocks
 
 
+PREFIX_HASH_ALGORITHMS = ("sha256", "blake2b")
+PREFIX_HASH_CHUNKING = ("fixed", "cdc")
+MAX_PREFIX_BLOCKS = 256
+_PREFIX_BLOCK = 64
+_PREFIX_DIGEST_SIZE = 8
+
+# Content-defined chunks are 32-256 bytes and average about 70. A boundary is declared where a
+# Gear rolling hash of the last 32 bytes has its top bits clear; the test is stricter before the
+# 64-byte target and looser after it (FastCDC normalized chunking), which keeps sizes near it.
+_CDC_MIN = 32
+_CDC_MAX = 256
+_CDC_MASK_STRICT = 0xFC000000
+_CDC_MASK_LOOSE = 0xF0000000
+_GEAR = tuple(
+    int.from_bytes(hashlib.blake2b(bytes((value,)), digest_size=4).digest(), "big")
+    for value in range(256)
+)
+
+
+def cdc_boundaries(data: bytes, max_chunks: int) -> list[int]:
+    # End offsets of up to max_chunks content-defined chunks in one pass over data. A cut
+    # depends only on the bytes just before it, so after a local edit the later boundaries
+    # fall at the same content again and their chunks hash the same.
+    gear = _GEAR
+    size = len(data)
+    ends: list[int] = []
+    start = 0
+    while start < size and len(ends) < max_chunks:
+        end = min(size, start + _CDC_MAX)
+        normal = min(end, start + _PREFIX_BLOCK)
+        cut = 0
+        rolling = 0
+        for i in range(start + _CDC_MIN, normal):
+            rolling = ((rolling << 1) + gear[data[i]]) & 0xFFFFFFFF
+            if not rolling & _CDC_MASK_STRICT:
+                cut = i + 1
+                break
+        if not cut:
+            cut = end
+            for i in range(normal, end):
+                rolling = ((rolling << 1) + gear[data[i]]) & 0xFFFFFFFF
+                if not rolling & _CDC_MASK_LOOSE:
+                    cut = i + 1
+                    break
+        ends.append(cut)
+        start = cut
+    return ends
+
+
+class PrefixHasher:
+    # "sha256" is the original scheme (hash_prefix_blocks). "blake2b" encodes the prefix once
+    # and hashes 64-byte slices of that buffer to 8-byte digests, so nothing is re-encoded or
+    # thrown away. With a key, the digests of short blocks cannot be looked up in a dictionary
+    # of common prompt text. "cdc" chunking hashes content-defined chunks of the UTF-8 prefix
+    # instead of fixed blocks, with either algorithm.
+    __slots__ = ("algorithm", "chunking", "max_blocks", "span", "_base")
+
+    def __init__(
+        self,
+        algorithm: str = "sha256",
+        key: str | None = None,
+        max_blocks: int = 3,
+        chunking: str = "fixed",
+    ):
+        self.algorithm = algorithm if algorithm in PREFIX_HASH_ALGORITHMS else "sha256"
+        self.chunking = chunking if chunking in PREFIX_HASH_CHUNKING else "fixed"
+        self.max_blocks = max(1, min(MAX_PREFIX_BLOCKS, max_blocks))
+        # Canonical characters that can reach a hashed block. A character is at least one
+        # byte, so this many characters always hold max_blocks chunks of the largest size.
+        chunk = _CDC_MAX if self.chunking == "cdc" else _PREFIX_BLOCK
+        self.span = chunk * self.max_blocks
+        self._base: Any = None
+        if self.algorithm == "blake2b":
+            key_bytes = (key or "").encode("utf-8")
+            if len(key_bytes) > hashlib.blake2b.MAX_KEY_SIZE:
+                key_bytes = hashlib.blake2b(key_bytes).digest()
+            # Copying a keyed state skips the key block on every digest.
+            self._base = hashlib.blake2b(digest_size=_PREFIX_DIGEST_SIZE, key=key_bytes)
+        elif self.chunking == "cdc":
+            self._base = hashlib.sha256()
+
+    def blocks(self, canonical_prompt: str) -> list[str]:
+        prefix = canonical_prompt[: self.span]
+        base = self._base
+        if base is None:
+            return hash_prefix_blocks(prefix, _PREFIX_BLOCK, self.max_blocks)
+        encoded = prefix.encode("utf-8", "surrogatepass")
+        if self.chunking == "cdc":
+            ends = cdc_boundaries(encoded, self.max_blocks)
+        else:
+            ends = list(range(_PREFIX_BLOCK, self.span, _PREFIX_BLOCK))
+            ends.append(self.span)
+        data = memoryview(encoded)
+        digests: list[str] = []
+        start = 0
+        for end in ends:
+            if start >= len(data):
+                break
+            block = base.copy()
+            block.update(data[start:end])
+            # SHA-256 digests are cut to 8 bytes as in hash_prefix_blocks.
+            digests.append(block.hexdigest()[: 2 * _PREFIX_DIGEST_SIZE])
+            start = end
+        return digests
+
+
+@lru_cache(maxsize=8)
+def prefix_hasher(
+    algorithm: str, key: str | None, max_blocks: int, chunking: str = "fixed"
+) -> PrefixHasher:
+    return PrefixHasher(algorithm, key, max_blocks, chunking)
+
+
 def redact_snippet(prompt: str, mode: str, snippets_enabled: bool) -> str | None:
     if mode != "redacted_snippets" or not snippets_enabled:
         return None
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import re
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Union, cast
+
+from cecil.cache_analysis import (
+    _BREAKERS,
+    _HINTS,
+    EXACT_PREFIX_CHARS,
+    Breaker,
+    MessagePrint,
+    detect_cache_breakers,
+)
+from cecil.canonicalize import _TS_RE, _UUID_RE, canonicalize_prompt
+from cecil.privacy import PrefixHasher
+
+# One alternation over the prompt replaces the four canonicalization passes and the four
+# breaker passes. Every token branch starts on a word boundary, so the shared \b rejects
+# positions inside words before any branch is tried. Branch order only matters for
+# ts/ts_loose (strict first); no other two branches can match at the same position.
+_SCAN_RE = re.compile(
+    r"\b(?:"
+    r"(?P<ts>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?P<fraction>\.\d+)?(?:Z|[+-]\d{2}:\d{2})?\b)"
+    # Breaker-only looser timestamp; zero-width so anything starting inside it is still seen.
+    r"|(?=(?P<ts_loose>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}))"
+    r"|(?P<uuid>[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}"
+    r"-[0-9a-fA-F]{12}\b)"
+    r"|(?P<nonce>(?i:(?:nonce|request[_-]?id|session[_-]?id)[:=]\s*"
+    r"(?P<nonce_value>[A-Za-z0-9_-]{8,})\b))"
+    r"|(?P<hex>(?i:[0-9a-f]{24,}\b))"
+    r")"
+    # Lone plain spaces are already canonical; only runs and other whitespace need a rewrite.
+    r"|(?P<ws>\s{2,}|[^\S ])"
+)
+_LOOSE_TS_RE = _BREAKERS[0][1]
+_HEX_RE = _BREAKERS[3][1]
+# Findings are immutable, so every event can share one instance per category.
+_FINDINGS = [
+    (category, Breaker(category=category, confidence=confidence, hint=_HINTS[category]))
+    for category, _, confidence in _BREAKERS
+]
+
+
+class _OverlapError(Exception):
+    pass
+
+
+def _scan(text: str) -> tuple[str, set[str]] | None:
+    found: set[str] = set()
+
+    def replace(match: re.Match[str]) -> str:
+        kind = match.lastgroup
+        if kind == "ws":
+            return " "
+        if kind == "ts_loose":
+            found.add("timestamp")
+            return ""
+        if kind == "ts":
+            found.add("timestamp")
+            fraction = match.start("fraction")
+            # A fraction starts after ".", so a UUID or hex blob can begin right there.
+            if fraction >= 0:
+                if _UUID_RE.match(text, fraction + 1):
+                    found.add("uuid")
+                if _HEX_RE.match(text, fraction + 1):
+                    found.add("hex_blob")
+            return "<ts>"
+        if kind == "uuid":
+            found.add("uuid")
+            return "<uuid>"
+        if kind == "hex":
+            found.add("hex_blob")
+            return match.group()
+
+        found.add("random_id")
+        value_start, end = match.span("nonce_value")
+        # The value is bounded by non-word characters on both sides, so slicing keeps
+        # every \b decision identical to a search over the whole prompt.
+        if _HEX_RE.search(text[value_start:end]):
+            found.add("hex_blob")
+        starts = [value_start]
+        starts.extend(i + 1 for i in range(value_start, end) if text[i] == "-")
+        for start in starts:
+            if _TS_RE.match(text, start) or _UUID_RE.match(text, start):
+                # The sequential passes would have replaced these before the nonce pass
+                # ran; let the legacy path decide.
+                raise _OverlapError
+            if _LOOSE_TS_RE.match(text, start):
+                found.add("timestamp")
+        return "<id>"
+
+    try:
+        canonical = _SCAN_RE.sub(replace, text)
+    except _OverlapError:
+        return None
+    return canonical, found
+
+
+def scan_prompt(prompt: str) -> tuple[str, list[Breaker]]:
+    text = prompt.strip().replace("\\n", " ")
+    scanned = _scan(text)
+    if scanned is None:
+        return canonicalize_prompt(prompt), detect_cache_breakers(prompt)
+    canonical, found = scanned
+    if "\\n" in prompt:
+        # Breakers are matched on the raw prompt, where a literal "\n" changes word boundaries.
+        return canonical, detect_cache_breakers(prompt)
+    return canonical, [finding for category, finding in _FINDINGS if category in found]
+
+
+# Agent workloads resend the same system prompt and conversation history on every call. The
+# prompt is cut into segments after newlines that no scan token can span, and each segment's
+# result is cached by its text, so only segments not seen before go through the regex. Cuts are
+# taken greedily from the start, so prompts sharing a prefix share their leading segments.
+_SEGMENT_CHARS = 2048
+# Dict slot, tuple and frozenset on top of the two strings.
+_ENTRY_OVERHEAD = 240
+# Segment text, 1-tuple of message text, or (hashed prefix, hasher).
+_Key = Union[str, tuple[str], tuple[str, PrefixHasher]]
+
+
+def _safe_cut(text: str, newline: int) -> bool:
+    # A lone newline between two non-space characters: whitespace runs and nonce values
+    # ("id:\n...") cannot continue across it, and \b sees the same neighbours on both sides.
+    after = text[newline + 1 : newline + 2]
+    before = text[newline - 1]
+    return bool(after) and not after.isspace() and not before.isspace() and before not in ":="
+
+
+def _segments(text: str) -> list[str]:
+    segments: list[str] = []
+    start = 0
+    while len(text) - start > _SEGMENT_CHARS:
+        cut = text.find("\n", start + _SEGMENT_CHARS)
+        while cut != -1 and not _safe_cut(text, cut):
+            cut = text.find("\n", cut + 1)
+        if cut == -1:
+            break
+        segments.append(text[start : cut + 1])
+        start = cut + 1
+    segments.append(text[start:])
+    return segments
+
+
+@dataclass
+class ScanCacheCounters:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class ScanCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self.counters = ScanCacheCounters()
+        # Prompt segments are keyed by their text and map to (canonical text, or None when the
+        # legacy path must decide, and breaker categories). Whole messages are keyed by a
+        # 1-tuple of their text and map to a MessagePrint. Hashed prefixes are keyed by
+        # (prefix, hasher) and map to their block digests. Each entry carries its byte size.
+        self._entries: OrderedDict[_Key, tuple[object, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max(0, max_bytes)
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.counters = ScanCacheCounters()
+
+    def scan(self, prompt: str) -> tuple[str, list[Breaker]]:
+        # Same result as scan_prompt(prompt).
+        if self.max_bytes <= 0 or "\\n" in prompt:
+            return scan_prompt(prompt)
+        parts: list[str] = []
+        found: set[str] = set()
+        for segment in _segments(prompt.strip()):
+            cached = self._get(segment)
+            if cached is None:
+                scanned = _scan(segment)
+                size = sys.getsizeof(segment) + _ENTRY_OVERHEAD
+                if scanned is None:
+                    cached = (None, frozenset())
+                else:
+                    cached = (scanned[0], frozenset(scanned[1]))
+                    size += sys.getsizeof(scanned[0])
+                self._put(segment, cached, size)
+            canonical, categories = cast(tuple[Optional[str], frozenset[str]], cached)
+            if canonical is None:
+                return scan_prompt(prompt)
+            parts.append(canonical)
+            found.update(categories)
+        return "".join(parts), [finding for category, finding in _FINDINGS if category in found]
+
+    def message(self, text: str) -> MessagePrint:
+        # Messages are resent unchanged on every turn of a conversation, usually as the same
+        # str objects, so the lookup hashes nothing new and skips scanning and fingerprinting.
+        key = (text,)
+        cached = self._get(key) if self.max_bytes > 0 else None
+        if cached is not None:
+            return cast(MessagePrint, cached)
+        canonical, breakers = self.scan(text)
+        message = MessagePrint(
+            canonical, frozenset(breaker.category for breaker in breakers), EXACT_PREFIX_CHARS
+        )
+        fingerprint = message.fingerprint
+        size = (
+            sys.getsizeof(text)
+            + sys.getsizeof(fingerprint.digests)
+            + sys.getsizeof(fingerprint.head)
+            + sys.getsizeof(fingerprint.tail)
+            + _ENTRY_OVERHEAD
+        )
+        self._put(key, message, size)
+        return message
+
+    def blocks(self, hasher: PrefixHasher, canonical_prompt: str) -> list[str]:
+        # Same result as hasher.blocks(canonical_prompt). Calls that share a system prompt share
+        # the hashed prefix, and a cdc prefix can span 64 Ki characters, so its digests are kept
+        # within the same byte budget as the scans.
+        if self.max_bytes <= 0:
+            return hasher.blocks(canonical_prompt)
+        prefix = canonical_prompt[: hasher.span]
+        key = (prefix, hasher)
+        cached = self._get(key)
+        if cached is None:
+            digests = tuple(hasher.blocks(prefix))
+            size = (
+                sys.getsizeof(prefix)
+                + sys.getsizeof(digests)
+                + sum(sys.getsizeof(digest) for digest in digests)
+                + _ENTRY_OVERHEAD
+            )
+            self._put(key, digests, size)
+            cached = digests
+        return list(cast(tuple[str, ...], cached))
+
+    def _get(self, key: _Key) -> object | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.counters.hits += 1
+            return entry[0]
+
+    def _put(self, key: _Key, value: object, size: int) -> None:
+        with self._lock:
+            self.counters.misses += 1
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (value, size)
+                self.counters.bytes += size
+                self.counters.entries += 1
+                self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and self.counters.bytes > self.max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.counters.bytes -= size
+            self.counters.entries -= 1
+            self.counters.evictions += 1
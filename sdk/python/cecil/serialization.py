@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import importlib
+import json
+from functools import lru_cache
+from typing import Any, Callable, cast
+
+# Preference order for "auto"; the stdlib encoder is always available.
+BACKENDS = ("orjson", "msgspec", "json")
+
+_Encoder = Callable[[Any], bytes]
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+@lru_cache(maxsize=8)
+def _load_encoder(backend: str) -> _Encoder | None:
+    if backend == "json":
+        return _stdlib_dumps
+    try:
+        if backend == "orjson":
+            return cast(_Encoder, importlib.import_module("orjson").dumps)
+        if backend == "msgspec":
+            return cast(_Encoder, importlib.import_module("msgspec.json").Encoder().encode)
+    except Exception:
+        return None
+    return None
+
+
+def resolve_backend(name: str = "auto") -> str:
+    candidates = BACKENDS if name == "auto" else (name, "json")
+    for candidate in candidates:
+        if _load_encoder(candidate) is not None:
+            return candidate
+    return "json"
+
+
+class JsonSerializer:
+    def __init__(self, backend: str = "auto") -> None:
+        self.backend = resolve_backend(backend)
+        encoder = _load_encoder(self.backend)
+        assert encoder is not None
+        self._encode = encoder
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return self._encode(value)
+        except Exception:
+            # Fast encoders reject a few things the stdlib accepts (e.g. ints beyond 64 bits).
+            return _stdlib_dumps(value)
+
+    def dumps_text(self, value: Any, indent: int | None = None, sort_keys: bool = False) -> str:
+        # Human-facing reports always use the stdlib layout: fast encoders format floats and
+        # non-ASCII text differently, and report bytes must not depend on what is installed.
+        return json.dumps(value, indent=indent, sort_keys=sort_keys)
+
+
+@lru_cache(maxsize=8)
+def get_serializer(backend: str = "auto") -> JsonSerializer:
+    return JsonSerializer(backend)
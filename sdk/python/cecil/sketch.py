@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import math
+from typing import Any
+
+# DDSketch (Masson, Rim and Lee, VLDB 2019): values fall into log-spaced bins, so every
+# quantile is within 1% relative error, and two sketches merge by adding bin counts.
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# 512 bins span more than eight orders of magnitude at 1% accuracy; past that the lowest bins
+# are folded together, which only blurs the low quantiles.
+MAX_BINS = 512
+_QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+
+def sketch_key(value: float) -> int | None:
+    # Bin index for a value; None for zero and negatives, which are counted in the zero bin.
+    if value <= 0:
+        return None
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+class QuantileSketch:
+    __slots__ = ("bins", "zero_count", "count")
+
+    def __init__(self) -> None:
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.add_key(sketch_key(value))
+
+    def add_key(self, key: int | None) -> None:
+        # Callers feeding one value into several sketches compute the key once.
+        self.count += 1
+        if key is None:
+            self.zero_count += 1
+            return
+        bins = self.bins
+        bins[key] = bins.get(key, 0) + 1
+        if len(bins) > MAX_BINS:
+            self._collapse()
+
+    def merge(self, other: QuantileSketch) -> None:
+        bins = self.bins
+        for key, count in other.bins.items():
+            bins[key] = bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(bins) > MAX_BINS:
+            self._collapse()
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = min(max(q, 0.0), 1.0) * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Midpoint of the bin in relative terms; within RELATIVE_ACCURACY of the value.
+                return 2 * _GAMMA**key / (_GAMMA + 1)
+        return None
+
+    def summary(self, digits: int) -> dict[str, float | None]:
+        result: dict[str, float | None] = {}
+        for name, q in _QUANTILES:
+            value = self.quantile(q)
+            result[name] = None if value is None else round(value, digits)
+        return result
+
+    def to_state(self) -> dict[str, object]:
+        return {
+            "zero": self.zero_count,
+            "bins": {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any]) -> QuantileSketch:
+        sketch = cls()
+        sketch.zero_count = int(state["zero"])
+        sketch.bins = {int(key): int(count) for key, count in state["bins"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        if len(sketch.bins) > MAX_BINS:
+            sketch._collapse()
+        return sketch
+
+    def _collapse(self) -> None:
+        keys = sorted(self.bins)
+        excess = len(keys) - MAX_BINS
+        folded = sum(self.bins.pop(key) for key in keys[:excess])
+        self.bins[keys[excess]] += folded
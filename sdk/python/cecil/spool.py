@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO
+
+# Segment lifecycle: "<ns>-<pid>.open" while a process appends to it, "<ns>-<pid>.seg" once
+# sealed, and "<ns>-<pid>.seg.<claimer>.replay" while one process replays it. Names sort in
+# write order, and renames are atomic, so several processes can share one directory.
+_OPEN = ".open"
+_SEALED = ".seg"
+_REPLAY = ".replay"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        # Our pid on a file we did not create: an earlier process (e.g. a restarted container).
+        return False
+    if os.name == "nt":
+        # os.kill cannot probe on Windows; never take over another process's files there.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _owner_pid(name: str, position: int) -> int | None:
+    try:
+        return int(name.split("-", 1)[1].split(".")[position])
+    except (IndexError, ValueError):
+        return None
+
+
+class Spool:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        segment_bytes: int,
+        fsync_interval: float,
+    ) -> None:
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max(1, max_bytes)
+        self._segment_bytes = max(1, segment_bytes)
+        self._fsync_interval = max(0.0, fsync_interval)
+        self._lock = threading.Lock()
+        self._active: BinaryIO | None = None
+        self._active_path: Path | None = None
+        self._active_size = 0
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self._recover()
+        self._bytes = sum(p.stat().st_size for p in self._dir.iterdir() if p.is_file())
+
+    def append(self, lines: list[bytes]) -> int:
+        # Returns how many lines were written; the rest did not fit under the size cap.
+        written = 0
+        with self._lock:
+            for line in lines:
+                size = len(line) + 1
+                if self._bytes + size > self._max_bytes:
+                    break
+                if self._active is None or self._active_size >= self._segment_bytes:
+                    self._seal_active()
+                    self._open_segment()
+                assert self._active is not None
+                self._active.write(line + b"\n")
+                self._active_size += size
+                self._bytes += size
+                written += 1
+            if written:
+                self._dirty = True
+                if time.monotonic() - self._last_fsync >= self._fsync_interval:
+                    self._sync()
+        return written
+
+    def sync_if_due(self) -> None:
+        with self._lock:
+            if self._dirty and time.monotonic() - self._last_fsync >= self._fsync_interval:
+                self._sync()
+
+    def pending(self) -> bool:
+        with self._lock:
+            if self._active_size:
+                return True
+            return any(p.name.endswith(_SEALED) for p in self._dir.iterdir())
+
+    def claim(self) -> Path | None:
+        with self._lock:
+            sealed = sorted(p for p in self._dir.iterdir() if p.name.endswith(_SEALED))
+            if not sealed and self._active_size:
+                # Nothing sealed yet; hand over what this process has written so far.
+                self._seal_active()
+                sealed = sorted(p for p in self._dir.iterdir() if p.name.endswith(_SEALED))
+        for path in sealed:
+            claimed = path.with_name(f"{path.name}.{os.getpid()}{_REPLAY}")
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                # Another process claimed it first.
+                continue
+            return claimed
+        return None
+
+    def read(self, claimed: Path) -> list[bytes]:
+        return [line for line in claimed.read_bytes().split(b"\n") if line]
+
+    def complete(self, claimed: Path) -> None:
+        size = claimed.stat().st_size
+        claimed.unlink()
+        with self._lock:
+            self._bytes = max(0, self._bytes - size)
+
+    def release(self, claimed: Path, remaining: list[bytes]) -> None:
+        # Put undelivered lines back as a sealed segment that keeps its place in the order.
+        sealed = claimed.with_name(claimed.name.split(f"{_SEALED}.", 1)[0] + _SEALED)
+        size = claimed.stat().st_size
+        body = b"".join(line + b"\n" for line in remaining)
+        if len(body) == size:
+            # Nothing was delivered; hand the segment back without rewriting it.
+            os.replace(claimed, sealed)
+            return
+        temp = claimed.with_name(claimed.name + ".tmp")
+        with open(temp, "wb") as handle:
+            handle.write(body)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp, sealed)
+        claimed.unlink()
+        with self._lock:
+            self._bytes = max(0, self._bytes - size + len(body))
+
+    def close(self) -> None:
+        with self._lock:
+            self._seal_active()
+
+    def _open_segment(self) -> None:
+        path = self._dir / f"{time.time_ns():020d}-{os.getpid()}{_OPEN}"
+        # Kept open across appends and closed when the segment is sealed.
+        self._active = open(path, "ab")  # noqa: SIM115
+        self._active_path = path
+        self._active_size = 0
+
+    def _seal_active(self) -> None:
+        active, path = self._active, self._active_path
+        self._active = None
+        self._active_path = None
+        self._active_size = 0
+        if active is None or path is None:
+            return
+        if self._dirty:
+            self._sync(active)
+        active.close()
+        if path.stat().st_size:
+            os.replace(path, path.with_name(path.name[: -len(_OPEN)] + _SEALED))
+        else:
+            path.unlink()
+
+    def _sync(self, handle: BinaryIO | None = None) -> None:
+        handle = handle or self._active
+        if handle is not None:
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _recover(self) -> None:
+        # Seal segments left open by dead writers and requeue replays a dead process claimed.
+        for path in self._dir.iterdir():
+            name = path.name
+            if name.endswith(_OPEN):
+                pid = _owner_pid(name, 0)
+                if pid is not None and not _pid_alive(pid):
+                    os.replace(path, path.with_name(name[: -len(_OPEN)] + _SEALED))
+            elif name.endswith(_REPLAY):
+                pid = _owner_pid(name, 2)
+                if pid is not None and not _pid_alive(pid):
+                    os.replace(path, path.with_name(name.split(f"{_SEALED}.", 1)[0] + _SEALED))
+            elif name.endswith(".tmp"):
+                pid = _owner_pid(name, 2)
+                if pid is not None and not _pid_alive(pid):
+                    path.unlink()
@@ -1,16 +1,34 @@
 from __future__ import annotations
 
+import gzip
+import heapq
+import http.client
 import json
 import queue
 import random
 import threading
 import time
-import urllib.error
-import urllib.request
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
 
 from cecil.config import ObserverConfig
+from cecil.event_model import Event
 from cecil.logging import get_logger, scrub
+from cecil.serialization import get_serializer
+from cecil.spool import Spool
+from cecil.transport import ConnectionPool
+
+# OSError covers connection, timeout and TLS failures; ValueError covers malformed endpoints.
+_SEND_ERRORS = (OSError, http.client.HTTPException, ValueError)
+# Seconds between replay attempts while events are spooled; doubles while the endpoint is down.
+_REPLAY_INTERVAL = 1.0
+_REPLAY_MAX_INTERVAL = 30.0
+
+
+def _rejected(status: int) -> bool:
+    # A 4xx other than a timeout or rate limit will fail the same way on every retry.
+    return 400 <= status < 500 and status not in (408, 429)
 
 
 @dataclass
@@ -19,6 +37,20 @@ class TelemetryCounters:
     dropped: int = 0
     failures: int = 0
     abandoned_on_shutdown: int = 0
+    batches_sent: int = 0
+    partial_batches: int = 0
+    retried_events: int = 0
+    spooled: int = 0
+    replayed: int = 0
+
+
+class TelemetrySink(Protocol):
+    counters: TelemetryCounters
+
+    # An Event is only turned into its payload dict once the sink has decided to send it.
+    def emit(self, event: dict[str, object] | Event) -> None: ...
+
+    def stop(self, timeout: float = 1.0, drain: bool = True) -> None: ...
 
 
 class TelemetryClient:
@@ -27,108 +59,395 @@ class TelemetryClient:
         self._logger = get_logger()
         self._queue: queue.Queue[dict[str, object]] = queue.Queue(maxsize=config.queue_size)
         self._stop = threading.Event()
-        self._worker: threading.Thread | None = None
+        self._workers: list[threading.Thread] = []
+        self._pool: ConnectionPool | None = None
+        self._counter_lock = threading.Lock()
+        # Pending retries as (due_monotonic, seq, attempt, events), ordered by due time.
+        self._retries: list[tuple[float, int, int, list[dict[str, object]]]] = []
+        self._retry_lock = threading.Lock()
+        self._retry_seq = 0
+        self._abandoned = False
+        self._spool: Spool | None = None
+        # While set, new events go straight to the spool so replay keeps them in order.
+        self._spooling = False
+        self._spooling_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._replay_due = 0.0
+        self._replay_misses = 0
         self.counters = TelemetryCounters()
 
         if not config.local_only:
-            self._worker = threading.Thread(
-                target=self._run,
-                name="cecil-sdk-telemetry",
-                daemon=True,
+            assert config.endpoint is not None
+            if config.telemetry_spool_dir:
+                self._open_spool(config.telemetry_spool_dir)
+            self._pool = ConnectionPool(
+                config.endpoint,
+                timeout=config.timeout_seconds,
+                max_size=max(config.telemetry_pool_size, config.telemetry_workers),
             )
-            self._worker.start()
+            for index in range(config.telemetry_workers):
+                worker = threading.Thread(
+                    target=self._run,
+                    name="cecil-sdk-telemetry" if index == 0 else f"cecil-sdk-telemetry-{index}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
 
-    def emit(self, event: dict[str, object]) -> None:
+    def emit(self, event: dict[str, object] | Event) -> None:
         if self._config.local_only:
             return
         if random.random() > self._config.sampling_rate:
             return
+        if isinstance(event, Event):
+            event = event.to_dict()
         try:
             self._queue.put_nowait(event)
         except queue.Full:
-            self.counters.dropped += 1
+            self._count("dropped")
 
     def stop(self, timeout: float = 1.0, drain: bool = True) -> None:
         self._stop.set()
-        worker = self._worker
-        if worker is None:
+        workers = self._workers
+        if not workers:
             return
 
         deadline = time.monotonic() + max(0.0, timeout)
         if drain:
             while time.monotonic() < deadline:
-                if self._queue.empty():
+                if self._queue.empty() and not self._has_retries():
                     break
                 time.sleep(0.01)
 
-        remaining = max(0.0, deadline - time.monotonic())
-        worker.join(timeout=remaining)
+        for worker in workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
         self._abandon_remaining()
-        if worker.is_alive():
-            grace = max(0.01, min(0.2, self._config.timeout_seconds + 0.05))
-            worker.join(timeout=grace)
+        grace_deadline = time.monotonic() + max(0.01, min(0.2, self._config.timeout_seconds + 0.05))
+        for worker in workers:
+            if worker.is_alive():
+                worker.join(timeout=max(0.0, grace_deadline - time.monotonic()))
+        if self._spool is not None:
+            try:
+                self._spool.close()
+            except OSError as exc:
+                self._logger.debug("telemetry spool close failed err=%s", type(exc).__name__)
+        if self._pool is not None:
+            self._pool.close()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            setattr(self.counters, name, getattr(self.counters, name) + amount)
 
     def _abandon_remaining(self) -> None:
-        abandoned = 0
+        abandoned: list[dict[str, object]] = []
         while True:
             try:
-                self._queue.get_nowait()
+                abandoned.append(self._queue.get_nowait())
                 self._queue.task_done()
-                abandoned += 1
             except queue.Empty:
                 break
 
+        with self._retry_lock:
+            # In-flight attempts that fail from now on are abandoned instead of rescheduled.
+            self._abandoned = True
+            for _, _, _, events in self._retries:
+                abandoned.extend(events)
+            self._retries.clear()
+
         if abandoned:
-            self.counters.abandoned_on_shutdown += abandoned
+            self._spill(abandoned, "abandoned_on_shutdown")
+
+    def _open_spool(self, directory: str) -> None:
+        try:
+            self._spool = Spool(
+                directory,
+                max_bytes=self._config.telemetry_spool_max_bytes,
+                segment_bytes=self._config.telemetry_spool_segment_bytes,
+                fsync_interval=self._config.telemetry_spool_fsync_ms / 1000,
+            )
+            # Segments left by an earlier process are replayed before anything new is sent.
+            self._spooling = self._spool.pending()
+        except OSError as exc:
+            self._logger.debug("telemetry spool unavailable err=%s", type(exc).__name__)
+            self._spool = None
+
+    def _spill(self, events: list[dict[str, object]], otherwise: str) -> None:
+        # Events that cannot be delivered now go to the spool; without one (or once it is
+        # full) they are counted under `otherwise` as before.
+        written = 0
+        if self._spool is not None:
+            serializer = get_serializer(self._config.json_backend)
+            with self._spooling_lock:
+                try:
+                    written = self._spool.append([serializer.dumps(event) for event in events])
+                except OSError as exc:
+                    self._logger.debug("telemetry spool write failed err=%s", type(exc).__name__)
+                if written:
+                    self._spooling = True
+        if written:
+            self._count("spooled", written)
+        if written < len(events):
+            self._count(otherwise, len(events) - written)
+
+    def _service_spool(self) -> None:
+        spool = self._spool
+        if spool is None:
+            return
+        try:
+            spool.sync_if_due()
+        except OSError as exc:
+            self._logger.debug("telemetry spool sync failed err=%s", type(exc).__name__)
+        if not self._spooling or self._stop.is_set() or time.monotonic() < self._replay_due:
+            return
+        # One worker replays at a time; the others keep draining the queue.
+        if not self._replay_lock.acquire(blocking=False):
+            return
+        try:
+            recovered = self._replay(spool)
+        except OSError as exc:
+            self._logger.debug("telemetry spool replay failed err=%s", type(exc).__name__)
+            recovered = False
+        finally:
+            self._replay_lock.release()
+        self._replay_misses = 0 if recovered else self._replay_misses + 1
+        interval = _REPLAY_INTERVAL * 2 ** min(self._replay_misses, 5)
+        self._replay_due = time.monotonic() + min(interval, _REPLAY_MAX_INTERVAL)
+
+    def _replay(self, spool: Spool) -> bool:
+        while not self._stop.is_set():
+            with self._spooling_lock:
+                claimed = spool.claim()
+                if claimed is None:
+                    self._spooling = False
+                    return True
+            if not self._replay_segment(spool, claimed):
+                return False
+        return True
+
+    def _replay_segment(self, spool: Spool, claimed: Path) -> bool:
+        records: list[tuple[bytes, dict[str, object]]] = []
+        for line in spool.read(claimed):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # A torn write from a crashed process; nothing to recover from it.
+                continue
+            if isinstance(event, dict):
+                records.append((line, event))
+
+        size = max(1, self._config.telemetry_batch_size)
+        for start in range(0, len(records), size):
+            chunk = [event for _, event in records[start : start + size]]
+            delivered = self._deliver(chunk)
+            if delivered < len(chunk) or self._stop.is_set():
+                spool.release(claimed, [line for line, _ in records[start + delivered :]])
+                return False
+        spool.complete(claimed)
+        return True
+
+    def _deliver(self, events: list[dict[str, object]]) -> int:
+        # Returns how many leading events were handled; the rest wait for the next replay.
+        # Events the server rejects for good are dropped as failures so they cannot hold up
+        # the rest of the segment.
+        if self._config.telemetry_batch_size > 1:
+            failed = self._send_batch_once(events)
+            if failed is None:
+                self._count("failures", len(events))
+                return len(events)
+            if len(failed) == len(events):
+                return 0
+            # Individually rejected events will not succeed on replay either.
+            self._count("replayed", len(events) - len(failed))
+            self._count("batches_sent")
+            if failed:
+                self._count("partial_batches")
+                self._count("failures", len(failed))
+            return len(events)
+        for index, event in enumerate(events):
+            sent = self._send_once(event)
+            if sent is False:
+                return index
+            self._count("replayed" if sent else "failures")
+        return len(events)
+
+    def _has_retries(self) -> bool:
+        with self._retry_lock:
+            return bool(self._retries)
+
+    def _next_retry(self) -> tuple[int, list[dict[str, object]]] | float:
+        # Returns a due retry, or how long the caller may block on the queue before one is due.
+        with self._retry_lock:
+            if not self._retries:
+                return 0.05
+            due = self._retries[0][0] - time.monotonic()
+            if due > 0:
+                return min(due, 0.05)
+            _, _, attempt, events = heapq.heappop(self._retries)
+            return attempt, events
+
+    def _schedule_retry(self, attempt: int, events: list[dict[str, object]]) -> bool:
+        backoff = min(2 ** (attempt - 1), 8) * 0.1
+        with self._retry_lock:
+            if self._abandoned:
+                return False
+            self._retry_seq += 1
+            heapq.heappush(
+                self._retries, (time.monotonic() + backoff, self._retry_seq, attempt, events)
+            )
+        return True
 
     def _run(self) -> None:
+        batching = self._config.telemetry_batch_size > 1
         while True:
-            if self._stop.is_set() and self._queue.empty():
+            self._service_spool()
+            retry = self._next_retry()
+            if not isinstance(retry, float):
+                self._attempt(*retry)
+                continue
+
+            if self._stop.is_set() and self._queue.empty() and not self._has_retries():
                 return
 
             try:
-                event = self._queue.get(timeout=0.05)
+                event = self._queue.get(timeout=retry)
             except queue.Empty:
                 continue
 
-            self._send_with_retries(event)
-            self._queue.task_done()
+            batch = self._collect_batch(event) if batching else [event]
+            if self._spooling:
+                self._spill(batch, "failures")
+            else:
+                self._attempt(0, batch)
+            for _ in batch:
+                self._queue.task_done()
 
-    def _send_with_retries(self, event: dict[str, object]) -> None:
-        attempts = self._config.retry_budget + 1
-        for i in range(attempts):
-            if self._send_once(event):
-                self.counters.sent += 1
-                return
+    def _collect_batch(self, first: dict[str, object]) -> list[dict[str, object]]:
+        batch = [first]
+        deadline = time.monotonic() + self._config.telemetry_batch_interval_ms / 1000
+        while len(batch) < self._config.telemetry_batch_size:
+            remaining = deadline - time.monotonic()
+            # Once the window has closed or shutdown started, only take what is already queued.
+            expired = remaining <= 0 or self._stop.is_set()
+            try:
+                if expired:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                if expired:
+                    break
+        return batch
+
+    def _attempt(self, attempt: int, events: list[dict[str, object]]) -> None:
+        if self._config.telemetry_batch_size > 1:
+            failed = self._send_batch_once(events)
+        else:
+            sent = self._send_once(events[0])
+            failed = None if sent is None else [] if sent else [0]
+        if failed is None:
+            # Rejected for good: neither retried nor spooled, which would stall later events.
+            self._count("failures", len(events))
+            return
+
+        delivered = len(events) - len(failed)
+        if delivered:
+            self._count("sent", delivered)
+            if self._config.telemetry_batch_size > 1:
+                self._count("batches_sent")
+                if failed:
+                    self._count("partial_batches")
+        if not failed:
+            return
+
+        pending = [events[index] for index in failed]
+        # Retries wait on the shared schedule so a failing endpoint never blocks a worker.
+        if attempt < self._config.retry_budget:
+            if self._schedule_retry(attempt + 1, pending):
+                self._count("retried_events", len(pending))
+            else:
+                self._spill(pending, "abandoned_on_shutdown")
+            return
+        self._spill(pending, "failures")
+
+    def _encode_batch(self, batch: list[dict[str, object]]) -> tuple[bytes, dict[str, str]]:
+        return encode_batch(self._config, batch)
+
+    def _send_batch_once(self, batch: list[dict[str, object]]) -> list[int] | None:
+        # Indices worth retrying, or None when the server rejected the whole batch for good.
+        assert self._pool is not None
+        assert self._config.api_key is not None
 
-            if i < attempts - 1:
-                backoff = min(2**i, 8) * 0.1
-                time.sleep(backoff)
+        body, headers = self._encode_batch(batch)
+        headers["Authorization"] = f"Bearer {self._config.api_key}"
+
+        everything = list(range(len(batch)))
+        try:
+            status, response_body = self._pool.post(body, headers)
+        except _SEND_ERRORS as exc:
+            self._logger.debug(
+                "telemetry batch send failed endpoint=%s size=%d err=%s",
+                scrub(self._config.endpoint),
+                len(batch),
+                type(exc).__name__,
+            )
+            return everything
 
-        self.counters.failures += 1
+        if _rejected(status):
+            return None
+        if not 200 <= status < 300:
+            return everything
+        # 207 responses may name rejected events as {"failed": [<index>, ...]}.
+        if status != 207:
+            return []
+        return failed_indices(response_body, len(batch))
 
-    def _send_once(self, event: dict[str, object]) -> bool:
-        assert self._config.endpoint is not None
+    def _send_once(self, event: dict[str, object]) -> bool | None:
+        # True when sent, False when worth retrying, None when rejected for good.
+        assert self._pool is not None
         assert self._config.api_key is not None
 
-        payload = json.dumps(event).encode("utf-8")
-        request = urllib.request.Request(
-            self._config.endpoint,
-            data=payload,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self._config.api_key}",
-            },
-            method="POST",
-        )
+        payload = get_serializer(self._config.json_backend).dumps(event)
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self._config.api_key}",
+        }
 
         try:
-            with urllib.request.urlopen(request, timeout=self._config.timeout_seconds) as response:
-                return bool(200 <= int(response.status) < 300)
-        except (urllib.error.URLError, TimeoutError) as exc:
+            status, _ = self._pool.post(payload, headers)
+        except _SEND_ERRORS as exc:
             self._logger.debug(
                 "telemetry send failed endpoint=%s err=%s",
                 scrub(self._config.endpoint),
                 type(exc).__name__,
             )
             return False
+        if _rejected(status):
+            return None
+        return 200 <= status < 300
+
+
+def encode_batch(
+    config: ObserverConfig, batch: list[dict[str, object]]
+) -> tuple[bytes, dict[str, str]]:
+    serializer = get_serializer(config.json_backend)
+    if config.telemetry_batch_format == "json":
+        body = serializer.dumps(batch)
+        headers = {"Content-Type": "application/json"}
+    else:
+        body = b"".join(serializer.dumps(event) + b"\n" for event in batch)
+        headers = {"Content-Type": "application/x-ndjson"}
+    if config.telemetry_gzip:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def failed_indices(body: bytes, batch_size: int) -> list[int]:
+    try:
+        parsed = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return []
+    failed = parsed.get("failed") if isinstance(parsed, dict) else None
+    if not isinstance(failed, list):
+        return []
+    return sorted({i for i in failed if isinstance(i, int) and 0 <= i < batch_size})
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import base64
+import http.client
+import ssl
+import threading
+import urllib.parse
+import urllib.request
+
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+def proxy_for(scheme: str, host: str) -> urllib.parse.SplitResult | None:
+    # Honour HTTP(S)_PROXY and NO_PROXY the same way urllib.request.urlopen does.
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or not host or urllib.request.proxy_bypass(host):
+        return None
+    if "://" not in proxy:
+        proxy = f"http://{proxy}"
+    return urllib.parse.urlsplit(proxy)
+
+
+def proxy_headers(proxy: urllib.parse.SplitResult) -> dict[str, str]:
+    if proxy.username is None:
+        return {}
+    user = urllib.parse.unquote(proxy.username)
+    password = urllib.parse.unquote(proxy.password or "")
+    token = base64.b64encode(f"{user}:{password}".encode()).decode("ascii")
+    return {"Proxy-Authorization": f"Basic {token}"}
+
+
+class ConnectionPool:
+    def __init__(self, endpoint: str, timeout: float, max_size: int = 2) -> None:
+        parts = urllib.parse.urlsplit(endpoint)
+        self._scheme = parts.scheme.lower()
+        self._host = parts.hostname or ""
+        self._port = parts.port
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path = f"{self._path}?{parts.query}"
+        self._proxy = proxy_for(self._scheme, self._host)
+        self._request_headers: dict[str, str] = {}
+        if self._proxy is not None and self._scheme == "http":
+            # Plain-HTTP proxies take the absolute URL in the request line.
+            self._path = f"http://{parts.netloc.rsplit('@', 1)[-1]}{self._path}"
+            self._request_headers = proxy_headers(self._proxy)
+        self._timeout = timeout
+        self._max_size = max(1, max_size)
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._ssl_context: ssl.SSLContext | None = None
+        self.connections_opened = 0
+
+    def post(self, body: bytes, headers: dict[str, str]) -> tuple[int, bytes]:
+        conn, reused = self._acquire()
+        try:
+            status, data, reusable = self._request(conn, body, headers)
+        except _STALE_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # The server dropped an idle keep-alive connection; retry once on a fresh one.
+            conn = self._connect()
+            try:
+                status, data, reusable = self._request(conn, body, headers)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+        if reusable:
+            self._release(conn)
+        else:
+            conn.close()
+        return status, data
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _request(
+        self, conn: http.client.HTTPConnection, body: bytes, headers: dict[str, str]
+    ) -> tuple[int, bytes, bool]:
+        if self._request_headers:
+            headers = {**headers, **self._request_headers}
+        conn.request("POST", self._path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        return int(response.status), data, not response.will_close
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        conn: http.client.HTTPConnection
+        host, port = self._host, self._port
+        if self._proxy is not None:
+            host, port = self._proxy.hostname or "", self._proxy.port or 80
+        if self._scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=self._timeout, context=self._ssl_context
+            )
+            if self._proxy is not None:
+                conn.set_tunnel(self._host, self._port, headers=proxy_headers(self._proxy))
+        elif self._scheme == "http":
+            conn = http.client.HTTPConnection(host, port, timeout=self._timeout)
+        else:
+            raise ValueError(f"unsupported endpoint scheme: {self._scheme or '<none>'}")
+        with self._lock:
+            self.connections_opened += 1
+        return conn
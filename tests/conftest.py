@@ -36,7 +36,13 @@ def fake_openai_module() -> list[dict[str, object]]:
             records.append(kwargs)
             return Response()
 
+    class AsyncCompletions:
+        async def create(self, **kwargs: object) -> Response:
+            records.append(kwargs)
+            return Response()
+
     completions.Completions = Completions
+    completions.AsyncCompletions = AsyncCompletions
 
     sys.modules["openai"] = openai
     sys.modules["openai.resources"] = resources
@@ -64,7 +70,13 @@ def fake_anthropic_module() -> list[dict[str, object]]:
             records.append(kwargs)
             return Response()
 
+    class AsyncMessages:
+        async def create(self, **kwargs: object) -> Response:
+            records.append(kwargs)
+            return Response()
+
     messages.Messages = Messages
+    messages.AsyncMessages = AsyncMessages
 
     sys.modules["anthropic"] = anthropic
     sys.modules["anthropic.resources"] = resources
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import threading
+from dataclasses import replace
+
+from cecil.config import ObserverConfig
+from cecil.event_model import Event
+from cecil.patcher import analysis_pipeline, patch
+
+
+def _config() -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=16,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=512,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+
+
+def test_async_openai_builds_event_off_loop_thread(fake_openai_module, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    from cecil.event_model import Event, build_event_record
+
+    captured: list[dict[str, object]] = []
+    build_threads: list[str] = []
+
+    def capture_emit(self, event: dict[str, object] | Event) -> None:  # type: ignore[no-untyped-def]
+        # Without dict listeners the sink receives the Event and builds the payload itself.
+        captured.append(event.to_dict() if isinstance(event, Event) else event)
+
+    def tracking_build(*args: object, **kwargs: object) -> Event:
+        build_threads.append(threading.current_thread().name)
+        return build_event_record(*args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient.emit", capture_emit)
+    monkeypatch.setattr("cecil.adapters.common.build_event_record", tracking_build)
+    result = patch(_config())
+    assert result.openai_async_patched is True
+
+    module = importlib.import_module("openai.resources.chat.completions")
+
+    async def run() -> object:
+        client = module.AsyncCompletions()
+        return await client.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": "hello"}]
+        )
+
+    response = asyncio.run(run())
+
+    assert response.model == "gpt-4o-mini"
+    assert len(captured) == 1
+    assert captured[0]["provider"] == "openai"
+    assert build_threads and build_threads[0] != threading.main_thread().name
+
+
+def test_async_anthropic_survives_analyzer_failure(fake_anthropic_module, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    def boom(*args: object, **kwargs: object) -> dict[str, object]:
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("cecil.adapters.common.build_event_record", boom)
+    result = patch(_config())
+    assert result.anthropic_async_patched is True
+
+    module = importlib.import_module("anthropic.resources.messages")
+
+    async def run() -> object:
+        client = module.AsyncMessages()
+        return await client.create(
+            model="claude-3-5-haiku", messages=[{"role": "user", "content": "still works"}]
+        )
+
+    response = asyncio.run(run())
+    assert response.model == "claude-3-5-haiku"
+
+
+def test_async_deferred_mode_submits_to_pipeline(fake_openai_module) -> None:  # type: ignore[no-untyped-def]
+    patch(replace(_config(), deferred_analysis=True))
+    pipeline = analysis_pipeline()
+    assert pipeline is not None
+
+    module = importlib.import_module("openai.resources.chat.completions")
+
+    async def run() -> None:
+        client = module.AsyncCompletions()
+        await client.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+
+    asyncio.run(run())
+    pipeline.stop(timeout=2.0, drain=True)
+
+    assert pipeline.counters.processed == 1
+
+
+def test_async_result_is_returned_without_waiting_for_event_build(  # type: ignore[no-untyped-def]
+    fake_openai_module, monkeypatch
+) -> None:
+    from cecil.event_model import build_event_record
+
+    captured: list[object] = []
+    release = threading.Event()
+
+    def capture_emit(self, event: dict[str, object] | Event) -> None:  # type: ignore[no-untyped-def]
+        captured.append(event)
+
+    def slow_build(*args: object, **kwargs: object) -> Event:
+        release.wait(timeout=5.0)
+        return build_event_record(*args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient.emit", capture_emit)
+    monkeypatch.setattr("cecil.adapters.common.build_event_record", slow_build)
+    patch(_config())
+
+    module = importlib.import_module("openai.resources.chat.completions")
+
+    async def run() -> object:
+        client = module.AsyncCompletions()
+        task = asyncio.ensure_future(
+            client.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+        )
+        # The provider response is handed back while the event is still being built.
+        response = await asyncio.wait_for(task, timeout=1.0)
+        assert captured == []
+        release.set()
+        return response
+
+    response = asyncio.run(run())
+
+    assert response.model == "gpt-4o-mini"
+    assert len(captured) == 1
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import importlib
+import json
+import threading
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cecil
+from cecil import patcher
+from cecil.async_telemetry import AsyncTelemetryClient
+from cecil.config import ObserverConfig
+from cecil.patcher import patch
+
+
+class _Collector(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    events: list[dict[str, object]] = []
+    auth: list[str | None] = []
+    connections = 0
+    reject_first_index_once = False
+    _lock = threading.Lock()
+
+    def setup(self) -> None:
+        super().setup()
+        with _Collector._lock:
+            _Collector.connections += 1
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if self.headers.get("Content-Type") == "application/x-ndjson":
+            batch = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        else:
+            batch = [json.loads(body.decode("utf-8"))]
+
+        if any(event.get("bad") for event in batch):
+            # A malformed event: rejected for good, like a 4xx from a real collector.
+            self.send_response(400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with _Collector._lock:
+            reject = _Collector.reject_first_index_once and len(batch) > 1
+            _Collector.reject_first_index_once = False
+            accepted = batch[1:] if reject else batch
+            _Collector.events.extend(accepted)
+            _Collector.auth.append(self.headers.get("Authorization"))
+
+        if reject:
+            payload = b'{"failed": [0]}'
+            self.send_response(207)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(payload), payload))
+            return
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, fmt: str, *args: object) -> None:
+        return
+
+
+def _serve() -> tuple[ThreadingHTTPServer, str]:
+    _Collector.events = []
+    _Collector.auth = []
+    _Collector.connections = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Collector)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}/v1/events"
+
+
+def _config(endpoint: str = "http://127.0.0.1:1/unreachable") -> ObserverConfig:
+    return ObserverConfig(
+        enabled=True,
+        api_key="lok_test.secret",
+        endpoint=endpoint,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=64,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+        telemetry_transport="asyncio",
+    )
+
+
+def _received() -> list[object]:
+    return sorted(event["n"] for event in _Collector.events)  # type: ignore[type-var]
+
+
+def _total(client: AsyncTelemetryClient) -> int:
+    counters = client.counters
+    return counters.sent + counters.failures + counters.dropped + counters.abandoned_on_shutdown
+
+
+def test_async_client_sends_over_one_keep_alive_connection() -> None:
+    httpd, endpoint = _serve()
+    client = AsyncTelemetryClient(_config(endpoint))
+
+    async def run() -> None:
+        for i in range(10):
+            client.emit({"n": i})
+        await client.aclose(timeout=3.0, drain=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert client.counters.sent == 10
+    assert _received() == list(range(10))
+    assert set(_Collector.auth) == {"Bearer lok_test.secret"}
+    assert _Collector.connections == 1
+
+
+def test_async_client_batches_and_retries_rejected_events() -> None:
+    httpd, endpoint = _serve()
+    _Collector.reject_first_index_once = True
+    config = replace(
+        _config(endpoint), telemetry_batch_size=5, telemetry_batch_interval_ms=200, retry_budget=1
+    )
+    client = AsyncTelemetryClient(config)
+
+    async def run() -> None:
+        for i in range(5):
+            client.emit({"n": i})
+        await client.aclose(timeout=3.0, drain=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert _received() == list(range(5))
+    assert client.counters.sent == 5
+    assert client.counters.partial_batches == 1
+    assert client.counters.retried_events == 1
+
+
+def test_async_client_accounts_failures_and_cross_thread_emits() -> None:
+    client = AsyncTelemetryClient(replace(_config(), timeout_seconds=0.2))
+
+    async def run() -> None:
+        client.emit({"n": 0})
+        worker = threading.Thread(target=lambda: [client.emit({"n": i}) for i in range(1, 6)])
+        worker.start()
+        await asyncio.get_running_loop().run_in_executor(None, worker.join)
+        await client.aclose(timeout=3.0, drain=True)
+
+    asyncio.run(run())
+
+    assert client.counters.sent == 0
+    assert client.counters.failures == 6
+    assert _total(client) == 6
+
+
+def test_async_client_drops_rejected_events_without_retrying() -> None:
+    httpd, endpoint = _serve()
+    client = AsyncTelemetryClient(replace(_config(endpoint), retry_budget=2))
+
+    async def run() -> None:
+        client.emit({"n": 0, "bad": True})
+        client.emit({"n": 1})
+        await client.aclose(timeout=3.0, drain=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert _received() == [1]
+    assert (client.counters.sent, client.counters.failures) == (1, 1)
+    assert client.counters.retried_events == 0
+
+
+def test_stop_on_loop_thread_without_drain_abandons() -> None:
+    client = AsyncTelemetryClient(_config())
+
+    async def run() -> None:
+        for i in range(20):
+            client.emit({"n": i})
+        client.stop(timeout=5.0, drain=False)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert client.counters.abandoned_on_shutdown > 0
+    assert _total(client) == 20
+
+
+def test_stop_from_another_thread_drains_running_loop() -> None:
+    httpd, endpoint = _serve()
+    client = AsyncTelemetryClient(_config(endpoint))
+    loop = asyncio.new_event_loop()
+    runner = threading.Thread(target=loop.run_forever, daemon=True)
+    runner.start()
+
+    async def emit_all() -> None:
+        for i in range(8):
+            client.emit({"n": i})
+
+    try:
+        asyncio.run_coroutine_threadsafe(emit_all(), loop).result(timeout=2.0)
+        client.stop(timeout=3.0, drain=True)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        runner.join(timeout=2.0)
+        loop.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert client.counters.sent == 8
+
+
+def test_patch_selects_async_client_from_config() -> None:
+    result = patch(_config())
+
+    assert result.telemetry_enabled is True
+    assert isinstance(patcher._TELEMETRY, AsyncTelemetryClient)
+
+
+def test_ashutdown_drains_patched_client_on_its_loop() -> None:
+    httpd, endpoint = _serve()
+    patch(_config(endpoint))
+    client = patcher._TELEMETRY
+    assert isinstance(client, AsyncTelemetryClient)
+
+    async def lifespan() -> None:
+        for i in range(50):
+            client.emit({"n": i})
+        await cecil.ashutdown(timeout=5.0)
+
+    try:
+        asyncio.run(lifespan())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert patcher._TELEMETRY is None
+    assert _received() == list(range(50))
+    assert client.counters.sent == 50
+
+
+def test_shutdown_on_loop_thread_or_after_run_still_drains() -> None:
+    httpd, endpoint = _serve()
+    try:
+        patch(_config(endpoint))
+        inside = patcher._TELEMETRY
+        assert isinstance(inside, AsyncTelemetryClient)
+
+        async def on_loop() -> None:
+            for i in range(50):
+                inside.emit({"n": i})
+            cecil.shutdown(timeout=5.0)
+
+        asyncio.run(on_loop())
+
+        patch(_config(endpoint))
+        after = patcher._TELEMETRY
+        assert isinstance(after, AsyncTelemetryClient)
+
+        async def emit_only() -> None:
+            for i in range(50, 60):
+                after.emit({"n": i})
+
+        asyncio.run(emit_only())
+        cecil.shutdown(timeout=5.0)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert _received() == list(range(60))
+    assert (inside.counters.sent, after.counters.sent) == (50, 10)
+    assert inside.counters.abandoned_on_shutdown == after.counters.abandoned_on_shutdown == 0
+
+
+def test_deferred_analysis_events_reach_async_client(fake_openai_module) -> None:  # type: ignore[no-untyped-def]
+    httpd, endpoint = _serve()
+    patch(replace(_config(endpoint), deferred_analysis=True))
+    client = patcher._TELEMETRY
+    assert isinstance(client, AsyncTelemetryClient)
+    module = importlib.import_module("openai.resources.chat.completions")
+
+    async def run() -> None:
+        # Every event is emitted from the analysis thread, never from the loop itself.
+        completions = module.AsyncCompletions()
+        for i in range(5):
+            await completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": f"hi {i}"}]
+            )
+        await cecil.ashutdown(timeout=5.0)
+
+    try:
+        asyncio.run(run())
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert (client.counters.sent, client.counters.dropped) == (5, 0)
+    assert len(_Collector.events) == 5
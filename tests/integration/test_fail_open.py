@@ -10,7 +10,7 @@ def test_provider_call_survives_analyzer_failure(fake_openai_module, monkeypatch
     def boom(*args: object, **kwargs: object) -> dict[str, object]:
         raise RuntimeError("boom")
 
-    monkeypatch.setattr("cecil.adapters.openai_adapter.build_event", boom)
+    monkeypatch.setattr("cecil.adapters.common.build_event_record", boom)
 
     config = ObserverConfig(
         enabled=False,
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import gzip
+import json
+import multiprocessing
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from cecil import cli
+from cecil.config import ObserverConfig
+from cecil.event_model import EventContext, build_event_record, reset_history
+from cecil.offline import _analyze_in_pool, _parse, _route_model, analyze_file, record_context
+
+
+def _config() -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=8,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+
+
+_SYSTEM = "system: you are a careful support assistant. " * 20
+
+
+def _openai(i: int) -> dict[str, object]:
+    return {
+        "request": {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {"role": "system", "content": _SYSTEM},
+                {"role": "user", "content": f"question {i}"},
+            ],
+        },
+        "response": {
+            "model": "gpt-4o-mini-2024-07-18",
+            "created": 1_700_000_000 + i,
+            "usage": {"prompt_tokens": 300, "completion_tokens": 20},
+        },
+        "latency_ms": 100 + i,
+    }
+
+
+def _anthropic(i: int) -> dict[str, object]:
+    return {
+        "request": json.dumps(
+            {
+                "model": "claude-3-5-sonnet-20241022",
+                "system": _SYSTEM,
+                "messages": [{"role": "user", "content": f"question {i}"}],
+            }
+        ),
+        "response": {
+            "type": "message",
+            "usage": {"input_tokens": 320, "output_tokens": 30},
+        },
+        "timestamp_ms": 1_700_000_000_000 + i * 1000,
+    }
+
+
+def _write_log(path: Path, count: int) -> Path:
+    lines = []
+    for i in range(count):
+        lines.append(json.dumps(_openai(i) if i % 2 else _anthropic(i)))
+    lines.insert(3, "{not json")
+    lines.insert(5, json.dumps({"response": {}}))
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        handle.write("\n".join(lines) + "\n")
+    return path
+
+
+def test_record_context_reads_both_provider_shapes() -> None:
+    openai = record_context(_openai(1))
+    anthropic = record_context(_anthropic(2))
+
+    assert openai is not None and anthropic is not None
+    assert (openai.provider, openai.model, openai.prompt_tokens) == ("openai", "gpt-4o-mini", 300)
+    assert openai.timestamp_ms == 1_700_000_001_000
+    assert (anthropic.provider, anthropic.completion_tokens) == ("anthropic", 30)
+    assert "question 2" in anthropic.prompt
+    assert record_context({"response": {}}) is None
+
+
+def test_analyze_file_counts_records_and_skips_malformed_lines(tmp_path: Path) -> None:
+    report = analyze_file(_write_log(tmp_path / "calls.jsonl.gz", 40), config=_config()).data
+
+    assert report["input"]["records"] == 42  # type: ignore[index]
+    assert report["input"]["skipped"] == 2  # type: ignore[index]
+    assert report["event_count"] == 40
+    assert set(report["providers"]) == {"openai", "anthropic"}  # type: ignore[arg-type]
+    # Windows are anchored at the newest call in the file, not at the wall clock.
+    assert report["windows"]["60m"]["events"] == 40  # type: ignore[index]
+
+
+def test_worker_pool_matches_a_single_process(tmp_path: Path) -> None:
+    log = _write_log(tmp_path / "calls.jsonl.gz", 600)
+
+    inline = analyze_file(log, workers=1, config=_config()).data
+    pooled = analyze_file(log, workers=2, config=_config()).data
+
+    assert pooled == inline
+
+
+def test_records_are_routed_on_their_top_level_model() -> None:
+    record = {"metadata": {"model": "claude-3-haiku"}, **_openai(1)}
+    assert _route_model(_parse(json.dumps(record))) == "gpt-4o-mini"
+    assert _route_model(_parse(json.dumps(_anthropic(1)))) == "claude-3-5-sonnet-20241022"
+    assert _route_model(_parse("{not json")) == "unknown"
+
+
+def test_undated_records_count_toward_totals_but_not_windows(tmp_path: Path) -> None:
+    records = [_openai(i) for i in range(4)]
+    for record in records[2:]:
+        del record["response"]["created"]  # type: ignore[attr-defined]
+    log = tmp_path / "calls.jsonl"
+    log.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    report = analyze_file(log, config=_config()).data
+
+    assert report["event_count"] == 4
+    assert report["input"]["undated"] == 2  # type: ignore[index]
+    assert report["windows"]["60m"]["events"] == 2  # type: ignore[index]
+    assert analyze_file(log, workers=2, config=_config()).data == report
+
+
+def test_analyze_file_leaves_the_live_prefix_history_alone(tmp_path: Path) -> None:
+    context = EventContext(
+        provider="openai",
+        model="gpt-4o-mini",
+        prompt=_SYSTEM + "user: question",
+        prompt_tokens=300,
+        completion_tokens=20,
+        latency_ms=5,
+    )
+    reset_history()
+    build_event_record(context, _config())
+    analyze_file(_write_log(tmp_path / "calls.jsonl.gz", 10), config=_config())
+
+    assert build_event_record(context, _config()).prefix_similarity == 1.0
+
+
+def test_worker_pool_raises_when_a_worker_dies(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("cecil.offline._PUT_POLL_SECONDS", 0.1)
+
+    def records() -> Iterator[dict[str, object]]:
+        for i in range(20_000):
+            if i == 300:
+                for child in multiprocessing.active_children():
+                    if child.name.startswith("cecil-analyze"):
+                        child.kill()
+                        child.join(timeout=5)
+            yield _openai(i)
+
+    with pytest.raises(RuntimeError, match="exited unexpectedly"):
+        _analyze_in_pool(records(), 1, _config(), 60, 64)
+
+
+def test_cli_writes_a_json_report(tmp_path: Path) -> None:
+    log = _write_log(tmp_path / "calls.jsonl.gz", 10)
+    output = tmp_path / "out" / "report.json"
+
+    assert cli.main(["analyze", str(log), "--workers", "1", "--output", str(output)]) == 0
+
+    assert json.loads(output.read_text())["event_count"] == 10
+
+
+def test_cli_reports_unreadable_input(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    assert cli.main(["analyze", str(tmp_path / "missing.jsonl"), "--workers", "1"]) == 2
+    assert "cecil analyze" in capsys.readouterr().err
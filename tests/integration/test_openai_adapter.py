@@ -3,14 +3,16 @@ from __future__ import annotations
 import importlib
 
 from cecil.config import ObserverConfig
+from cecil.event_model import Event
 from cecil.patcher import patch
 
 
 def test_openai_adapter_emits_normalized_event(fake_openai_module, monkeypatch) -> None:  # type: ignore[no-untyped-def]
     captured: list[dict[str, object]] = []
 
-    def capture_emit(self, event: dict[str, object]) -> None:  # type: ignore[no-untyped-def]
-        captured.append(event)
+    def capture_emit(self, event: dict[str, object] | Event) -> None:  # type: ignore[no-untyped-def]
+        # Without dict listeners the sink receives the Event and builds the payload itself.
+        captured.append(event.to_dict() if isinstance(event, Event) else event)
 
     monkeypatch.setattr("cecil.telemetry.TelemetryClient.emit", capture_emit)
 
@@ -7,12 +7,11 @@ import pytest
 from cecil.adapters.common import extract_token_counts
 from cecil.config import ObserverConfig
 from cecil.cost import estimate_cost_usd
+from cecil.event_model import Event
 from cecil.patcher import patch
 
 RUN_LIVE = os.getenv("CECIL_RUN_LIVE_OPENAI") == "1"
-LIVE_CONFIRM = (
-    os.getenv("CECIL_LIVE_TEST_CONFIRM") == "I_UNDERSTAND_AND_ACCEPT_LIVE_API_RISK"
-)
+LIVE_CONFIRM = os.getenv("CECIL_LIVE_TEST_CONFIRM") == "I_UNDERSTAND_AND_ACCEPT_LIVE_API_RISK"
 pytestmark = pytest.mark.skipif(
     not RUN_LIVE,
     reason="Live OpenAI API tests are opt-in. Set CECIL_RUN_LIVE_OPENAI=1 to run.",
@@ -110,9 +109,9 @@ def _assert_within_budget(
         "to a priced model before running live spend-capped tests."
     )
     assert estimate.usd is not None
-    assert estimate.usd <= per_case_limit, (
-        f"Estimated per-test cost ${estimate.usd:.6f} exceeded cap ${per_case_limit:.6f}"
-    )
+    assert (
+        estimate.usd <= per_case_limit
+    ), f"Estimated per-test cost ${estimate.usd:.6f} exceeded cap ${per_case_limit:.6f}"
     tracker["total_usd"] += estimate.usd
     assert tracker["total_usd"] <= total_limit, (
         f"Estimated total live-test cost ${tracker['total_usd']:.6f} exceeded "
@@ -124,8 +123,9 @@ def _assert_within_budget(
 def _patch_and_capture(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, object]]:
     captured: list[dict[str, object]] = []
 
-    def capture_emit(self, event: dict[str, object]) -> None:  # type: ignore[no-untyped-def]
-        captured.append(event)
+    def capture_emit(self, event: dict[str, object] | Event) -> None:  # type: ignore[no-untyped-def]
+        # Without dict listeners the sink receives the Event and builds the payload itself.
+        captured.append(event.to_dict() if isinstance(event, Event) else event)
 
     monkeypatch.setattr("cecil.telemetry.TelemetryClient.emit", capture_emit)
 
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import sys
+import time
+import types
+
+from cecil.config import ObserverConfig
+from cecil.event_model import Event
+from cecil.patcher import patch
+
+
+def _config() -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=16,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=512,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+
+
+class _Chunk:
+    def __init__(self, **fields: object) -> None:
+        self.__dict__.update(fields)
+
+
+def _openai_chunks() -> list[_Chunk]:
+    return [
+        _Chunk(model="gpt-4o-mini", usage=None),
+        _Chunk(model="gpt-4o-mini", usage=None),
+        _Chunk(model="gpt-4o-mini", usage={"prompt_tokens": 42, "completion_tokens": 7}),
+    ]
+
+
+class _SyncStream:
+    def __init__(self, chunks: list[_Chunk]) -> None:
+        self._chunks = chunks
+        self.closed = False
+        self.response = "raw-response"
+
+    def __iter__(self):  # type: ignore[no-untyped-def]
+        for chunk in self._chunks:
+            time.sleep(0.01)
+            yield chunk
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _AsyncStream:
+    def __init__(self, chunks: list[_Chunk]) -> None:
+        self._chunks = chunks
+        self.closed = False
+
+    async def _gen(self):  # type: ignore[no-untyped-def]
+        for chunk in self._chunks:
+            yield chunk
+
+    def __aiter__(self):  # type: ignore[no-untyped-def]
+        return self._gen()
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _install_streaming_modules(chunks: list[_Chunk]) -> None:
+    openai = types.ModuleType("openai")
+    resources = types.ModuleType("openai.resources")
+    chat = types.ModuleType("openai.resources.chat")
+    completions = types.ModuleType("openai.resources.chat.completions")
+
+    class Completions:
+        def create(self, **kwargs: object) -> _SyncStream:
+            return _SyncStream(chunks)
+
+    class AsyncCompletions:
+        async def create(self, **kwargs: object) -> _AsyncStream:
+            return _AsyncStream(chunks)
+
+    completions.Completions = Completions
+    completions.AsyncCompletions = AsyncCompletions
+    sys.modules["openai"] = openai
+    sys.modules["openai.resources"] = resources
+    sys.modules["openai.resources.chat"] = chat
+    sys.modules["openai.resources.chat.completions"] = completions
+
+
+def _capture(monkeypatch) -> list[dict[str, object]]:  # type: ignore[no-untyped-def]
+    captured: list[dict[str, object]] = []
+
+    def capture_emit(self, event: dict[str, object] | Event) -> None:  # type: ignore[no-untyped-def]
+        # Without dict listeners the sink receives the Event and builds the payload itself.
+        captured.append(event.to_dict() if isinstance(event, Event) else event)
+
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient.emit", capture_emit)
+    return captured
+
+
+def test_sync_stream_passes_chunks_and_emits_on_exhaustion(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    chunks = _openai_chunks()
+    _install_streaming_modules(chunks)
+    captured = _capture(monkeypatch)
+    patch(_config())
+
+    module = importlib.import_module("openai.resources.chat.completions")
+    stream = module.Completions().create(
+        model="gpt-4o-mini", stream=True, messages=[{"role": "user", "content": "hi"}]
+    )
+    assert stream.response == "raw-response"
+    assert captured == []
+
+    received = list(stream)
+
+    assert all(a is b for a, b in zip(received, chunks))
+    assert len(captured) == 1
+    event = captured[0]
+    assert event["token_counts"] == {"prompt": 42, "completion": 7, "total": 49}
+    ttft = event["time_to_first_token_ms"]
+    assert isinstance(ttft, int)
+    assert 0 <= ttft <= int(event["latency_ms"])  # type: ignore[call-overload]
+    assert int(event["latency_ms"]) >= 25  # type: ignore[call-overload]
+
+
+def test_sync_stream_emits_once_when_closed_early(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    _install_streaming_modules(_openai_chunks())
+    captured = _capture(monkeypatch)
+    patch(_config())
+
+    module = importlib.import_module("openai.resources.chat.completions")
+    with module.Completions().create(model="gpt-4o-mini", stream=True, messages=[]) as stream:
+        next(iter(stream))
+    stream.close()
+
+    assert stream.closed is True
+    assert len(captured) == 1
+    assert captured[0]["token_counts"] == {"prompt": 0, "completion": 0, "total": 0}
+
+
+def test_async_stream_picks_up_anthropic_usage_events(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    chunks = [
+        _Chunk(
+            type="message_start",
+            message=_Chunk(
+                model="claude-3-5-haiku", usage={"input_tokens": 30, "output_tokens": 1}
+            ),
+        ),
+        _Chunk(type="content_block_delta"),
+        _Chunk(type="message_delta", usage={"output_tokens": 20}),
+        _Chunk(type="message_stop"),
+    ]
+    _install_streaming_modules(chunks)
+    captured = _capture(monkeypatch)
+    patch(_config())
+
+    module = importlib.import_module("openai.resources.chat.completions")
+
+    async def run() -> list[object]:
+        stream = await module.AsyncCompletions().create(stream=True, messages=[])
+        return [chunk async for chunk in stream]
+
+    received = asyncio.run(run())
+
+    assert len(received) == 4
+    assert len(captured) == 1
+    assert captured[0]["model"] == "claude-3-5-haiku"
+    assert captured[0]["token_counts"] == {"prompt": 30, "completion": 20, "total": 50}
+
+
+def test_non_stream_events_have_no_ttft(fake_openai_module, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    captured = _capture(monkeypatch)
+    patch(_config())
+
+    module = importlib.import_module("openai.resources.chat.completions")
+    module.Completions().create(model="gpt-4o-mini", messages=[])
+
+    assert captured[0]["time_to_first_token_ms"] is None
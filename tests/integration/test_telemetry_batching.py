@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import gzip
+import json
+import socketserver
+import threading
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler
+
+from cecil.config import ObserverConfig
+from cecil.telemetry import TelemetryClient
+
+
+class _BatchHandler(BaseHTTPRequestHandler):
+    bodies: list[list[dict[str, object]]] = []
+    encodings: list[str | None] = []
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length", "0"))
+        body = self.rfile.read(length)
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        if self.headers.get("Content-Type") == "application/x-ndjson":
+            events = [json.loads(line) for line in body.decode("utf-8").splitlines() if line]
+        else:
+            events = json.loads(body.decode("utf-8"))
+        _BatchHandler.bodies.append(events)
+        _BatchHandler.encodings.append(encoding)
+
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, fmt: str, *args: object) -> None:
+        return
+
+
+def _config(endpoint: str = "http://127.0.0.1:1/unreachable") -> ObserverConfig:
+    return ObserverConfig(
+        enabled=True,
+        api_key="lok_test.secret",
+        endpoint=endpoint,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=256,
+        timeout_seconds=1.0,
+        retry_budget=1,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+        telemetry_batch_size=10,
+        telemetry_batch_interval_ms=200,
+    )
+
+
+def test_batches_are_sent_as_gzip_ndjson() -> None:
+    _BatchHandler.bodies = []
+    _BatchHandler.encodings = []
+    with socketserver.ThreadingTCPServer(("127.0.0.1", 0), _BatchHandler) as httpd:
+        port = httpd.server_address[1]
+        server = threading.Thread(target=httpd.serve_forever, daemon=True)
+        server.start()
+
+        client = TelemetryClient(_config(f"http://127.0.0.1:{port}/v1/events"))
+        for i in range(25):
+            client.emit({"n": i})
+        client.stop(timeout=3.0, drain=True)
+        httpd.shutdown()
+
+    received = [event["n"] for body in _BatchHandler.bodies for event in body]
+    assert sorted(received) == list(range(25))
+    assert len(_BatchHandler.bodies) < 25
+    assert set(_BatchHandler.encodings) == {"gzip"}
+    assert client.counters.sent == 25
+    assert client.counters.batches_sent == len(_BatchHandler.bodies)
+
+
+def test_json_array_format_without_compression() -> None:
+    config = replace(_config(), telemetry_batch_format="json", telemetry_gzip=False)
+    client = TelemetryClient(config)
+    body, headers = client._encode_batch([{"n": 1}, {"n": 2}])
+    client.stop(timeout=0.1, drain=False)
+
+    assert headers == {"Content-Type": "application/json"}
+    assert json.loads(body) == [{"n": 1}, {"n": 2}]
+
+
+def test_partial_batch_retries_only_rejected_events(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    calls: list[list[int]] = []
+
+    def send_batch(self, batch):  # type: ignore[no-untyped-def]
+        numbers = [int(event["n"]) for event in batch]
+        calls.append(numbers)
+        # Reject odd events on the first attempt only.
+        if len(calls) == 1:
+            return [i for i, n in enumerate(numbers) if n % 2]
+        return []
+
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient._send_batch_once", send_batch)
+    client = TelemetryClient(replace(_config(), telemetry_batch_interval_ms=1000))
+    for i in range(10):
+        client.emit({"n": i})
+    client.stop(timeout=3.0, drain=True)
+
+    assert calls == [list(range(10)), [1, 3, 5, 7, 9]]
+    assert client.counters.sent == 10
+    assert client.counters.partial_batches == 1
+    assert client.counters.retried_events == 5
+    assert client.counters.batches_sent == 2
+    assert client.counters.failures == 0
+
+
+def test_batch_failures_count_every_event(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setattr(
+        "cecil.telemetry.TelemetryClient._send_batch_once",
+        lambda self, batch: list(range(len(batch))),
+    )
+    client = TelemetryClient(replace(_config(), retry_budget=0))
+    attempts = 30
+    for i in range(attempts):
+        client.emit({"n": i})
+    client.stop(timeout=2.0, drain=True)
+
+    counters = client.counters
+    assert counters.sent == 0
+    total = counters.sent + counters.failures + counters.dropped + counters.abandoned_on_shutdown
+    assert total == attempts
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from cecil import telemetry
+from cecil.config import ObserverConfig
+from cecil.spool import Spool
+from cecil.telemetry import TelemetryClient
+
+
+class _Collector(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    events: list[dict[str, object]] = []
+    _lock = threading.Lock()
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if self.headers.get("Content-Type") == "application/x-ndjson":
+            batch = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        else:
+            batch = [json.loads(body.decode("utf-8"))]
+        if any(event.get("bad") for event in batch):
+            # Rejected for good, as a server does with a payload it cannot accept.
+            self.send_response(400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with _Collector._lock:
+            _Collector.events.extend(batch)
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, fmt: str, *args: object) -> None:
+        return
+
+
+def _serve() -> tuple[ThreadingHTTPServer, str]:
+    _Collector.events = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Collector)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}/v1/events"
+
+
+def _config(spool_dir: Path, endpoint: str = "http://127.0.0.1:1/unreachable") -> ObserverConfig:
+    return ObserverConfig(
+        enabled=True,
+        api_key="lok_test.secret",
+        endpoint=endpoint,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=64,
+        timeout_seconds=0.2,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+        telemetry_spool_dir=str(spool_dir),
+        telemetry_spool_fsync_ms=0,
+    )
+
+
+def _received() -> list[object]:
+    return sorted(event["n"] for event in _Collector.events)  # type: ignore[type-var]
+
+
+def _wait_for(predicate: object, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not predicate():  # type: ignore[operator]
+        time.sleep(0.02)
+
+
+def _spooled_lines(directory: Path) -> int:
+    return sum(len(path.read_bytes().splitlines()) for path in directory.iterdir())
+
+
+@pytest.fixture(autouse=True)
+def _fast_replay(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(telemetry, "_REPLAY_INTERVAL", 0.05)
+
+
+def test_unreachable_endpoint_spools_instead_of_failing(tmp_path: Path) -> None:
+    client = TelemetryClient(_config(tmp_path))
+    for i in range(6):
+        client.emit({"n": i})
+    client.stop(timeout=3.0, drain=True)
+
+    assert client.counters.failures == 0
+    assert client.counters.abandoned_on_shutdown == 0
+    assert client.counters.spooled == 6
+    assert all(path.name.endswith(".seg") for path in tmp_path.iterdir())
+    assert _spooled_lines(tmp_path) == 6
+
+
+def test_next_process_replays_spooled_events_in_order(tmp_path: Path) -> None:
+    first = TelemetryClient(_config(tmp_path))
+    for i in range(5):
+        first.emit({"n": i})
+    first.stop(timeout=3.0, drain=True)
+    assert first.counters.spooled == 5
+
+    httpd, endpoint = _serve()
+    second = TelemetryClient(replace(_config(tmp_path, endpoint), telemetry_batch_size=2))
+    try:
+        second.emit({"n": 5})
+        _wait_for(lambda: len(_Collector.events) == 6)
+        second.stop(timeout=3.0, drain=True)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    # Spooled events go out before anything emitted after the restart.
+    assert [event["n"] for event in _Collector.events] == list(range(6))
+    assert second.counters.replayed == 5
+    assert second.counters.spooled + second.counters.sent == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_worker_replays_after_endpoint_recovers(tmp_path: Path) -> None:
+    httpd, endpoint = _serve()
+    host, port = httpd.server_address[:2]
+    httpd.shutdown()
+    httpd.server_close()
+
+    client = TelemetryClient(_config(tmp_path, endpoint))
+    for i in range(4):
+        client.emit({"n": i})
+    _wait_for(lambda: client.counters.spooled == 4)
+
+    revived = ThreadingHTTPServer((str(host), int(port)), _Collector)
+    revived.daemon_threads = True
+    threading.Thread(target=revived.serve_forever, daemon=True).start()
+    try:
+        _wait_for(lambda: client.counters.replayed == 4)
+        client.emit({"n": 4})
+        _wait_for(lambda: client.counters.sent == 1)
+        client.stop(timeout=3.0, drain=True)
+    finally:
+        revived.shutdown()
+        revived.server_close()
+
+    assert _received() == list(range(5))
+    assert client.counters.failures == 0
+
+
+def test_rejected_event_is_counted_as_failure_and_never_spooled(tmp_path: Path) -> None:
+    httpd, endpoint = _serve()
+    client = TelemetryClient(replace(_config(tmp_path, endpoint), retry_budget=2))
+    try:
+        client.emit({"n": -1, "bad": True})
+        for i in range(20):
+            client.emit({"n": i})
+        _wait_for(lambda: client.counters.sent == 20)
+        client.stop(timeout=3.0, drain=True)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert _received() == list(range(20))
+    assert (client.counters.sent, client.counters.failures) == (20, 1)
+    assert (client.counters.spooled, client.counters.retried_events) == (0, 0)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_replay_drops_rejected_records_and_delivers_the_rest(
+    tmp_path: Path, batch_size: int
+) -> None:
+    first = TelemetryClient(_config(tmp_path))
+    first.emit({"n": 0})
+    first.emit({"n": -1, "bad": True})
+    for i in range(1, 6):
+        first.emit({"n": i})
+    first.stop(timeout=3.0, drain=True)
+    assert first.counters.spooled == 7
+
+    httpd, endpoint = _serve()
+    config = replace(_config(tmp_path, endpoint), telemetry_batch_size=batch_size)
+    second = TelemetryClient(config)
+    try:
+        _wait_for(lambda: not second._spooling)
+        second.emit({"n": 6})
+        _wait_for(lambda: second.counters.sent == 1)
+        second.stop(timeout=3.0, drain=True)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    # With batching, the rejected record takes the rest of its batch with it.
+    lost = 1 if batch_size == 1 else 3
+    assert second.counters.failures == lost
+    assert second.counters.replayed == 7 - lost
+    assert second.counters.sent == 1
+    assert 6 in _received()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spool_rotates_segments_and_enforces_size_cap(tmp_path: Path) -> None:
+    spool = Spool(str(tmp_path), max_bytes=100, segment_bytes=30, fsync_interval=0.0)
+    line = b'{"n":"0123456"}'
+
+    assert spool.append([line] * 10) == 6
+    spool.close()
+
+    segments = sorted(tmp_path.iterdir())
+    assert len(segments) == 3
+    assert all(path.name.endswith(".seg") for path in segments)
+    assert sum(path.stat().st_size for path in segments) <= 100
+
+
+def test_spool_claims_are_exclusive_and_release_keeps_the_rest(tmp_path: Path) -> None:
+    spool = Spool(str(tmp_path), max_bytes=1024, segment_bytes=1024, fsync_interval=0.0)
+    spool.append([b"a", b"b", b"c"])
+
+    claimed = spool.claim()
+    assert claimed is not None
+    assert spool.claim() is None
+    assert spool.read(claimed) == [b"a", b"b", b"c"]
+
+    spool.release(claimed, [b"b", b"c"])
+    again = spool.claim()
+    assert again is not None
+    assert spool.read(again) == [b"b", b"c"]
+    spool.complete(again)
+    assert not spool.pending()
+
+
+def test_spool_recovers_segments_from_dead_writers(tmp_path: Path) -> None:
+    pid = os.getpid()
+    (tmp_path / f"{1:020d}-{pid}.open").write_bytes(b"a\n")
+    (tmp_path / f"{2:020d}-{pid}.seg.{pid}.replay").write_bytes(b"b\n")
+
+    spool = Spool(str(tmp_path), max_bytes=1024, segment_bytes=1024, fsync_interval=0.0)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"{1:020d}-{pid}.seg",
+        f"{2:020d}-{pid}.seg",
+    ]
+    assert spool.pending()
+
+
+def test_full_spool_falls_back_to_failure_accounting(tmp_path: Path) -> None:
+    client = TelemetryClient(replace(_config(tmp_path), telemetry_spool_max_bytes=20))
+    for i in range(3):
+        client.emit({"n": i})
+    client.stop(timeout=3.0, drain=True)
+
+    counters = client.counters
+    assert counters.spooled == 2
+    assert counters.spooled + counters.failures + counters.abandoned_on_shutdown == 3
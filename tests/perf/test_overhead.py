@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import time
+from typing import Callable
 
+from cecil.cache_analysis import detect_cache_breakers, prefix_similarity_score
+from cecil.canonicalize import canonicalize_prompt
 from cecil.config import ObserverConfig
-from cecil.event_model import EventContext, build_event, reset_history
+from cecil.event_model import EventContext, PrefixHistory, build_event, reset_history
+from cecil.scanner import scan_prompt
 from cecil.telemetry import TelemetryClient
 
 
@@ -49,6 +53,48 @@ def test_build_event_overhead_budget() -> None:
     assert avg_ms < 1.5
 
 
+def test_large_prompt_similarity_avoids_character_scan() -> None:
+    history = PrefixHistory(max_models=4)
+    static = "Retrieved passage: the quarterly filing lists revenue by segment. " * 3000
+    prompts = [f"{static} question {i}" for i in range(20)]
+
+    start = time.perf_counter()
+    for prompt in prompts:
+        score = history.similarity("gpt-4o-mini", prompt)
+    fingerprint_ms = (time.perf_counter() - start) / len(prompts) * 1000
+
+    start = time.perf_counter()
+    for previous, prompt in zip(prompts, prompts[1:]):
+        prefix_similarity_score(previous, prompt)
+    scan_ms = (time.perf_counter() - start) / (len(prompts) - 1) * 1000
+
+    print(f"~200 KB prompt: fingerprint {fingerprint_ms:.3f} ms, char scan {scan_ms:.3f} ms")
+    assert score == prefix_similarity_score(prompts[-2], prompts[-1])
+    assert fingerprint_ms < scan_ms
+
+
+def test_single_pass_scan_beats_sequential_passes_on_large_prompt() -> None:
+    prompt = (
+        "Retrieved passage: the quarterly filing lists revenue by segment. " * 3000
+        + "generated_at=2025-01-01T00:00:00Z request_id=abcdef123456"
+    )
+
+    def best_ms(fn: Callable[[str], object]) -> float:
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            fn(prompt)
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    sequential_ms = best_ms(lambda p: (canonicalize_prompt(p), detect_cache_breakers(p)))
+    scan_ms = best_ms(scan_prompt)
+
+    print(f"~200 KB prompt: sequential {sequential_ms:.2f} ms, single pass {scan_ms:.2f} ms")
+    assert scan_prompt(prompt) == (canonicalize_prompt(prompt), detect_cache_breakers(prompt))
+    assert scan_ms < sequential_ms
+
+
 def test_emit_backpressure_non_blocking() -> None:
     config = _config(local_only=False)
     client = TelemetryClient(config)
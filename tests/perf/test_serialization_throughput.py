@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+import time
+
+from cecil.config import ObserverConfig
+from cecil.event_model import EventContext, build_event, reset_history
+from cecil.serialization import BACKENDS, JsonSerializer
+
+
+def _events(count: int) -> list[dict[str, object]]:
+    reset_history()
+    config = ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=8,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+    return [
+        build_event(
+            EventContext(
+                provider="openai",
+                model="gpt-4o-mini",
+                prompt=f"now=2025-01-01T00:00:00Z system: answer briefly. question {i}",
+                prompt_tokens=120,
+                completion_tokens=30,
+                latency_ms=5,
+            ),
+            config,
+        )
+        for i in range(count)
+    ]
+
+
+def test_serializer_backends_events_per_second() -> None:
+    events = _events(500)
+    rounds = 10
+    rates: dict[str, float] = {}
+
+    for backend in BACKENDS:
+        serializer = JsonSerializer(backend)
+        if serializer.backend != backend:
+            continue
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for event in events:
+                serializer.dumps(event)
+        rates[backend] = len(events) * rounds / (time.perf_counter() - start)
+        assert json.loads(serializer.dumps(events[-1])) == events[-1]
+
+    print(", ".join(f"{name}: {rate:,.0f} events/s" for name, rate in rates.items()))
+    assert "json" in rates
+    # Guardrail only: an installed fast backend should not be slower than the stdlib.
+    for name, rate in rates.items():
+        assert rate > rates["json"] * 0.8, name
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cecil.transport import ConnectionPool
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    drop_after_response = False
+    _lock = threading.Lock()
+
+    def setup(self) -> None:
+        super().setup()
+        with _KeepAliveHandler._lock:
+            _KeepAliveHandler.connections += 1
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length", "0"))
+        self.rfile.read(length)
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        # Close without announcing it, like a collector reaping idle keep-alive sockets.
+        self.close_connection = _KeepAliveHandler.drop_after_response
+
+    def log_message(self, fmt: str, *args: object) -> None:
+        return
+
+
+def _serve() -> tuple[ThreadingHTTPServer, str]:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}/v1/events"
+
+
+def test_pooled_sends_reuse_connections_and_beat_one_shot_requests() -> None:
+    httpd, endpoint = _serve()
+    body = b'{"schema_version":"v1","provider":"openai"}'
+    headers = {"Content-Type": "application/json", "Authorization": "Bearer lok_test.secret"}
+    sends = 200
+
+    try:
+        _KeepAliveHandler.connections = 0
+        start = time.perf_counter()
+        for _ in range(sends):
+            request = urllib.request.Request(endpoint, data=body, headers=headers, method="POST")
+            with urllib.request.urlopen(request, timeout=2.0) as response:
+                assert response.status == 202
+        one_shot_elapsed = time.perf_counter() - start
+        one_shot_connections = _KeepAliveHandler.connections
+
+        _KeepAliveHandler.connections = 0
+        pool = ConnectionPool(endpoint, timeout=2.0, max_size=2)
+        start = time.perf_counter()
+        for _ in range(sends):
+            status, _ = pool.post(body, headers)
+            assert status == 202
+        pooled_elapsed = time.perf_counter() - start
+        pool.close()
+        pooled_connections = _KeepAliveHandler.connections
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    print(
+        f"one-shot: {one_shot_elapsed / sends * 1000:.3f} ms/send ({one_shot_connections} conns), "
+        f"pooled: {pooled_elapsed / sends * 1000:.3f} ms/send ({pooled_connections} conns)"
+    )
+    assert one_shot_connections == sends
+    assert pooled_connections == 1
+    # Guardrail only: keep-alive sends should not be slower than a handshake per send.
+    assert pooled_elapsed < one_shot_elapsed * 1.2
+
+
+def test_pool_reconnects_after_server_drops_idle_connection() -> None:
+    httpd, endpoint = _serve()
+    headers = {"Content-Type": "application/json"}
+    pool = ConnectionPool(endpoint, timeout=2.0, max_size=1)
+    _KeepAliveHandler.drop_after_response = True
+    try:
+        assert pool.post(b"{}", headers)[0] == 202
+        time.sleep(0.05)
+        assert pool.post(b"{}", headers)[0] == 202
+    finally:
+        _KeepAliveHandler.drop_after_response = False
+        pool.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert pool.connections_opened == 2
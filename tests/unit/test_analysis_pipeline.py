@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import importlib
+import threading
+from dataclasses import replace
+
+import cecil
+from cecil.config import ObserverConfig
+from cecil.event_model import Event, EventContext
+from cecil.patcher import analysis_pipeline, patch, shutdown
+from cecil.pipeline import AnalysisPipeline
+
+
+def _config(analysis_queue_size: int = 64) -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=16,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+        deferred_analysis=True,
+        analysis_queue_size=analysis_queue_size,
+    )
+
+
+def _context(i: int) -> EventContext:
+    return EventContext(
+        provider="openai",
+        model="gpt-4o-mini",
+        prompt=f"prompt {i}",
+        prompt_tokens=10,
+        completion_tokens=5,
+        latency_ms=3,
+        timestamp_ms=1_700_000_000_000 + i,
+    )
+
+
+def test_pipeline_builds_and_emits_events() -> None:
+    emitted: list[Event] = []
+    pipeline = AnalysisPipeline(_config(), emit=emitted.append)
+
+    for i in range(20):
+        pipeline.submit(_context(i))
+    pipeline.stop(timeout=2.0, drain=True)
+
+    assert pipeline.counters.processed == 20
+    assert len(emitted) == 20
+    assert [event.timestamp_ms for event in emitted] == [1_700_000_000_000 + i for i in range(20)]
+
+
+def test_pipeline_accounts_drops_and_abandoned() -> None:
+    release = threading.Event()
+
+    def blocking_emit(event: Event) -> None:
+        release.wait(timeout=1.0)
+
+    pipeline = AnalysisPipeline(_config(analysis_queue_size=4), emit=blocking_emit)
+    attempts = 50
+    for i in range(attempts):
+        pipeline.submit(_context(i))
+
+    pipeline.stop(timeout=0.01, drain=False)
+    release.set()
+    pipeline.stop(timeout=1.0)
+
+    counters = pipeline.counters
+    assert counters.dropped > 0
+    total = (
+        counters.processed + counters.failures + counters.dropped + counters.abandoned_on_shutdown
+    )
+    assert total == attempts
+
+
+def test_pipeline_counts_emit_failures() -> None:
+    def failing_emit(event: Event) -> None:
+        raise RuntimeError("listener boom")
+
+    pipeline = AnalysisPipeline(_config(), emit=failing_emit)
+    pipeline.submit(_context(0))
+    pipeline.stop(timeout=2.0, drain=True)
+
+    assert pipeline.counters.failures == 1
+    assert pipeline.counters.processed == 0
+
+
+def test_deferred_patch_flushes_on_shutdown(fake_openai_module) -> None:  # type: ignore[no-untyped-def]
+    session = cecil.start_session(auto_patch=False, max_events=5)
+    patch(_config())
+    pipeline = analysis_pipeline()
+    assert pipeline is not None
+
+    module = importlib.import_module("openai.resources.chat.completions")
+    client = module.Completions()
+    response = client.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "hello"}])
+    assert response.model == "gpt-4o-mini"
+
+    shutdown(timeout=2.0, drain=True)
+    report = session.report_dict()
+    session.close()
+
+    assert pipeline.counters.processed == 1
+    assert report["event_count"] == 1
+    assert analysis_pipeline() is None
+
+
+def test_inline_mode_has_no_pipeline(fake_openai_module) -> None:  # type: ignore[no-untyped-def]
+    patch(replace(_config(), deferred_analysis=False))
+    assert analysis_pipeline() is None
+
+
+def test_concurrent_drops_are_all_counted() -> None:
+    release = threading.Event()
+
+    def blocking_emit(event: Event) -> None:
+        release.wait(timeout=2.0)
+
+    pipeline = AnalysisPipeline(_config(analysis_queue_size=1), emit=blocking_emit)
+    threads, per_thread = 8, 2_000
+    barrier = threading.Barrier(threads)
+
+    def submit_many() -> None:
+        barrier.wait()
+        for i in range(per_thread):
+            pipeline.submit(_context(i))
+
+    workers = [threading.Thread(target=submit_many) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    release.set()
+    pipeline.stop(timeout=2.0, drain=True)
+
+    counters = pipeline.counters
+    assert counters.processed + counters.dropped == threads * per_thread
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from cecil.cache_analysis import detect_cache_breakers, prefix_similarity_score
+from cecil.cache_analysis import (
+    PromptFingerprint,
+    detect_cache_breakers,
+    fingerprint_common_prefix,
+    prefix_similarity_score,
+)
+from cecil.event_model import PrefixHistory
 
 
 def test_prefix_similarity_stable_for_equivalent_noise() -> None:
@@ -19,3 +25,72 @@ def test_detects_breaker_classes() -> None:
     assert "timestamp" in categories
     assert "uuid" in categories
     assert "random_id" in categories
+
+
+def test_fingerprint_keeps_digests_not_prompt_text() -> None:
+    prompt = "static context " * 10_000
+    fingerprint = PromptFingerprint(prompt)
+
+    assert fingerprint.length == len(prompt)
+    assert len(fingerprint.digests) == (len(prompt) // 256) * 8
+    assert len(fingerprint.head) + len(fingerprint.tail) + len(fingerprint.hot_block) <= 512
+
+
+def test_fingerprint_common_prefix_is_exact_for_short_and_tail_divergence() -> None:
+    for a, b in [
+        ("system policy", "system polish"),
+        ("x" * 300 + "abc", "x" * 300 + "abd"),
+        ("x" * 512, "x" * 512 + "more"),
+        ("", "anything"),
+    ]:
+        previous = PromptFingerprint(a)
+        current = PromptFingerprint(b)
+        expected = (
+            len(a) if b.startswith(a) else next(i for i, (x, y) in enumerate(zip(a, b)) if x != y)
+        )
+        assert fingerprint_common_prefix(previous, current, b) == expected
+
+
+def test_history_similarity_converges_to_exact_on_repeated_divergence_point() -> None:
+    history = PrefixHistory(max_models=4)
+    static = "You are a support agent. Follow policy section 4.2 exactly. " * 200
+    prompts = [f"{static}question {i}: where is order {i}?" for i in range(4)]
+
+    scores = [history.similarity("gpt-4o", prompt) for prompt in prompts]
+
+    assert scores[0] == 0.0
+    for previous, current, score in zip(prompts, prompts[1:], scores[1:]):
+        assert score == prefix_similarity_score(previous, current)
+
+
+def test_history_similarity_is_exact_on_first_comparison() -> None:
+    static = "You are a support agent. Follow policy section 4.2 exactly. " * 60
+    cases = [
+        (f"{static}question: where is my order?", f"{static}question: can I get a refund?"),
+        # A strict prefix of the previous prompt.
+        (static * 2, static + static[:1000]),
+        (static, static + "extra context"),
+    ]
+    for previous, current in cases:
+        history = PrefixHistory(max_models=4)
+        history.similarity("gpt-4o", previous)
+        assert history.similarity("gpt-4o", current) == prefix_similarity_score(previous, current)
+
+
+def test_history_index_finds_reuse_across_interleaved_workflows() -> None:
+    support = "You are a support agent. Follow refund policy 4.2 exactly. " * 40
+    billing = "You are a billing assistant. Quote invoice totals in USD. " * 40
+    prompts = [f"{static}question {i}" for i in range(4) for static in (support, billing)]
+
+    indexed = PrefixHistory(max_models=4, index_entries=64)
+    latest_only = PrefixHistory(max_models=4, index_entries=0)
+    scores = [indexed.similarity("gpt-4o", prompt) for prompt in prompts]
+    baseline = [latest_only.similarity("gpt-4o", prompt) for prompt in prompts]
+
+    assert max(baseline) < 0.05
+    for earlier, prompt, score in zip(prompts, prompts[2:], scores[2:]):
+        # Never above the exact shared prefix with the same workflow's previous prompt.
+        assert 0.9 < score <= prefix_similarity_score(earlier, prompt)
+    # Other models never match, and the index stays within its entry budget.
+    assert indexed.similarity("claude-3-5-sonnet", prompts[0]) == 0.0
+    assert len(indexed._index) <= 64
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import hashlib
+
 from cecil.canonicalize import canonicalize_prompt
-from cecil.privacy import hash_prefix_blocks
+from cecil.privacy import PrefixHasher, cdc_boundaries, hash_prefix_blocks
 
 
 def test_canonicalize_is_stable() -> None:
@@ -19,3 +21,58 @@ def test_prefix_hashing_is_deterministic() -> None:
     second = hash_prefix_blocks(value)
     assert first == second
     assert len(first) == 3
+
+
+def test_sha256_hasher_matches_legacy_blocks() -> None:
+    value = "policy text " * 100
+
+    assert PrefixHasher("sha256", max_blocks=3).blocks(value) == hash_prefix_blocks(value)
+    assert PrefixHasher("sha256", max_blocks=10).blocks(value) == hash_prefix_blocks(
+        value, max_blocks=10
+    )
+
+
+def test_blake2b_hasher_hashes_utf8_bytes_with_key() -> None:
+    value = "règle: répondre en JSON. " * 40
+    data = value.encode("utf-8")
+
+    blocks = PrefixHasher("blake2b", key="tenant-secret", max_blocks=8).blocks(value)
+
+    assert len(blocks) == 8
+    assert (
+        blocks[1] == hashlib.blake2b(data[64:128], digest_size=8, key=b"tenant-secret").hexdigest()
+    )
+    assert blocks != PrefixHasher("blake2b", key="other", max_blocks=8).blocks(value)
+    assert len(PrefixHasher("blake2b", max_blocks=1000).blocks(value)) == -(-len(data) // 64)
+
+
+def test_cdc_blocks_survive_an_insertion_near_the_start() -> None:
+    words = [
+        "answer",
+        "in",
+        "json",
+        "and",
+        "cite",
+        "the",
+        "policy",
+        "section",
+        "when",
+        "sources",
+        "allow",
+    ]
+    value = " ".join(f"{words[(i * 7) % len(words)]}-{i}" for i in range(800))
+    edited = "Note: " + value
+
+    for algorithm in ("sha256", "blake2b"):
+        fixed = PrefixHasher(algorithm, max_blocks=32)
+        cdc = PrefixHasher(algorithm, max_blocks=32, chunking="cdc")
+        assert not set(fixed.blocks(value)) & set(fixed.blocks(edited))
+        before, after = cdc.blocks(value), cdc.blocks(edited)
+        assert len(before) == len(after) == 32
+        assert len(set(before) & set(after)) >= 24
+        assert all(len(block) == 16 for block in before)
+
+    ends = cdc_boundaries(value.encode("utf-8"), 1000)
+    sizes = [end - start for start, end in zip([0, *ends], ends)]
+    assert ends[-1] == len(value)
+    assert all(32 < size <= 256 for size in sizes[:-1])
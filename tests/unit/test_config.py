@@ -37,3 +37,53 @@ def test_explicit_disable_overrides_values(monkeypatch) -> None:  # type: ignore
     assert config.local_only is True
     assert config.api_key is None
     assert config.endpoint is None
+
+
+def test_analysis_max_chars_parses_and_falls_back(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("CECIL_ANALYSIS_MAX_CHARS", "65536")
+    assert load_config().analysis_max_chars == 65536
+
+    monkeypatch.setenv("CECIL_ANALYSIS_MAX_CHARS", "lots")
+    assert load_config().analysis_max_chars == 0
+
+
+def test_analysis_cache_bytes_parses_and_falls_back(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("CECIL_ANALYSIS_CACHE_BYTES", "0")
+    assert load_config().analysis_cache_bytes == 0
+
+    monkeypatch.setenv("CECIL_ANALYSIS_CACHE_BYTES", "big")
+    assert load_config().analysis_cache_bytes == 8 * 1024 * 1024
+
+
+def test_prefix_hash_settings_parse_and_fall_back(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("CECIL_PREFIX_HASH", "BLAKE2B")
+    monkeypatch.setenv("CECIL_PREFIX_HASH_KEY", "tenant-secret")
+    monkeypatch.setenv("CECIL_PREFIX_HASH_BLOCKS", "1000")
+    monkeypatch.setenv("CECIL_PREFIX_HASH_CHUNKING", "CDC")
+    monkeypatch.setenv("CECIL_PREFIX_INDEX_ENTRIES", "0")
+    config = load_config()
+    assert config.prefix_index_entries == 0
+    assert (config.prefix_hash_algorithm, config.prefix_hash_key) == ("blake2b", "tenant-secret")
+    assert (config.prefix_hash_blocks, config.prefix_hash_chunking) == (256, "cdc")
+
+    monkeypatch.setenv("CECIL_PREFIX_HASH", "md5")
+    monkeypatch.setenv("CECIL_PREFIX_HASH_BLOCKS", "many")
+    monkeypatch.setenv("CECIL_PREFIX_HASH_CHUNKING", "rabin")
+    monkeypatch.setenv("CECIL_PREFIX_INDEX_ENTRIES", "lots")
+    config = load_config()
+    assert config.prefix_index_entries == 1024
+    assert (config.prefix_hash_algorithm, config.prefix_hash_blocks) == ("sha256", 3)
+    assert config.prefix_hash_chunking == "fixed"
+
+
+def test_spool_settings_parse_and_fall_back(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("CECIL_TELEMETRY_SPOOL_DIR", "/var/spool/cecil")
+    monkeypatch.setenv("CECIL_TELEMETRY_SPOOL_MAX_BYTES", "10")
+    monkeypatch.setenv("CECIL_TELEMETRY_SPOOL_FSYNC_MS", "soon")
+
+    config = load_config()
+
+    assert config.telemetry_spool_dir == "/var/spool/cecil"
+    assert config.telemetry_spool_max_bytes == 1024
+    assert config.telemetry_spool_segment_bytes == 1024 * 1024
+    assert config.telemetry_spool_fsync_ms == 200
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import gc
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 
+from cecil import event_model
+from cecil.cache_analysis import EXACT_PREFIX_CHARS
 from cecil.config import ObserverConfig
-from cecil.event_model import EventContext, _history_for_size, build_event, reset_history
+from cecil.event_model import (
+    EventContext,
+    _history_for_size,
+    analysis_cache_counters,
+    build_event,
+    build_event_record,
+    reset_analysis_cache,
+    reset_history,
+)
+from cecil.schema import validate_event
 
 
 def _config(history_size: int) -> ObserverConfig:
@@ -43,6 +56,30 @@ def test_history_is_bounded() -> None:
     assert _history_for_size(5).size() <= 5
 
 
+def test_history_cache_is_bounded_and_keyed_by_model_family() -> None:
+    reset_history()
+    for size in range(1, 20):
+        _history_for_size(size)
+    assert len(event_model._HISTORY_BY_SIZE) == event_model._MAX_HISTORIES
+
+    reset_history()
+    config = _config(history_size=8)
+    for model in ("gpt-4o-mini", "gpt-4o-mini-2024-07-18", "ft:gpt-4o-mini-2024-07-18:acme::x"):
+        event = build_event(
+            EventContext(
+                provider="openai",
+                model=model,
+                prompt="shared system prompt " * 20,
+                prompt_tokens=1,
+                completion_tokens=1,
+                latency_ms=1,
+            ),
+            config,
+        )
+    assert _history_for_size(8).size() == 1
+    assert event["prefix_similarity"] == 1.0
+
+
 def test_history_thread_safe_under_concurrency() -> None:
     reset_history()
     config = _config(history_size=10)
@@ -67,3 +104,157 @@ def test_history_thread_safe_under_concurrency() -> None:
     assert len(scores) == 200
     assert all(0.0 <= s <= 1.0 for s in scores)
     assert _history_for_size(10).size() <= 10
+
+
+def test_analysis_budget_truncates_consistently() -> None:
+    reset_history()
+    config = replace(_config(history_size=8), analysis_max_chars=4096)
+    static = "Shared retrieval context that stays the same on every call. " * 200
+
+    events = [
+        build_event(
+            EventContext(
+                provider="openai",
+                model="gpt-4o-mini",
+                prompt=f"{static} tail {i} 2025-01-01T00:00:00Z",
+                prompt_tokens=1,
+                completion_tokens=1,
+                latency_ms=1,
+            ),
+            config,
+        )
+        for i in range(2)
+    ]
+
+    for event in events:
+        validate_event(event)
+        assert event["analysis"] == {
+            "truncated": True,
+            "analyzed_chars": 4096,
+            "prompt_chars": len(static) + len(" tail 0 2025-01-01T00:00:00Z"),
+        }
+        # The timestamp sits beyond the analyzed region.
+        assert event["cache_breakers"] == []
+    assert events[0]["prefix_hash_blocks"] == events[1]["prefix_hash_blocks"]
+    assert events[1]["prefix_similarity"] == 1.0
+
+
+_SYSTEM = "".join(f"rule {n}: cite policy section {n} when answering.\n" for n in range(100))
+
+
+def _turns(count: int) -> list[str]:
+    messages = [_SYSTEM]
+    for turn in range(count):
+        messages.append(f"user: where is order {turn}? asked at 2025-01-0{turn % 9 + 1}T10:00:00Z")
+        messages.append(f"assistant: order {turn} ships tomorrow. " * 10)
+    return messages
+
+
+def _context(messages: list[str], structured: bool) -> EventContext:
+    return EventContext(
+        provider="openai",
+        model="gpt-4o-mini",
+        prompt="\n".join(messages),
+        prompt_tokens=1,
+        completion_tokens=1,
+        latency_ms=1,
+        messages=messages if structured else None,
+    )
+
+
+def _analysis(structured: bool, conversations: list[list[str]]) -> list[tuple[object, ...]]:
+    reset_history()
+    results = []
+    for messages in conversations:
+        event = build_event_record(_context(messages, structured), _config(history_size=8))
+        results.append((event.prefix_hash_blocks, event.prefix_similarity, event.breakers))
+    return results
+
+
+def test_message_analysis_matches_flat_prompt_analysis() -> None:
+    full = _turns(12)
+    conversations = [full[: 1 + 2 * turn] for turn in range(1, 13)]
+    # An edited early turn, then a conversation that restarts from the system prompt.
+    edited = list(full)
+    edited[3] = edited[3].replace("ships tomorrow", "was delayed")
+    conversations += [edited, full[:1]]
+    # An edit deep inside a long early message still scores to the exact character.
+    notes = "Order notes: " + "item ok. " * 100
+    conversations += [[_SYSTEM, notes], [_SYSTEM, notes[:600] + "CHANGED" + notes[600:]]]
+    # Beyond EXACT_PREFIX_CHARS: turns appended to a long conversation, then an early edit.
+    long = _turns(40)
+    assert len("\n".join(long[:61])) > EXACT_PREFIX_CHARS
+    long_edited = list(long)
+    long_edited[20] = long_edited[20].replace("ships tomorrow", "was delayed", 5)
+    conversations += [long[:61], long, long_edited]
+
+    structured = _analysis(True, conversations)
+    flat = _analysis(False, conversations)
+
+    assert structured == flat
+    assert structured[13][1] == 1.0
+    assert 0.5 < structured[15][1] < 1.0
+    assert structured[-2][1] == 1.0
+    assert 0.0 < structured[-1][1] < 1.0
+
+
+def test_new_turn_only_analyzes_new_messages() -> None:
+    full = _turns(30)
+    reset_history()
+    reset_analysis_cache()
+    config = _config(history_size=8)
+
+    build_event_record(_context(full[:59], True), config)
+    before = analysis_cache_counters()
+    event = build_event_record(_context(full, True), config)
+    after = analysis_cache_counters()
+
+    # Only the two new messages are analyzed (one message entry and one scanned segment each);
+    # the other 59 prints come from the previous call.
+    assert after.hits == before.hits
+    assert after.misses - before.misses == 4
+    assert event.prefix_similarity == 1.0
+
+
+def test_interleaved_conversations_match_their_own_earlier_turns() -> None:
+    reset_history()
+    other_system = _SYSTEM.replace("cite policy", "quote invoice")
+    first, second = _turns(4), [other_system, *_turns(4)[1:]]
+    config = _config(history_size=8)
+
+    scores = []
+    for turn in range(1, 5):
+        for messages in (first, second):
+            event = build_event_record(_context(messages[: 1 + 2 * turn], True), config)
+            scores.append(event.prefix_similarity)
+
+    assert scores[2:] == [1.0] * 6
+    unindexed = replace(config, prefix_index_entries=0)
+    reset_history()
+    build_event_record(_context(first[:3], True), unindexed)
+    build_event_record(_context(second[:3], True), unindexed)
+    assert build_event_record(_context(first[:5], True), unindexed).prefix_similarity < 0.5
+
+
+def test_history_keeps_message_prints_but_not_texts() -> None:
+    reset_history()
+    messages = [_SYSTEM * 4, *(f"user: question {i} " * 300 for i in range(6))]
+    build_event_record(_context(messages, True), _config(history_size=8))
+
+    conversation = _history_for_size(8).latest("gpt-4o-mini")
+    seen: set[int] = set()
+    pending: list[object] = [conversation]
+    held: list[int] = []
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, (type, int, float)):
+            continue
+        seen.add(id(item))
+        if isinstance(item, str):
+            held.append(len(item))
+            continue
+        pending.extend(gc.get_referents(item))
+    # Like a flat prompt, a conversation keeps its first EXACT_PREFIX_CHARS verbatim, then the
+    # first block and the partial tail of each message; never the whole text.
+    assert len(messages[0]) > max(held) == EXACT_PREFIX_CHARS
+    assert sum(held) <= EXACT_PREFIX_CHARS + 2 * 256 * len(messages)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import tracemalloc
+from dataclasses import replace
+
+import pytest
+from cecil.config import ObserverConfig
+from cecil.event_model import (
+    Event,
+    EventContext,
+    analysis_cache_counters,
+    build_event,
+    build_event_record,
+    reset_analysis_cache,
+    reset_history,
+)
+from cecil.patcher import emit_event, register_record_listener, unregister_event_listener
+from cecil.privacy import PrefixHasher
+from cecil.schema import validate_event
+from cecil.telemetry import TelemetryClient
+
+
+def _config() -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=8,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+
+
+def _context(i: int = 0) -> EventContext:
+    return EventContext(
+        provider="openai",
+        model="gpt-4o-mini",
+        prompt=f"now=2025-01-01T00:00:00Z system: answer briefly. question {i}",
+        prompt_tokens=120,
+        completion_tokens=30,
+        latency_ms=5,
+        cache_control_position=0,
+        timestamp_ms=1_700_000_000_000,
+    )
+
+
+def test_record_to_dict_matches_build_event() -> None:
+    reset_history()
+    record = build_event_record(_context(), _config())
+    reset_history()
+    payload = build_event(_context(), _config())
+
+    as_dict = record.to_dict()
+    validate_event(as_dict)
+    assert as_dict.keys() == payload.keys()
+    for key in as_dict:
+        if key != "event_id":
+            assert as_dict[key] == payload[key], key
+    assert json.loads(record.to_json())["model"] == "gpt-4o-mini"
+    assert as_dict["cache_breakers"][0]["category"] == "timestamp"  # type: ignore[index]
+
+
+def test_record_listener_receives_event_without_payload_copy() -> None:
+    received: list[Event] = []
+    listener_id = register_record_listener(received.append)
+    telemetry = TelemetryClient(_config())
+    try:
+        event = build_event_record(_context(), _config())
+        emit_event(event, telemetry)
+    finally:
+        unregister_event_listener(listener_id)
+
+    assert received == [event]
+    assert not hasattr(event, "__dict__")
+
+
+def test_retained_records_use_less_memory_than_payload_dicts() -> None:
+    reset_history()
+    # Keep the analysis cache out of the measurement.
+    config = replace(_config(), analysis_cache_bytes=0)
+
+    tracemalloc.start()
+    records = [build_event_record(_context(i), config) for i in range(200)]
+    record_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    payloads = [build_event(_context(i), config) for i in range(200)]
+    payload_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(records) == len(payloads)
+    assert record_bytes < payload_bytes / 2
+
+
+def test_analysis_cache_serves_repeated_system_prompts() -> None:
+    system = "".join(f"step {n}: call the search tool before answering.\n" for n in range(200))
+    contexts = [_context(i) for i in range(5)]
+    for i, context in enumerate(contexts):
+        context.prompt = f"{system}user: question {i} at 2025-01-01T00:00:00Z"
+
+    reset_history()
+    reset_analysis_cache()
+    cached = [build_event_record(context, _config()) for context in contexts]
+    counters = analysis_cache_counters()
+    reset_history()
+    uncached = [
+        build_event_record(context, replace(_config(), analysis_cache_bytes=0))
+        for context in contexts
+    ]
+
+    assert counters.hits > counters.misses > 0
+    for hit, miss in zip(cached, uncached):
+        assert hit.prefix_hash_blocks == miss.prefix_hash_blocks
+        assert hit.prefix_similarity == miss.prefix_similarity
+        assert hit.breakers == miss.breakers
+
+
+def test_hashed_prefixes_count_against_analysis_cache_budget(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = []
+    blocks = PrefixHasher.blocks
+
+    def counted(self: PrefixHasher, canonical_prompt: str) -> list[str]:
+        calls.append(len(canonical_prompt))
+        return blocks(self, canonical_prompt)
+
+    monkeypatch.setattr(PrefixHasher, "blocks", counted)
+    context = _context()
+    # A 40K-character prompt; a 256-block cdc span hashes all of it.
+    context.prompt = "".join(f"rule {n} applies. " for n in range(2500))
+    config = replace(_config(), prefix_hash_blocks=256, prefix_hash_chunking="cdc")
+
+    hashed = []
+    for budget in (8 * 1024 * 1024, 32 * 1024):
+        reset_analysis_cache()
+        calls.clear()
+        records = [
+            build_event_record(context, replace(config, analysis_cache_bytes=budget))
+            for _ in range(3)
+        ]
+        assert analysis_cache_counters().bytes <= budget
+        assert len({tuple(record.prefix_hash_blocks) for record in records}) == 1
+        hashed.append(len(calls))
+
+    # The prefix alone is over the small budget, so it is hashed again on every call.
+    assert hashed == [1, 3]
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+from cecil import patcher
+from cecil.config import ObserverConfig
+from cecil.event_model import Event, EventContext, build_event_record
+from cecil.patcher import (
+    emit_event,
+    register_event_listener,
+    register_record_listener,
+    unregister_event_listener,
+)
+from cecil.telemetry import TelemetryClient
+
+
+def _config() -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=8,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+
+
+def _event() -> Event:
+    context = EventContext(
+        provider="openai",
+        model="gpt-4o-mini",
+        prompt="system: answer briefly.",
+        prompt_tokens=12,
+        completion_tokens=3,
+        latency_ms=5,
+        cache_control_position=None,
+        timestamp_ms=1_700_000_000_000,
+    )
+    return build_event_record(context, _config())
+
+
+def test_registration_publishes_immutable_dispatch_tuples() -> None:
+    before = patcher._RECORD_DISPATCH
+    received: list[Event] = []
+    listener_id = register_record_listener(received.append)
+    try:
+        published = patcher._RECORD_DISPATCH
+        assert isinstance(published, tuple)
+        assert published is not before
+        assert len(published) == len(before) + 1
+    finally:
+        unregister_event_listener(listener_id)
+
+    assert before == patcher._RECORD_DISPATCH
+
+
+def test_listener_added_during_dispatch_sees_only_later_events() -> None:
+    telemetry = TelemetryClient(_config())
+    late: list[Event] = []
+    ids: list[int] = []
+
+    def register_late(event: Event) -> None:
+        if not ids:
+            ids.append(register_record_listener(late.append))
+
+    first_id = register_record_listener(register_late)
+    try:
+        first, second = _event(), _event()
+        emit_event(first, telemetry)
+        emit_event(second, telemetry)
+    finally:
+        unregister_event_listener(first_id)
+        unregister_event_listener(ids[0])
+
+    assert late == [second]
+
+
+def test_async_listener_does_not_block_emit_and_drains_on_unregister() -> None:
+    telemetry = TelemetryClient(_config())
+    release = threading.Event()
+    received: list[dict[str, object]] = []
+
+    def slow(payload: dict[str, object]) -> None:
+        release.wait(2.0)
+        received.append(payload)
+
+    listener_id = register_event_listener(slow, delivery="async")
+    try:
+        started = time.perf_counter()
+        for _ in range(5):
+            emit_event(_event(), telemetry)
+        elapsed = time.perf_counter() - started
+    finally:
+        release.set()
+        unregister_event_listener(listener_id, timeout=3.0)
+
+    assert elapsed < 1.0
+    assert len(received) == 5
+
+
+def test_async_listener_drops_when_its_queue_is_full() -> None:
+    release = threading.Event()
+    listener = patcher._AsyncListener(lambda value: release.wait(2.0), queue_size=1)
+    try:
+        for i in range(5):
+            listener(i)
+        assert listener.dropped >= 3
+    finally:
+        release.set()
+        listener.stop(timeout=3.0)
+
+
+def test_async_listener_counts_drops_from_concurrent_threads() -> None:
+    release = threading.Event()
+    delivered: list[object] = []
+
+    def slow(value: object) -> None:
+        release.wait(2.0)
+        delivered.append(value)
+
+    listener = patcher._AsyncListener(slow, queue_size=1)
+    threads, per_thread = 8, 2_000
+
+    def flood() -> None:
+        for i in range(per_thread):
+            listener(i)
+
+    workers = [threading.Thread(target=flood) for _ in range(threads)]
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        release.set()
+        listener.stop(timeout=3.0)
+
+    assert listener.dropped + len(delivered) == threads * per_thread
+
+
+def test_unknown_delivery_mode_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        register_event_listener(lambda payload: None, delivery="later")
+
+
+def test_payload_is_built_only_for_dict_listeners_or_sent_events(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = []
+    to_dict = Event.to_dict
+
+    def counting(self: Event) -> dict[str, object]:
+        calls.append(self)
+        return to_dict(self)
+
+    monkeypatch.setattr(Event, "to_dict", counting)
+    event = _event()
+    local = TelemetryClient(_config())
+    sampled_out = TelemetryClient(
+        replace(
+            _config(),
+            enabled=True,
+            api_key="lok_test.secret",
+            endpoint="http://127.0.0.1:1/unreachable",
+            sampling_rate=0.0,
+        )
+    )
+    records: list[Event] = []
+    register_record_listener(records.append)
+    try:
+        for telemetry in (local, sampled_out):
+            for _ in range(10):
+                emit_event(event, telemetry)
+        assert (len(records), len(calls)) == (20, 0)
+
+        payloads: list[dict[str, object]] = []
+        register_event_listener(payloads.append)
+        emit_event(event, local)
+        assert len(payloads) == len(calls) == 1
+    finally:
+        sampled_out.stop(timeout=0.1, drain=False)
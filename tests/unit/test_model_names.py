@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import pytest
+from cecil.model_names import normalize_model
+
+
+@pytest.mark.parametrize(
+    ("raw", "family"),
+    [
+        ("gpt-4o-mini", "gpt-4o-mini"),
+        ("gpt-4o-mini-2024-07-18", "gpt-4o-mini"),
+        ("ft:gpt-4o-mini-2024-07-18:acme::9xYz", "gpt-4o-mini"),
+        ("openai/gpt-4o", "gpt-4o"),
+        ("GPT-4.1-Nano", "gpt-4.1-nano"),
+        ("gpt-4-0613", "gpt-4"),
+        ("claude-3-5-haiku-20241022", "claude-3-5-haiku"),
+        ("claude-3-5-haiku-latest", "claude-3-5-haiku"),
+        ("us.anthropic.claude-3-5-sonnet-20241022-v2:0", "claude-3-5-sonnet"),
+        ("claude-3-5-sonnet-v2@20241022", "claude-3-5-sonnet"),
+        ("claude-sonnet-4-5", "claude-sonnet-4-5"),
+        ("models/gemini-1.5-pro-002", "gemini-1.5-pro"),
+        ("   ", "unknown"),
+    ],
+)
+def test_normalize_model_maps_ids_to_families(raw: str, family: str) -> None:
+    assert normalize_model(raw) == family
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from dataclasses import replace
+
 from cecil.config import ObserverConfig
 from cecil.event_model import EventContext, build_event
+from cecil.schema import validate_event
 
 
 def _config(redaction_mode: str = "strict", snippets_enabled: bool = False) -> ObserverConfig:
@@ -77,3 +80,23 @@ def test_opt_in_redacted_snippet_with_secondary_flag() -> None:
     privacy = event["privacy"]
     assert isinstance(privacy, dict)
     assert "[REDACTED]" in str(privacy["snippet"])
+
+
+def test_keyed_blake2b_prefix_blocks_cover_long_prefixes() -> None:
+    config = replace(
+        _config(), prefix_hash_algorithm="blake2b", prefix_hash_key="k", prefix_hash_blocks=64
+    )
+    event = build_event(
+        EventContext(
+            provider="openai",
+            model="gpt-4o-mini",
+            prompt="stable tool schema and instructions. " * 200,
+            prompt_tokens=1,
+            completion_tokens=1,
+            latency_ms=1,
+        ),
+        config,
+    )
+
+    validate_event(event)
+    assert len(event["prefix_hash_blocks"]) == 64  # type: ignore[arg-type]
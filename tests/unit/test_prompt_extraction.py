@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from cecil.adapters.common import extract_prompt
+from cecil.adapters.common import extract_messages, extract_prompt
 
 
 def test_extract_prompt_handles_structured_content_blocks() -> None:
@@ -37,3 +37,17 @@ def test_extract_prompt_input_list_and_cache_boundary() -> None:
     prompt, cache_pos = extract_prompt(kwargs)
     assert "prefix" in prompt
     assert cache_pos == 0
+
+
+def test_extract_messages_keeps_message_boundaries() -> None:
+    kwargs = {
+        "messages": [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": [{"type": "text", "text": "hi"}, {"type": "text"}]},
+            {"role": "assistant", "content": ""},
+        ]
+    }
+
+    assert extract_messages(kwargs) == (["be brief", "hi", ""], None)
+    assert extract_prompt(kwargs) == ("be brief\nhi\n", None)
+    assert extract_messages({"prompt": "plain"}) is None
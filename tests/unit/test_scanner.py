@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import random
+
+from cecil import scanner
+from cecil.cache_analysis import detect_cache_breakers
+from cecil.canonicalize import canonicalize_prompt
+from cecil.scanner import ScanCache, scan_prompt
+
+_FRAGMENTS = [
+    "2025-01-01T12:00:00",
+    "2025-01-01 12:00:00.123456789012345678901234",
+    "2025-01-01T12:00:001",
+    "2025-01-01T00:00:00.550e8400-e29b-41d4-a716-446655440000",
+    "550e8400-e29b-41d4-a716-446655440000",
+    "ABCDEF0123456789abcdef0123456789",
+    "nonce=",
+    "request_id:",
+    "Session-ID= ",
+    "abcdefgh",
+    "12345678",
+    "deadbeef",
+    "+05:30",
+    "Z",
+    "\\n",
+    "\n",
+    "\t",
+    "  ",
+    " ",
+    "-",
+    "_",
+    ".",
+    ":",
+    "=",
+    "é",
+    "x",
+]
+
+
+_SYSTEM = "".join(f"rule {n}: answer politely and cite the policy section.\n" for n in range(120))
+
+
+def _assert_matches_legacy(prompt: str) -> None:
+    canonical, breakers = scan_prompt(prompt)
+    assert canonical == canonicalize_prompt(prompt), prompt
+    assert breakers == detect_cache_breakers(prompt), prompt
+
+
+def test_scan_matches_sequential_passes_on_known_prompts() -> None:
+    for prompt in [
+        "  time=2025-01-01T12:00:00Z  id=550e8400-e29b-41d4-a716-446655440000\\nhello ",
+        "now=2025-01-01T00:00:00 request_id=ABCD1234EFGH5678 "
+        "uuid=550e8400-e29b-41d4-a716-446655440000",
+        "System: Return JSON only.\\nUser: summarize account activity.",
+        "request_id=550e8400-e29b-41d4-a716-446655440000",
+        "nonce=x-2025-01-01T00:00:00Z trailing",
+        "session_id=deadbeefdeadbeefdeadbeefdeadbeef",
+        "at 2025-01-01 12:00:00.550e8400-e29b-41d4-a716-446655440000",
+        "",
+    ]:
+        _assert_matches_legacy(prompt)
+
+
+def test_scan_matches_sequential_passes_on_random_prompts() -> None:
+    rng = random.Random(20250101)
+    for _ in range(20_000):
+        _assert_matches_legacy("".join(rng.choice(_FRAGMENTS) for _ in range(rng.randrange(1, 10))))
+
+
+def test_scan_cache_matches_scan_prompt_across_segment_cuts(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    # Tiny segments put a cut next to every kind of token.
+    monkeypatch.setattr(scanner, "_SEGMENT_CHARS", 4)
+    cache = ScanCache(1 << 16)
+    rng = random.Random(20250102)
+    fragments = [*_FRAGMENTS, "\n", "\n", "2025-01-01\n12:00:00", "nonce:\nabcdefgh"]
+    for _ in range(20_000):
+        prompt = "".join(rng.choice(fragments) for _ in range(rng.randrange(1, 16)))
+        assert cache.scan(prompt) == scan_prompt(prompt), prompt
+
+
+def test_scan_cache_reuses_shared_leading_segments() -> None:
+    cache = ScanCache(1 << 20)
+    for i in range(10):
+        prompt = f"{_SYSTEM}user: question {i} at 2025-01-01T12:00:00Z"
+        assert cache.scan(prompt) == scan_prompt(prompt)
+
+    counters = cache.counters
+    segments = len(scanner._segments(f"{_SYSTEM}user: question 0"))
+    assert segments > 1
+    # The first call scans everything; later calls only scan their last segment.
+    assert counters.misses == segments + 9
+    assert counters.hits == 9 * (segments - 1)
+
+
+def test_scan_cache_evicts_to_its_byte_budget() -> None:
+    cache = ScanCache(4096)
+    for i in range(50):
+        cache.scan(f"prompt number {i} " * 40)
+
+    counters = cache.counters
+    assert 0 < counters.bytes <= 4096
+    assert counters.evictions == 50 - counters.entries
+
+    cache.resize(0)
+    assert (cache.counters.entries, cache.counters.bytes) == (0, 0)
+    assert cache.scan(_SYSTEM) == scan_prompt(_SYSTEM)
+    assert cache.counters.entries == 0
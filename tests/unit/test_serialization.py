@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from cecil.config import load_config
+from cecil.event_model import EventContext, build_event_record
+from cecil.serialization import BACKENDS, JsonSerializer, get_serializer, resolve_backend
+
+_EVENT: dict[str, object] = {
+    "schema_version": "v1",
+    "provider": "openai",
+    "model": "gpt-4o-mini",
+    "token_counts": {"prompt": 120, "completion": 30, "total": 150},
+    "cost_estimate_usd": 6.6e-05,
+    "cost_label": None,
+    "prefix_hash_blocks": ["a3aab91d3d7ef0d1"],
+    "privacy": {"mode": "hash_only", "redaction_mode": "strict", "snippet": None},
+}
+
+
+def test_every_resolved_backend_round_trips_events() -> None:
+    for backend in BACKENDS:
+        serializer = JsonSerializer(backend)
+        assert serializer.backend in BACKENDS
+        assert json.loads(serializer.dumps(_EVENT)) == _EVENT
+        assert json.loads(serializer.dumps([_EVENT, _EVENT])) == [_EVENT, _EVENT]
+
+
+def test_unavailable_backend_falls_back_to_stdlib() -> None:
+    assert resolve_backend("no-such-encoder") == "json"
+    assert resolve_backend("json") == "json"
+    assert get_serializer("json").dumps({"a": 1}) == b'{"a": 1}'
+
+
+def test_fast_backend_falls_back_for_values_it_rejects() -> None:
+    pytest.importorskip("orjson")
+    serializer = JsonSerializer("orjson")
+    assert serializer.backend == "orjson"
+
+    huge = {"n": 2**70}
+    assert json.loads(serializer.dumps(huge)) == huge
+
+
+def test_dumps_text_matches_stdlib_report_layout() -> None:
+    # Small floats and non-ASCII model names are where fast encoders format differently.
+    report = {"b": {"events": 1, "cost_usd": 0.25, "saved_usd": 6.6e-05}, "a": ["modèle", 2]}
+    expected = json.dumps(report, indent=2, sort_keys=True)
+
+    for backend in BACKENDS:
+        assert get_serializer(backend).dumps_text(report, indent=2, sort_keys=True) == expected
+    assert get_serializer().dumps_text(report, indent=4) == json.dumps(report, indent=4)
+
+
+def test_json_backend_config(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("CECIL_JSON_BACKEND", "JSON")
+    assert load_config().json_backend == "json"
+
+    monkeypatch.setenv("CECIL_JSON_BACKEND", "simdjson")
+    assert load_config().json_backend == "auto"
+
+
+def test_event_to_json_uses_configured_backend(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CECIL_JSON_BACKEND", "json")
+    context = EventContext(
+        provider="openai",
+        model="gpt-4o-mini",
+        prompt="system: answer briefly.",
+        prompt_tokens=120,
+        completion_tokens=30,
+        latency_ms=5,
+    )
+    record = build_event_record(context, load_config())
+
+    assert record.to_json() == json.dumps(record.to_dict())
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+import random
+
+from cecil.sketch import MAX_BINS, RELATIVE_ACCURACY, QuantileSketch
+
+
+def _exact(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_stay_within_relative_accuracy() -> None:
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5.0, 1.2) for _ in range(20_000)]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.95, 0.99):
+        estimate = sketch.quantile(q)
+        assert estimate is not None
+        exact = _exact(values, q)
+        assert abs(estimate - exact) <= exact * RELATIVE_ACCURACY * 1.01
+
+
+def test_merged_sketches_match_one_sketch_over_all_values() -> None:
+    rng = random.Random(11)
+    values = [rng.uniform(0, 5000) for _ in range(3000)] + [0.0] * 10
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for index, value in enumerate(values):
+        whole.add(value)
+        (left if index % 2 else right).add(value)
+
+    left.merge(right)
+    restored = QuantileSketch.from_state(json.loads(json.dumps(left.to_state())))
+
+    assert restored.count == whole.count == len(values)
+    assert restored.bins == whole.bins
+    assert restored.summary(2) == whole.summary(2)
+
+
+def test_memory_is_bounded_and_high_quantiles_survive_collapse() -> None:
+    sketch = QuantileSketch()
+    values = [10 ** (i / 100) for i in range(1500)]
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch.bins) <= MAX_BINS
+    p99 = sketch.quantile(0.99)
+    assert p99 is not None
+    assert abs(p99 - _exact(values, 0.99)) <= _exact(values, 0.99) * RELATIVE_ACCURACY * 1.01
+
+
+def test_empty_and_zero_values() -> None:
+    sketch = QuantileSketch()
+    assert sketch.summary(2) == {"p50": None, "p95": None, "p99": None}
+
+    sketch.add(0)
+    sketch.add(0)
+    sketch.add(100)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) is not None
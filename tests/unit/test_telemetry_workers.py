@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import replace
+
+from cecil.config import ObserverConfig
+from cecil.telemetry import TelemetryClient
+
+
+def _config(workers: int = 4, retry_budget: int = 0) -> ObserverConfig:
+    return ObserverConfig(
+        enabled=True,
+        api_key="lok_test.secret",
+        endpoint="http://127.0.0.1:1/unreachable",
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=256,
+        timeout_seconds=0.01,
+        retry_budget=retry_budget,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+        telemetry_workers=workers,
+    )
+
+
+def _total(client: TelemetryClient) -> int:
+    counters = client.counters
+    return counters.sent + counters.failures + counters.dropped + counters.abandoned_on_shutdown
+
+
+def test_worker_pool_sends_concurrently(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    threads: set[str] = set()
+    lock = threading.Lock()
+
+    def slow_send(self, event):  # type: ignore[no-untyped-def]
+        with lock:
+            threads.add(threading.current_thread().name)
+        time.sleep(0.05)
+        return True
+
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient._send_once", slow_send)
+    client = TelemetryClient(_config(workers=4))
+
+    start = time.perf_counter()
+    for i in range(20):
+        client.emit({"n": i})
+    client.stop(timeout=2.0, drain=True)
+    elapsed = time.perf_counter() - start
+
+    assert client.counters.sent == 20
+    assert len(threads) == 4
+    # A single worker would need at least 20 * 50ms.
+    assert elapsed < 0.8
+
+
+def test_retry_backoff_does_not_block_other_events(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    attempts: list[int] = []
+
+    def send(self, event):  # type: ignore[no-untyped-def]
+        if event.get("bad"):
+            attempts.append(1)
+            return False
+        return True
+
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient._send_once", send)
+    client = TelemetryClient(_config(workers=1, retry_budget=3))
+
+    client.emit({"bad": True})
+    for i in range(10):
+        client.emit({"n": i})
+    time.sleep(0.08)
+    sent_before_first_retry = client.counters.sent
+    client.stop(timeout=2.0, drain=True)
+
+    assert sent_before_first_retry == 10
+    assert len(attempts) == 4
+    assert client.counters.retried_events == 3
+    assert client.counters.failures == 1
+    assert _total(client) == 11
+
+
+def test_pool_shutdown_accounts_pending_retries(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient._send_once", lambda self, event: False)
+    client = TelemetryClient(_config(workers=3, retry_budget=5))
+
+    attempts = 60
+    for i in range(attempts):
+        client.emit({"n": i})
+    time.sleep(0.05)
+    client.stop(timeout=0.01, drain=False)
+
+    assert client.counters.abandoned_on_shutdown > 0
+    assert _total(client) == attempts
+
+
+def test_batched_pool_accounting(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setattr("cecil.telemetry.TelemetryClient._send_batch_once", lambda self, batch: [0])
+    config = replace(_config(workers=2, retry_budget=1), telemetry_batch_size=8)
+    client = TelemetryClient(config)
+
+    attempts = 40
+    for i in range(attempts):
+        client.emit({"n": i})
+    client.stop(timeout=2.0, drain=True)
+
+    assert client.counters.partial_batches > 0
+    assert client.counters.failures > 0
+    assert _total(client) == attempts
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import threading
+import time
+
+from cecil import analytics
+from cecil.analytics import UsageSession, collect_usage_report
+from cecil.config import ObserverConfig
+from cecil.event_model import Event, EventContext, build_event_record, reset_history
+from cecil.patcher import emit_event
+from cecil.telemetry import TelemetryClient
+
+
+def _config() -> ObserverConfig:
+    return ObserverConfig(
+        enabled=False,
+        api_key=None,
+        endpoint=None,
+        sampling_rate=1.0,
+        privacy_mode="hash_only",
+        redaction_mode="strict",
+        snippets_enabled=False,
+        queue_size=8,
+        timeout_seconds=1.0,
+        retry_budget=0,
+        history_size=64,
+        savings_factor=0.3,
+        savings_min_similarity=0.15,
+    )
+
+
+def _records(count: int) -> list[Event]:
+    reset_history()
+    config = _config()
+    models = [("openai", "gpt-4o-mini"), ("anthropic", "claude-3-5-sonnet"), ("openai", "mystery")]
+    records = []
+    for i in range(count):
+        provider, model = models[i % len(models)]
+        prompt = "system: answer briefly. " * 20 + f"question {i}"
+        if i % 4 == 0:
+            prompt = f"now=2025-01-01T00:00:00Z {prompt}"
+        if i % 5 == 0:
+            prompt = f"request_id=ABCD1234EFGH{i:04d} {prompt}"
+        records.append(
+            build_event_record(
+                EventContext(
+                    provider=provider,
+                    model=model,
+                    prompt=prompt,
+                    prompt_tokens=100 + i,
+                    completion_tokens=10 + i % 7,
+                    latency_ms=5,
+                    cache_control_position=0 if i % 3 == 0 else None,
+                ),
+                config,
+            )
+        )
+    return records
+
+
+def _without_short_windows(report: dict[str, object]) -> dict[str, object]:
+    # Reports taken on either side of a minute boundary only differ in the shortest windows.
+    windows = report["windows"]
+    assert isinstance(windows, dict)
+    return {**report, "windows": windows["60m"]}
+
+
+def _event_at(minute_offset: int, model: str = "gpt-4o-mini") -> Event:
+    return build_event_record(
+        EventContext(
+            provider="openai",
+            model=model,
+            prompt=f"question {minute_offset}",
+            prompt_tokens=100,
+            completion_tokens=20,
+            latency_ms=5,
+            timestamp_ms=int(time.time() * 1000) - minute_offset * 60_000,
+        ),
+        _config(),
+    )
+
+
+def test_short_lived_threads_share_a_fixed_set_of_shards() -> None:
+    records = _records(300)
+    telemetry = TelemetryClient(_config())
+    session = UsageSession(max_events=10)
+    for record in records:
+        worker = threading.Thread(target=emit_event, args=(record, telemetry))
+        worker.start()
+        worker.join()
+    report = session.report_dict()
+    session.close()
+
+    assert len(session._shards) == analytics._STRIPES
+    assert report["event_count"] == 300
+
+
+def test_sharded_report_matches_single_thread_report() -> None:
+    records = _records(240)
+    telemetry = TelemetryClient(_config())
+
+    sequential = UsageSession(max_events=100)
+    for record in records:
+        emit_event(record, telemetry)
+    expected = sequential.report_dict()
+    sequential.close()
+
+    threaded = UsageSession(max_events=100)
+    chunks = [records[i::8] for i in range(8)]
+    workers = [
+        threading.Thread(target=lambda chunk=chunk: [emit_event(r, telemetry) for r in chunk])
+        for chunk in chunks
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    actual = threaded.report_dict()
+    threaded.close()
+
+    assert sum(1 for shard in threaded._shards if shard.total.events) == 8
+    assert actual == expected or _without_short_windows(actual) == _without_short_windows(expected)
+    assert expected["event_count"] == 240
+    assert expected["retained_event_count"] == 100
+
+
+def test_closed_session_ignores_later_events() -> None:
+    records = _records(3)
+    telemetry = TelemetryClient(_config())
+    session = UsageSession()
+    emit_event(records[0], telemetry)
+    session.close()
+    session._on_event(records[1])
+
+    assert session.report_dict()["event_count"] == 1
+
+
+def test_collected_snapshots_match_one_combined_session(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    records = _records(60)
+    telemetry = TelemetryClient(_config())
+
+    combined = UsageSession(max_events=100)
+    for record in records:
+        emit_event(record, telemetry)
+    expected = combined.report_dict()
+    combined.close()
+
+    first = UsageSession(max_events=50, snapshot_dir=tmp_path, snapshot_interval=60.0)
+    for record in records[:25]:
+        first._on_event(record)
+    second = UsageSession(max_events=50, snapshot_dir=tmp_path, snapshot_interval=60.0)
+    for record in records[25:]:
+        second._on_event(record)
+    first.write_snapshot()
+    second.write_snapshot()
+
+    report = collect_usage_report(tmp_path).data
+    stale = collect_usage_report(tmp_path, max_age_seconds=-1.0).data
+    assert len(list(tmp_path.glob("usage-*.json"))) == 2
+    first.close()
+    second.close()
+
+    assert report == expected or _without_short_windows(report) == _without_short_windows(expected)
+    assert stale["event_count"] == 0
+    # Closed sessions remove their own snapshots.
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_collector_skips_unreadable_snapshots(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    (tmp_path / "usage-1-1.json").write_text("{not json")
+    (tmp_path / "usage-2-2.json").write_text('{"version": 99}')
+
+    report = collect_usage_report(tmp_path).data
+
+    assert report["event_count"] == 0
+    assert report["retention_limit"] == 0
+
+
+def test_worker_processes_share_one_snapshot_directory(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    # Each worker records, snapshots and then stays up until told to close.
+    script = (
+        "import sys\n"
+        "from cecil.analytics import UsageSession\n"
+        "from cecil.config import ObserverConfig\n"
+        "from cecil.event_model import EventContext, build_event_record\n"
+        "config = ObserverConfig(enabled=False, api_key=None, endpoint=None, sampling_rate=1.0,\n"
+        "    privacy_mode='hash_only', redaction_mode='strict', snippets_enabled=False,\n"
+        "    queue_size=8, timeout_seconds=1.0, retry_budget=0, history_size=64,\n"
+        "    savings_factor=0.3, savings_min_similarity=0.15)\n"
+        "session = UsageSession(snapshot_dir=sys.argv[1], snapshot_interval=0.05)\n"
+        "for i in range(int(sys.argv[2])):\n"
+        "    session._on_event(build_event_record(EventContext(provider='openai',\n"
+        "        model='gpt-4o-mini', prompt=f'question {i}', prompt_tokens=10,\n"
+        "        completion_tokens=2, latency_ms=5), config))\n"
+        "session.write_snapshot()\n"
+        "print('ready', flush=True)\n"
+        "sys.stdin.readline()\n"
+        "session.close()\n"
+    )
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", script, str(tmp_path), str(count)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for count in (3, 4, 5)
+    ]
+    try:
+        for worker in workers:
+            assert worker.stdout is not None and worker.stdout.readline() == "ready\n"
+        report = collect_usage_report(tmp_path).data
+    finally:
+        for worker in workers:
+            worker.communicate("\n", timeout=60)
+
+    assert [worker.returncode for worker in workers] == [0, 0, 0]
+    assert report["event_count"] == 12
+    totals = report["totals"]
+    assert isinstance(totals, dict)
+    assert totals["prompt_tokens"] == 120
+    assert list(tmp_path.glob("usage-*.json")) == []
+
+
+def test_collector_prunes_snapshots_of_dead_processes(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait(timeout=60)
+    session = UsageSession(snapshot_dir=tmp_path, snapshot_interval=60.0)
+    for record in _records(3):
+        session._on_event(record)
+    live = session.write_snapshot()
+    assert live is not None
+    # A worker that died without closing its session.
+    crashed = json.loads(live.read_text())
+    crashed["pid"] = exited.pid
+    orphan = tmp_path / f"usage-{exited.pid}-1.json"
+    orphan.write_text(json.dumps(crashed))
+
+    kept = collect_usage_report(tmp_path, prune_dead=False).data
+    report = collect_usage_report(tmp_path).data
+    session.close()
+
+    assert kept["event_count"] == 6
+    assert report["event_count"] == 3
+    assert not orphan.exists()
+
+
+def test_windows_roll_per_minute_in_fixed_memory() -> None:
+    session = UsageSession(window_minutes=15)
+    for offset in (0, 0, 3, 10, 20, 40):
+        session._on_event(_event_at(offset, model="gpt-4o" if offset == 3 else "gpt-4o-mini"))
+    report = session.report_dict()
+    session.close()
+
+    windows = report["windows"]
+    assert isinstance(windows, dict)
+    assert list(windows) == ["1m", "5m", "15m"]
+    assert [windows[name]["events"] for name in windows] in ([2, 3, 4], [0, 3, 4])
+    five = windows["5m"]
+    assert five["tokens_per_minute"] == round(3 * 120 / 5, 2)
+    assert set(five["models"]) == {"gpt-4o", "gpt-4o-mini"}
+    assert report["event_count"] == 6
+    assert len(session._shards[0].ring) == 15
+
+
+def test_late_events_outside_the_ring_only_count_in_totals() -> None:
+    session = UsageSession(window_minutes=5)
+    session._on_event(_event_at(0))
+    session._on_event(_event_at(5))
+    report = session.report_dict()
+    session.close()
+
+    windows = report["windows"]
+    assert isinstance(windows, dict)
+    assert windows["5m"]["events"] in (1, 2)
+    assert report["event_count"] == 2
+
+
+def test_report_exposes_latency_and_token_percentiles(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    session = UsageSession(snapshot_dir=tmp_path, snapshot_interval=60.0)
+    for latency in range(1, 101):
+        session._on_event(
+            build_event_record(
+                EventContext(
+                    provider="openai",
+                    model="gpt-4o-mini",
+                    prompt=f"question {latency}",
+                    prompt_tokens=latency * 10,
+                    completion_tokens=5,
+                    latency_ms=latency,
+                ),
+                _config(),
+            )
+        )
+    report = session.report_dict()
+    session.write_snapshot()
+    collected = collect_usage_report(tmp_path).data
+    session.close()
+
+    totals = report["totals"]
+    assert isinstance(totals, dict)
+    latency = totals["latency_ms"]
+    assert abs(latency["p50"] - 50) <= 1
+    assert abs(latency["p99"] - 99) <= 1
+    assert totals["completion_tokens_per_event"]["p95"] == 5.0
+    models = report["models"]
+    assert isinstance(models, dict)
+    assert models["gpt-4o-mini"]["latency_ms"] == latency
+    assert collected["totals"] == totals
+
+
+def test_high_cardinality_models_stay_bounded_with_other_bucket() -> None:
+    session = UsageSession(max_keys=8)
+    config = _config()
+    for i in range(600):
+        # Two heavy hitters among hundreds of one-off fine-tunes.
+        model = ("gpt-4o-mini-2024-07-18", "claude-3-5-haiku-latest")[i % 2]
+        if i % 3 == 0:
+            model = f"ft:custom-base-{i}:acme::run{i}"
+        session._on_event(
+            build_event_record(
+                EventContext(
+                    provider="openai",
+                    model=model,
+                    prompt=f"question {i}",
+                    prompt_tokens=10,
+                    completion_tokens=1,
+                    latency_ms=5,
+                ),
+                config,
+            )
+        )
+    report = session.report_dict()
+    session.close()
+
+    models = report["models"]
+    assert isinstance(models, dict)
+    assert len(models) <= 9
+    assert {"gpt-4o-mini", "claude-3-5-haiku", "other"} <= set(models)
+    assert sum(entry["events"] for entry in models.values()) == 600
+    assert all(len(shard.models.entries) <= 8 for shard in session._shards)